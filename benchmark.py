@@ -0,0 +1,283 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import tracemalloc
+import contextlib
+from funcionalidades import config
+from funcionalidades.generador import generar_catalogo
+
+#Mide las operaciones principales sobre un catálogo sintético, sin menú:
+#
+#   python benchmark.py --profundidad 3 --ramas 4 --filas 1000 --invalidas 0.01 --salida base.json
+#   python benchmark.py ... --comparar base.json --tolerancia 0.25
+#
+#El catálogo se genera en una carpeta temporal (config.RUTA_BASE es relativa, así que el
+#programa se ejecuta dentro de ella). Cada caso se repite varias veces para tomar tiempos y
+#una vez más para medir el pico de memoria (tracemalloc) y la entrada/salida de archivos
+#(aperturas, listados de carpetas y reemplazos contados con eventos de auditoría, y los bytes
+#y llamadas de /proc/self/io en Linux). Los procesos de la validación en paralelo no se cuentan.
+#El resultado es un JSON; con --comparar se informan los casos cuya mediana empeoró más
+#que la tolerancia y el programa termina con código 1.
+
+_E_S = {"activo": False, "aperturas": 0, "listados": 0, "reemplazos": 0, "borrados": 0}
+_EVENTOS = {"open": "aperturas", "os.scandir": "listados", "os.listdir": "listados",
+            "os.rename": "reemplazos", "os.remove": "borrados"}
+
+def _auditar(evento: str, argumentos: tuple) -> None:
+    if _E_S["activo"] and evento in _EVENTOS:
+        _E_S[_EVENTOS[evento]] += 1
+
+#Contadores de E/S del proceso según el sistema (None si no están disponibles)
+def _e_s_proceso() -> dict:
+    try:
+        with open("/proc/self/io", encoding="ascii") as archivo:
+            valores = dict(linea.split(": ") for linea in archivo.read().splitlines())
+    except (OSError, ValueError):
+        return None
+    return {clave: int(valores[clave]) for clave in ("rchar", "wchar", "syscr", "syscw") if clave in valores}
+
+#Estado en frío: sin caché, sin estadísticas ni índice de nombres calculados
+def _en_frio() -> None:
+    from funcionalidades import cache_catalogo, estadisticas, indice_nombres, instantanea, consultas, historial
+    cache_catalogo.invalidar()
+    consultas.reiniciar()
+    estadisticas.reiniciar()
+    historial.reiniciar()
+    indice_nombres.reiniciar()
+    instantanea.reiniciar()
+
+#Casos: nombre -> (preparación sin medir, operación medida). Se importan recién acá
+#porque los módulos toman config.RUTA_BASE al importarse
+def _casos(parametros: dict) -> dict:
+    from funcionalidades.verificar_jerarquia import validar_archivos
+    from funcionalidades.lectura_recursiva import iniciar_lectura, hijos, es_hoja, a_estructura
+    from funcionalidades.funciones import ordenar_productos, guardar_orden, guardar_orden_externo, alta_items_lote
+    from funcionalidades.estadisticas import resumen_global
+    from funcionalidades.indice_nombres import buscar_por_nombre, actualizar_indice
+    from funcionalidades.ordenamiento import normalizar_claves
+    from funcionalidades.motor import listar_hojas
+    from funcionalidades import instantanea
+    from funcionalidades.consultas import rango, top
+    from funcionalidades.cache_catalogo import obtener_productos
+    from funcionalidades.impresion import imprimir_tabla
+    from funcionalidades.historial import registrar, estado_en
+    from datetime import datetime
+
+    # Las operaciones sobre una categoría usan siempre la primera hoja
+    hoja = listar_hojas(config.RUTA_BASE)[0]
+
+    def regenerar():
+        shutil.rmtree(config.RUTA_BASE, ignore_errors=True)
+        _generar(parametros)
+        _en_frio()
+
+    def recorrer_arbol():
+        pendientes = [iniciar_lectura()]
+        while pendientes:
+            nodo = pendientes.pop()
+            if not es_hoja(nodo):
+                pendientes.extend(hijos(nodo))
+
+    def ordenar_items():
+        guardar_orden(hoja, ordenar_productos(hoja, ["Precio", "Stock"]))
+
+    altas = [{"Nombre": f"Producto nuevo {i}", "Precio": "100", "Stock": "1"} for i in range(100)]
+
+    # 200 cambios de precio de 50 productos (10000 registros), uno por segundo desde el 1/1/2026
+    inicio = int(datetime(2026, 1, 1).timestamp()) * 10 ** 9
+    def cargar_historial():
+        _en_frio()
+        for cambio in range(200):
+            anteriores = [{"Nombre": f"Producto {i}", "Precio": str(cambio), "Stock": "1"} for i in range(50)]
+            nuevos = [{"Nombre": f"Producto {i}", "Precio": str(cambio + 1), "Stock": "1"} for i in range(50)]
+            registrar(hoja, anteriores, nuevos, inicio + cambio * 10 ** 9)
+        _en_frio()
+    casos = {
+        "iniciar_lectura": (_en_frio, recorrer_arbol),
+        "leer_catalogo": (_en_frio, lambda: a_estructura(iniciar_lectura())),
+        "ordenar_items": (_en_frio, ordenar_items),
+        "ordenar_externo": (_en_frio, lambda: guardar_orden_externo(hoja, normalizar_claves("Precio,Stock"))),
+        "promedio_productos": (_en_frio, resumen_global),
+        "promedio_incremental": (resumen_global, resumen_global),
+        "buscar": (_en_frio, lambda: buscar_por_nombre("leche")),
+        "buscar_indexado": (actualizar_indice, lambda: buscar_por_nombre("lim")),
+        "top_precio": (_en_frio, lambda: top("Precio", 50)),
+        "reposicion": (lambda: top("Stock", 1), lambda: rango("Stock", None, 10, incluir_maximo=False)),
+        "listar_tabla": (lambda: obtener_productos(hoja),
+                         lambda: imprimir_tabla(obtener_productos(hoja), config.ENCABEZADOS, salida=io.StringIO())),
+        "consulta_historial": (cargar_historial, lambda: estado_en(hoja, "Producto 7", datetime(2026, 1, 1, 0, 1, 40))),
+        "alta_items": (None, lambda: [alta_items_lote(hoja, [producto]) for producto in altas]),
+    }
+    if config.MOTOR == "csv":
+        # La validación corrige los archivos: cada repetición parte de un catálogo recién generado
+        def con_instantanea():
+            validar_archivos(config.RUTA_BASE)
+            instantanea.guardar(config.RUTA_BASE)
+            _en_frio()
+
+        def arranque():
+            instantanea.cargar(config.RUTA_BASE)
+            validar_archivos(config.RUTA_BASE)
+            resumen_global()
+
+        casos = {"validar_csv": (regenerar, lambda: validar_archivos(config.RUTA_BASE)),
+                 "validar_manifiesto": (lambda: validar_archivos(config.RUTA_BASE),
+                                        lambda: validar_archivos(config.RUTA_BASE)),
+                 "arranque_instantanea": (con_instantanea, arranque),
+                 **casos}
+    return casos
+
+def _generar(parametros: dict) -> dict:
+    return generar_catalogo(config.RUTA_BASE, parametros["profundidad"], parametros["ramas"],
+                            parametros["filas"], parametros["invalidas"], parametros["semilla"])
+
+def medir(preparar, operacion, repeticiones: int) -> dict:
+    tiempos = []
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        for _ in range(repeticiones):
+            if preparar:
+                preparar()
+            inicio = time.perf_counter()
+            operacion()
+            tiempos.append(time.perf_counter() - inicio)
+
+        # Pasada aparte para memoria y E/S: tracemalloc hace más lenta la ejecución
+        if preparar:
+            preparar()
+        for clave in _EVENTOS.values():
+            _E_S[clave] = 0
+        antes = _e_s_proceso()
+        tracemalloc.start()
+        _E_S["activo"] = True
+        try:
+            operacion()
+        finally:
+            _E_S["activo"] = False
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        despues = _e_s_proceso()
+
+    e_s = {clave: _E_S[clave] for clave in sorted(set(_EVENTOS.values()))}
+    if antes is not None and despues is not None:
+        e_s.update({clave: despues[clave] - antes[clave] for clave in despues})
+    return {
+        "repeticiones": repeticiones,
+        "segundos": [round(t, 6) for t in tiempos],
+        "minimo": round(min(tiempos), 6),
+        "mediana": round(statistics.median(tiempos), 6),
+        "media": round(statistics.fmean(tiempos), 6),
+        "memoria_pico": pico,
+        "e_s": e_s,
+    }
+
+#Casos cuya mediana empeoró más que la tolerancia respecto de un resultado anterior
+def comparar(actual: dict, base: dict, tolerancia: float) -> list:
+    regresiones = []
+    for caso, medicion in actual["casos"].items():
+        anterior = base.get("casos", {}).get(caso)
+        if anterior is None or anterior["mediana"] <= 0:
+            continue
+        cambio = medicion["mediana"] / anterior["mediana"] - 1
+        if cambio > tolerancia:
+            regresiones.append({"caso": caso, "anterior": anterior["mediana"],
+                                "actual": medicion["mediana"], "cambio": round(cambio, 3)})
+    return regresiones
+
+def ejecutar(parametros: dict, casos_pedidos: list = None) -> dict:
+    resultado = {
+        "parametros": parametros,
+        "entorno": {"python": platform.python_version(), "sistema": platform.platform(),
+                    "procesadores": os.cpu_count(), "motor": config.MOTOR},
+        "catalogo": _generar(parametros),
+        "casos": {},
+    }
+    if config.MOTOR == "sqlite":
+        from funcionalidades.verificar_jerarquia import validar_archivos
+        from funcionalidades.migracion import csv_a_sqlite
+        with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+            validar_archivos(config.RUTA_BASE)
+        csv_a_sqlite()
+
+    casos = _casos(parametros)
+    for nombre in casos_pedidos or casos:
+        if nombre not in casos:
+            raise ValueError(f"Caso desconocido: '{nombre}' (disponibles: {', '.join(casos)})")
+        preparar, operacion = casos[nombre]
+        resultado["casos"][nombre] = medir(preparar, operacion, parametros["repeticiones"])
+        print(f"{nombre}: {resultado['casos'][nombre]['mediana']:.4f} s", file=sys.stderr)
+    try:
+        import resource
+        # ru_maxrss está en KB en Linux
+        resultado["memoria_maxima_proceso"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        pass
+    return resultado
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide el rendimiento sobre un catálogo sintético.")
+    parser.add_argument("--profundidad", type=int, default=3, help="niveles de carpetas (por defecto 3)")
+    parser.add_argument("--ramas", type=int, default=4, help="subcarpetas por carpeta (por defecto 4)")
+    parser.add_argument("--filas", type=int, default=1000, help="productos por categoría (por defecto 1000)")
+    parser.add_argument("--invalidas", type=float, default=0.01,
+                        help="fracción de líneas inválidas (por defecto 0.01)")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--casos", help="casos a medir, separados por comas (por defecto todos)")
+    parser.add_argument("--motor", choices=("csv", "sqlite"), default=config.MOTOR)
+    parser.add_argument("--salida", help="archivo JSON de resultados (por defecto, la salida estándar)")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para detectar regresiones")
+    parser.add_argument("--tolerancia", type=float, default=0.25,
+                        help="empeoramiento máximo aceptado de la mediana (por defecto 0.25 = 25%%)")
+    argumentos = parser.parse_args()
+
+    parametros = {clave: getattr(argumentos, clave)
+                  for clave in ("profundidad", "ramas", "filas", "invalidas", "semilla", "repeticiones")}
+    casos = [c.strip() for c in argumentos.casos.split(",") if c.strip()] if argumentos.casos else None
+    base = None
+    if argumentos.comparar:
+        with open(argumentos.comparar, encoding="utf-8") as archivo:
+            base = json.load(archivo)
+    salida = os.path.abspath(argumentos.salida) if argumentos.salida else None
+
+    config.MOTOR = argumentos.motor
+    sys.addaudithook(_auditar)
+    anterior = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="benchmark-") as carpeta:
+        os.chdir(carpeta)
+        try:
+            resultado = ejecutar(parametros, casos)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            sys.exit(2)
+        finally:
+            from funcionalidades.almacenamiento import esperar_compactaciones
+            from funcionalidades.almacenamiento_sqlite import cerrar
+            esperar_compactaciones()
+            cerrar()
+            os.chdir(anterior)
+
+    if base is not None:
+        if base.get("parametros") != parametros:
+            print("Aviso: la ejecución a comparar usó otros parámetros", file=sys.stderr)
+        resultado["regresiones"] = comparar(resultado, base, argumentos.tolerancia)
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if salida:
+        with open(salida, "w", encoding="utf-8") as archivo:
+            archivo.write(texto + "\n")
+    else:
+        print(texto)
+
+    for regresion in resultado.get("regresiones", []):
+        print(f"Regresión en {regresion['caso']}: {regresion['anterior']:.4f} s -> "
+              f"{regresion['actual']:.4f} s (+{regresion['cambio']:.0%})", file=sys.stderr)
+    sys.exit(1 if resultado.get("regresiones") else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from .config import MIN_ARCHIVOS_PARALELO
+from .almacenamiento import existe_diario, leer_categoria
+from .motor import usa_sqlite
+from .almacenamiento_sqlite import contar_valores
+from .lector_csv import a_precio, a_entero, iterar_productos, iterar_valores
+
+#Resumen de una o varias categorías, calculado en una sola pasada.
+#Los valores se cuentan en un Counter (valor -> apariciones): la memoria depende
+#de cuántos precios y stocks distintos hay, no de la cantidad de productos,
+#y así se pueden obtener mínimo, máximo y mediana exactos.
+def nuevo_resumen() -> dict:
+    return {
+        "cantidad_precio": 0, "suma_precio": 0.0, "precios": Counter(),
+        "cantidad_stock": 0, "suma_stock": 0, "stocks": Counter(),
+    }
+
+#Suma al resumen un precio y un stock ya convertidos (None si son inválidos)
+def acumular_valores(resumen: dict, precio, stock) -> None:
+    if precio is not None:
+        resumen["cantidad_precio"] += 1
+        resumen["suma_precio"] += precio
+        resumen["precios"][precio] += 1
+    if stock is not None:
+        resumen["cantidad_stock"] += 1
+        resumen["suma_stock"] += stock
+        resumen["stocks"][stock] += 1
+
+#Suma un producto al resumen
+def acumular(resumen: dict, producto: dict) -> None:
+    acumular_valores(resumen, a_precio(producto.get("Precio")), a_entero(producto.get("Stock")))
+
+#Suma el resumen origen dentro del resumen destino
+def combinar(destino: dict, origen: dict) -> dict:
+    for clave in ("cantidad_precio", "suma_precio", "cantidad_stock", "suma_stock"):
+        destino[clave] += origen[clave]
+    destino["precios"].update(origen["precios"])
+    destino["stocks"].update(origen["stocks"])
+    return destino
+
+def _mediana(valores: Counter, cantidad: int) -> float:
+    if cantidad == 0:
+        return None
+    # Posiciones (base 0) de los elementos centrales
+    medio_bajo = (cantidad - 1) // 2
+    medio_alto = cantidad // 2
+    vistos = 0
+    bajo = None
+    for valor in sorted(valores):
+        vistos += valores[valor]
+        if bajo is None and vistos > medio_bajo:
+            bajo = valor
+        if vistos > medio_alto:
+            return (bajo + valor) / 2
+    return bajo
+
+def _describir_campo(cantidad: int, suma: float, valores: Counter) -> dict:
+    if cantidad == 0:
+        return None
+    return {
+        "cantidad": cantidad,
+        "promedio": suma / cantidad,
+        "minimo": min(valores),
+        "maximo": max(valores),
+        "mediana": _mediana(valores, cantidad),
+    }
+
+#Promedio, mínimo, máximo y mediana de precio y stock (None si no hay datos del campo)
+def describir(resumen: dict) -> dict:
+    return {
+        "precio": _describir_campo(resumen["cantidad_precio"], resumen["suma_precio"], resumen["precios"]),
+        "stock": _describir_campo(resumen["cantidad_stock"], resumen["suma_stock"], resumen["stocks"]),
+    }
+
+#Recorre las filas de un CSV de a una, sin cargar el archivo completo.
+#Si la categoría tiene operaciones pendientes en el diario hay que aplicarlas, y se lee entera
+def iterar_filas(ruta: str):
+    if existe_diario(ruta):
+        yield from leer_categoria(ruta)
+        return
+    yield from iterar_productos(ruta)
+
+#Resumen de una categoría SQLite a partir de los valores agrupados por la base
+def _resumir_sqlite(ruta: str) -> dict:
+    resumen = nuevo_resumen()
+    for texto, veces in contar_valores(ruta, "Precio"):
+        precio = a_precio(texto)
+        if precio is not None:
+            resumen["cantidad_precio"] += veces
+            resumen["suma_precio"] += precio * veces
+            resumen["precios"][precio] += veces
+    for texto, veces in contar_valores(ruta, "Stock"):
+        stock = a_entero(texto)
+        if stock is not None:
+            resumen["cantidad_stock"] += veces
+            resumen["suma_stock"] += stock * veces
+            resumen["stocks"][stock] += veces
+    return resumen
+
+#Resume un archivo en una sola pasada
+def resumir_archivo(ruta: str) -> dict:
+    if usa_sqlite():
+        return _resumir_sqlite(ruta)
+    resumen = nuevo_resumen()
+    try:
+        if existe_diario(ruta):
+            for producto in leer_categoria(ruta):
+                acumular(resumen, producto)
+        else:
+            # Sin diario alcanza con los números de cada fila, sin armar diccionarios
+            for precio, stock in iterar_valores(ruta):
+                acumular_valores(resumen, precio, stock)
+    except OSError as e:
+        print(f"Error al leer el archivo '{ruta}': {e}")
+    return resumen
+
+#Resume varios archivos (en procesos si son muchos; con SQLite agrupa la base en este proceso).
+#Retorna el resumen de cada ruta y el global
+def resumir_archivos(rutas: list) -> tuple:
+    if len(rutas) >= MIN_ARCHIVOS_PARALELO and not usa_sqlite():
+        with ProcessPoolExecutor() as pool:
+            lote = max(1, len(rutas) // (4 * (os.cpu_count() or 1)))
+            resumenes = list(pool.map(resumir_archivo, rutas, chunksize=lote))
+    else:
+        resumenes = [resumir_archivo(ruta) for ruta in rutas]
+
+    total = nuevo_resumen()
+    for resumen in resumenes:
+        combinar(total, resumen)
+    return dict(zip(rutas, resumenes)), total
@@ -0,0 +1,252 @@
+import os
+import csv
+import json
+import zlib
+import shutil
+import tempfile
+import threading
+from . import config
+from .config import ENCABEZADOS, EXTENSION_DIARIO, EXTENSION_MAXIMO, TAMANO_MAXIMO_DIARIO
+from .bloqueos import bloquear_categoria
+from .instrumentacion import instrumentar, tamano
+from .lector_csv import leer_texto, a_productos
+
+#Las escrituras de una categoría (diario, reescritura, compactación) se hacen con la
+#categoría bloqueada, para que ni el hilo de compactación ni otro proceso las pisen
+_compactaciones = {}
+#Diarios escritos sin fsync (con config.SINCRONIZAR_DIARIO desactivado) que todavía no se sincronizaron
+_sin_sincronizar = set()
+
+#Fuerza a disco la entrada de directorio (necesario para que el rename sobreviva a un corte)
+def _sincronizar_carpeta(carpeta: str) -> None:
+    try:
+        descriptor = os.open(carpeta, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+#Escribe el CSV completo en un archivo temporal de la misma carpeta y lo
+#reemplaza de forma atómica. Ante un corte queda el archivo viejo o el nuevo, nunca uno truncado
+@instrumentar("escribir_atomico", lambda a, r: {"bytes_escritos": tamano(a[0])})
+def escribir_atomico(ruta: str, datos: list, campos: list) -> None:
+    carpeta = os.path.dirname(ruta) or "."
+    descriptor, temporal = tempfile.mkstemp(prefix=f".{os.path.basename(ruta)}.", suffix=".tmp", dir=carpeta)
+    try:
+        with os.fdopen(descriptor, "w", newline="", encoding="utf-8") as archivo:
+            writer = csv.DictWriter(archivo, fieldnames=campos)
+            writer.writeheader()
+            writer.writerows(datos)
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        if os.path.exists(ruta):
+            shutil.copymode(ruta, temporal)
+        else:
+            os.chmod(temporal, 0o644)
+        os.replace(temporal, ruta)
+    except BaseException:
+        try:
+            os.remove(temporal)
+        except OSError:
+            pass
+        raise
+    _sincronizar_carpeta(carpeta)
+
+#Ruta del diario de operaciones de una categoría
+def ruta_diario(ruta: str) -> str:
+    return ruta + EXTENSION_DIARIO
+
+def existe_diario(ruta: str) -> bool:
+    return os.path.exists(ruta_diario(ruta))
+
+#Mayor ID asignado guardado para las bajas con marca (0 si no hay ninguno)
+def leer_maximo_id(ruta: str) -> int:
+    try:
+        with open(ruta + EXTENSION_MAXIMO, encoding="utf-8") as archivo:
+            texto = archivo.read().strip()
+    except OSError:
+        return 0
+    return int(texto) if texto.isdigit() else 0
+
+#Guarda el mayor ID asignado si supera al guardado. Se escribe de forma atómica y
+#sincronizado, antes de registrar la baja que lo deja sin fila
+def guardar_maximo_id(ruta: str, maximo: int) -> None:
+    if maximo <= leer_maximo_id(ruta):
+        return
+    destino = ruta + EXTENSION_MAXIMO
+    temporal = destino + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as archivo:
+        archivo.write(f"{maximo}\n")
+        archivo.flush()
+        os.fsync(archivo.fileno())
+    os.replace(temporal, destino)
+    _sincronizar_carpeta(os.path.dirname(ruta) or ".")
+
+#Suma de verificación del CSV base. El diario la guarda en su primera línea
+#para saber sobre qué versión del archivo se registraron las operaciones
+def _suma_base(ruta: str) -> int:
+    try:
+        with open(ruta, "rb") as archivo:
+            return zlib.crc32(archivo.read())
+    except FileNotFoundError:
+        return 0
+
+#Agrega operaciones al diario de la categoría con un solo fsync.
+#Con config.SINCRONIZAR_DIARIO desactivado el fsync queda pendiente hasta sincronizar_diarios,
+#para que quien hace muchos cambios seguidos (lote.py) sincronice cada diario una vez antes
+#de informarlos.
+#Cada operación es un diccionario: {"op": "alta", "fila": {...}},
+#{"op": "modificar", "id": "3", "campos": {...}} o {"op": "eliminar", "id": "3", "renumerar": True}
+@instrumentar("escribir_diario", lambda a, r: {"operaciones": len(a[1])})
+def registrar_operaciones(ruta: str, operaciones: list) -> None:
+    diario = ruta_diario(ruta)
+    with bloquear_categoria(ruta):
+        lineas = []
+        if not os.path.exists(diario) or os.path.getsize(diario) == 0:
+            lineas.append(json.dumps({"base": _suma_base(ruta)}))
+        lineas.extend(json.dumps(op, ensure_ascii=False) for op in operaciones)
+        with open(diario, "a", encoding="utf-8") as archivo:
+            archivo.write("\n".join(lineas) + "\n")
+            if config.SINCRONIZAR_DIARIO:
+                archivo.flush()
+                os.fsync(archivo.fileno())
+            else:
+                _sin_sincronizar.add(diario)
+
+#Hace el fsync pendiente de los diarios escritos sin sincronizar, una vez por diario.
+#Si un diario ya se compactó no hace falta: la compactación escribe el CSV sincronizado
+def sincronizar_diarios() -> None:
+    while _sin_sincronizar:
+        diario = _sin_sincronizar.pop()
+        try:
+            with open(diario, "ab") as archivo:
+                os.fsync(archivo.fileno())
+        except FileNotFoundError:
+            pass
+
+#Lee las operaciones del diario que corresponden al CSV base indicado.
+#Si el diario quedó de una versión anterior (ya compactada) se ignora,
+#y una última línea incompleta por un corte se descarta
+def leer_diario(ruta: str, suma_base: int) -> list:
+    try:
+        with open(ruta_diario(ruta), encoding="utf-8") as archivo:
+            lineas = archivo.read().splitlines()
+    except FileNotFoundError:
+        return []
+
+    operaciones = []
+    for numero, linea in enumerate(lineas):
+        try:
+            registro = json.loads(linea)
+        except ValueError:
+            continue
+        if numero == 0:
+            if registro.get("base") != suma_base:
+                return []
+            continue
+        operaciones.append(registro)
+    return operaciones
+
+#Índice ID -> posición (la primera aparición de cada ID)
+def indexar_ids(productos: list) -> dict:
+    indice = {}
+    for posicion, producto in enumerate(productos):
+        indice.setdefault(producto.get("ID"), posicion)
+    return indice
+
+#Aplica sobre la lista de productos las operaciones del diario (modifica la lista recibida).
+#Las modificaciones ubican la fila con un índice ID -> posición, que se puede pasar ya armado;
+#retorna el índice actualizado (None si una baja lo dejó inválido)
+def aplicar_operaciones(productos: list, operaciones: list, indice: dict = None) -> dict:
+    for op in operaciones:
+        tipo = op.get("op")
+        if tipo == "alta":
+            if indice is not None:
+                indice.setdefault(op["fila"].get("ID"), len(productos))
+            productos.append(dict(op["fila"]))
+        elif tipo == "modificar":
+            if indice is None:
+                indice = indexar_ids(productos)
+            posicion = indice.get(op["id"])
+            if posicion is not None:
+                productos[posicion].update(op["campos"])
+        elif tipo == "eliminar":
+            productos[:] = [p for p in productos if p.get("ID") != op["id"]]
+            if op.get("renumerar", True):
+                for idx, producto in enumerate(productos, 1):
+                    producto["ID"] = str(idx)
+            indice = None
+    return indice
+
+#Lee una categoría completa: el CSV base más las operaciones pendientes del diario
+@instrumentar("parsear_csv", lambda a, r: {"filas": len(r), "bytes_leidos": tamano(a[0]) + tamano(ruta_diario(a[0]))})
+def leer_categoria(ruta: str) -> list[dict]:
+    with open(ruta, "rb") as archivo:
+        contenido = archivo.read()
+    campos, filas = leer_texto(contenido.decode("utf-8"))
+    productos = a_productos(campos, filas) if campos else []
+    if existe_diario(ruta):
+        aplicar_operaciones(productos, leer_diario(ruta, zlib.crc32(contenido)))
+    return productos
+
+#Reescribe la categoría con los datos indicados y descarta el diario,
+#porque los datos ya incluyen sus operaciones
+def guardar_categoria(ruta: str, datos: list, campos: list) -> None:
+    with bloquear_categoria(ruta):
+        escribir_atomico(ruta, datos, campos)
+        try:
+            os.remove(ruta_diario(ruta))
+        except FileNotFoundError:
+            pass
+
+#Reemplaza la categoría por un CSV ya escrito (por ejemplo, el resultado de un
+#ordenamiento externo) y descarta el diario
+def reemplazar_categoria(ruta: str, nuevo: str) -> None:
+    with bloquear_categoria(ruta):
+        os.replace(nuevo, ruta)
+        try:
+            os.remove(ruta_diario(ruta))
+        except FileNotFoundError:
+            pass
+    _sincronizar_carpeta(os.path.dirname(ruta) or ".")
+
+#Vuelca el diario sobre el CSV y lo elimina
+def compactar(ruta: str) -> None:
+    if not existe_diario(ruta):
+        return
+    with bloquear_categoria(ruta):
+        # Otro proceso pudo haberla compactado mientras se esperaba el bloqueo
+        if not existe_diario(ruta):
+            return
+        datos = leer_categoria(ruta)
+        escribir_atomico(ruta, datos, ENCABEZADOS)
+        try:
+            os.remove(ruta_diario(ruta))
+        except FileNotFoundError:
+            pass
+
+#Lanza la compactación en un hilo si el diario superó el tamaño máximo
+def programar_compactacion(ruta: str) -> None:
+    try:
+        tamano = os.path.getsize(ruta_diario(ruta))
+    except OSError:
+        return
+    if tamano < TAMANO_MAXIMO_DIARIO:
+        return
+    clave = os.path.normpath(ruta)
+    hilo = _compactaciones.get(clave)
+    if hilo is not None and hilo.is_alive():
+        return
+    hilo = threading.Thread(target=compactar, args=(ruta,), daemon=True)
+    _compactaciones[clave] = hilo
+    hilo.start()
+
+#Espera a que terminen las compactaciones en curso (se llama al salir del programa)
+def esperar_compactaciones() -> None:
+    for hilo in list(_compactaciones.values()):
+        hilo.join()
+    _compactaciones.clear()
@@ -0,0 +1,309 @@
+import os
+import sqlite3
+import threading
+from itertools import islice
+from . import config
+from .config import RUTA_BASE, NOMBRE_CSV, ENCABEZADOS
+from .lector_csv import a_precio, a_entero
+from .instrumentacion import instrumentar
+
+#Motor SQLite: todo el catálogo en un solo archivo (config.RUTA_SQLITE).
+#Las categorías se siguen identificando por la ruta de su Productos.csv, así el
+#resto del sistema no distingue entre motores; en la base se guarda la ruta relativa
+#a la carpeta base ("Bebidas/Gaseosas/Zero"). Los valores se guardan como texto,
+#igual que en el CSV, y "posicion" conserva el orden de las filas.
+#Cada escritura es una transacción que además incrementa la versión de la categoría,
+#que es lo que usan las cachés como firma.
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS categorias (
+    id INTEGER PRIMARY KEY,
+    ruta TEXT NOT NULL UNIQUE,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS productos (
+    categoria INTEGER NOT NULL REFERENCES categorias(id) ON DELETE CASCADE,
+    posicion INTEGER NOT NULL,
+    id TEXT,
+    nombre TEXT,
+    precio TEXT,
+    stock TEXT
+);
+CREATE TABLE IF NOT EXISTS maximos (
+    categoria INTEGER PRIMARY KEY REFERENCES categorias(id) ON DELETE CASCADE,
+    maximo INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS productos_categoria ON productos(categoria, posicion);
+CREATE INDEX IF NOT EXISTS productos_id ON productos(categoria, id);
+CREATE INDEX IF NOT EXISTS productos_nombre ON productos(nombre);
+"""
+
+#Columna de la tabla productos para cada encabezado del CSV
+COLUMNAS = {"ID": "id", "Nombre": "nombre", "Precio": "precio", "Stock": "stock"}
+
+_conexiones = {}
+_lock = threading.RLock()
+
+#Conexión a la base configurada (una por archivo, compartida entre hilos y protegida por _lock)
+def _conexion() -> sqlite3.Connection:
+    ruta = config.RUTA_SQLITE
+    conexion = _conexiones.get(ruta)
+    if conexion is None:
+        conexion = sqlite3.connect(ruta, check_same_thread=False)
+        conexion.execute("PRAGMA journal_mode=WAL")
+        conexion.execute("PRAGMA foreign_keys=ON")
+        conexion.executescript(_ESQUEMA)
+        # lower() de SQLite solo convierte letras ASCII; los filtros usan el de Python
+        conexion.create_function("minusculas", 1, lambda texto: (texto or "").lower(), deterministic=True)
+        # Claves de orden con la misma conversión que el resto del sistema (inválidos como 0)
+        conexion.create_function("a_precio", 1, lambda texto: a_precio(texto) or 0, deterministic=True)
+        conexion.create_function("a_entero", 1, lambda texto: a_entero(texto) or 0, deterministic=True)
+        _conexiones[ruta] = conexion
+    return conexion
+
+#Cierra las conexiones abiertas (por ejemplo antes de mover o borrar la base)
+def cerrar() -> None:
+    with _lock:
+        for conexion in _conexiones.values():
+            conexion.close()
+        _conexiones.clear()
+
+#"Supermercado/Bebidas/Zero/Productos.csv" -> "Bebidas/Zero"
+def clave_categoria(ruta: str) -> str:
+    carpeta = os.path.dirname(os.path.normpath(ruta))
+    return os.path.relpath(carpeta, RUTA_BASE).replace(os.sep, "/")
+
+#"Bebidas/Zero" -> "Supermercado/Bebidas/Zero/Productos.csv"
+def ruta_de_clave(clave: str) -> str:
+    return os.path.normpath(os.path.join(RUTA_BASE, *clave.split("/"), NOMBRE_CSV))
+
+def _id_categoria(conexion, ruta: str, crear: bool = False) -> int:
+    clave = clave_categoria(ruta)
+    fila = conexion.execute("SELECT id FROM categorias WHERE ruta = ?", (clave,)).fetchone()
+    if fila is not None:
+        return fila[0]
+    if not crear:
+        return None
+    return conexion.execute("INSERT INTO categorias (ruta) VALUES (?)", (clave,)).lastrowid
+
+def _incrementar_version(conexion, categoria: int) -> None:
+    conexion.execute("UPDATE categorias SET version = version + 1 WHERE id = ?", (categoria,))
+
+def _a_producto(fila: tuple) -> dict:
+    return dict(zip(ENCABEZADOS, fila))
+
+def _valores(producto: dict) -> tuple:
+    return tuple(producto.get(campo) for campo in ENCABEZADOS)
+
+#Rutas (de Productos.csv) de todas las categorías
+def listar_hojas() -> list:
+    with _lock:
+        claves = [fila[0] for fila in _conexion().execute("SELECT ruta FROM categorias ORDER BY ruta")]
+    return [ruta_de_clave(clave) for clave in claves]
+
+def existe_categoria(ruta: str) -> bool:
+    with _lock:
+        return _id_categoria(_conexion(), ruta) is not None
+
+#Indica si la carpeta tiene alguna categoría debajo (o es una categoría)
+def existe_carpeta(carpeta: str) -> bool:
+    clave = os.path.relpath(os.path.normpath(carpeta), RUTA_BASE).replace(os.sep, "/")
+    if clave == ".":
+        return True
+    with _lock:
+        fila = _conexion().execute(
+            "SELECT 1 FROM categorias WHERE ruta = ? OR substr(ruta, 1, ?) = ? LIMIT 1",
+            (clave, len(clave) + 1, clave + "/")).fetchone()
+    return fila is not None
+
+#Versión de la categoría (None si no existe)
+def firma_categoria(ruta: str) -> tuple:
+    with _lock:
+        fila = _conexion().execute("SELECT version FROM categorias WHERE ruta = ?",
+                                   (clave_categoria(ruta),)).fetchone()
+    return ("sqlite", fila[0]) if fila is not None else None
+
+#Crea la categoría vacía si no existe
+def crear_categoria(ruta: str) -> None:
+    with _lock:
+        conexion = _conexion()
+        with conexion:
+            _id_categoria(conexion, ruta, crear=True)
+
+@instrumentar("leer_sqlite", lambda a, r: {"filas": len(r)})
+def leer_categoria(ruta: str) -> list[dict]:
+    with _lock:
+        conexion = _conexion()
+        categoria = _id_categoria(conexion, ruta)
+        if categoria is None:
+            raise FileNotFoundError(ruta)
+        filas = conexion.execute(
+            "SELECT id, nombre, precio, stock FROM productos WHERE categoria = ? ORDER BY posicion",
+            (categoria,)).fetchall()
+    return [_a_producto(fila) for fila in filas]
+
+#Valores distintos de un campo y cuántas veces aparece cada uno, agrupados por la base
+#(las estadísticas se calculan sobre esto sin traer las filas)
+def contar_valores(ruta: str, campo: str) -> list:
+    columna = COLUMNAS[campo]
+    with _lock:
+        conexion = _conexion()
+        categoria = _id_categoria(conexion, ruta)
+        if categoria is None:
+            return []
+        return conexion.execute(
+            f"SELECT {columna}, COUNT(*) FROM productos WHERE categoria = ? GROUP BY {columna}",
+            (categoria,)).fetchall()
+
+def contar_productos(ruta: str) -> int:
+    with _lock:
+        conexion = _conexion()
+        categoria = _id_categoria(conexion, ruta)
+        if categoria is None:
+            return 0
+        return conexion.execute("SELECT COUNT(*) FROM productos WHERE categoria = ?", (categoria,)).fetchone()[0]
+
+#Productos desde la posición indicada (base 0), opcionalmente solo los que contienen
+#el filtro en el nombre (sin distinguir mayúsculas)
+def leer_pagina(ruta: str, desde: int, cantidad: int, filtro: str = None) -> list[dict]:
+    condicion, parametros = "", ()
+    if filtro:
+        condicion, parametros = " AND instr(minusculas(nombre), ?) > 0", (filtro.lower(),)
+    with _lock:
+        conexion = _conexion()
+        categoria = _id_categoria(conexion, ruta)
+        if categoria is None:
+            return []
+        filas = conexion.execute(
+            f"SELECT id, nombre, precio, stock FROM productos WHERE categoria = ?{condicion} "
+            "ORDER BY posicion LIMIT ? OFFSET ?", (categoria, *parametros, cantidad, desde)).fetchall()
+    return [_a_producto(fila) for fila in filas]
+
+#Producto por ID con una consulta sobre el índice (None si no existe)
+def leer_fila(ruta: str, id_producto: str) -> dict:
+    with _lock:
+        conexion = _conexion()
+        categoria = _id_categoria(conexion, ruta)
+        if categoria is None:
+            return None
+        fila = conexion.execute(
+            "SELECT id, nombre, precio, stock FROM productos WHERE categoria = ? AND id = ? "
+            "ORDER BY posicion LIMIT 1", (categoria, id_producto)).fetchone()
+    return _a_producto(fila) if fila is not None else None
+
+def _reemplazar(conexion, categoria: int, datos: list) -> None:
+    conexion.execute("DELETE FROM productos WHERE categoria = ?", (categoria,))
+    conexion.executemany(
+        "INSERT INTO productos (categoria, posicion, id, nombre, precio, stock) VALUES (?, ?, ?, ?, ?, ?)",
+        ((categoria, posicion) + _valores(producto) for posicion, producto in enumerate(datos)))
+    _incrementar_version(conexion, categoria)
+
+#Reemplaza todos los productos de la categoría en una transacción.
+#campos se recibe por compatibilidad con el motor CSV: las columnas son siempre las de ENCABEZADOS
+def guardar_categoria(ruta: str, datos: list, campos: list = ENCABEZADOS) -> None:
+    with _lock:
+        conexion = _conexion()
+        with conexion:
+            _reemplazar(conexion, _id_categoria(conexion, ruta, crear=True), datos)
+
+#Mayor ID asignado guardado para las bajas con marca (0 si no hay ninguno)
+def leer_maximo_id(ruta: str) -> int:
+    with _lock:
+        fila = _conexion().execute(
+            "SELECT maximo FROM maximos JOIN categorias ON categorias.id = maximos.categoria WHERE ruta = ?",
+            (clave_categoria(ruta),)).fetchone()
+    return fila[0] if fila is not None else 0
+
+#Guarda el mayor ID asignado si supera al guardado
+def guardar_maximo_id(ruta: str, maximo: int) -> None:
+    with _lock:
+        conexion = _conexion()
+        with conexion:
+            conexion.execute(
+                "INSERT INTO maximos (categoria, maximo) VALUES (?, ?) "
+                "ON CONFLICT(categoria) DO UPDATE SET maximo = MAX(maximo, excluded.maximo)",
+                (_id_categoria(conexion, ruta, crear=True), maximo))
+
+#Reemplaza los productos de la categoría con los de un iterable, insertándolos de a lote
+#filas para no tenerla entera en memoria. Todo en una transacción; retorna las filas copiadas
+def guardar_categoria_por_lotes(ruta: str, productos, lote: int) -> int:
+    cantidad = 0
+    with _lock:
+        conexion = _conexion()
+        with conexion:
+            categoria = _id_categoria(conexion, ruta, crear=True)
+            conexion.execute("DELETE FROM productos WHERE categoria = ?", (categoria,))
+            filas = ((categoria, posicion) + _valores(producto) for posicion, producto in enumerate(productos))
+            while True:
+                bloque = list(islice(filas, lote))
+                if not bloque:
+                    break
+                conexion.executemany(
+                    "INSERT INTO productos (categoria, posicion, id, nombre, precio, stock) VALUES (?, ?, ?, ?, ?, ?)",
+                    bloque)
+                cantidad += len(bloque)
+            _incrementar_version(conexion, categoria)
+    return cantidad
+
+#Reordena la categoría según claves [(campo, descendente)] y renumera los IDs.
+#El ORDER BY lo resuelve SQLite, que usa archivos temporales si la categoría no entra en memoria.
+#Retorna ID anterior -> ID nuevo de los productos que cambiaron de ID
+def ordenar_categoria(ruta: str, claves: list) -> dict:
+    funciones = {"Precio": "a_precio", "Stock": "a_entero", "ID": "a_entero"}
+    orden = ", ".join(f"{funciones[campo]}({COLUMNAS[campo]}){' DESC' if desc else ''}" for campo, desc in claves)
+    with _lock:
+        conexion = _conexion()
+        with conexion:
+            categoria = _id_categoria(conexion, ruta)
+            if categoria is None:
+                raise FileNotFoundError(ruta)
+            conexion.execute("CREATE TEMP TABLE IF NOT EXISTS nuevo_orden (fila INTEGER PRIMARY KEY, numero INTEGER)")
+            conexion.execute("DELETE FROM nuevo_orden")
+            conexion.execute(
+                f"INSERT INTO nuevo_orden SELECT rowid, ROW_NUMBER() OVER (ORDER BY {orden}, posicion) "
+                "FROM productos WHERE categoria = ?", (categoria,))
+            renumerados = dict(conexion.execute(
+                "SELECT productos.id, nuevo_orden.numero FROM productos JOIN nuevo_orden ON nuevo_orden.fila = productos.rowid "
+                "WHERE categoria = ? AND productos.id IS NOT CAST(nuevo_orden.numero AS TEXT)", (categoria,)))
+            conexion.execute(
+                "UPDATE productos SET posicion = (SELECT numero FROM nuevo_orden WHERE fila = productos.rowid), "
+                "id = CAST((SELECT numero FROM nuevo_orden WHERE fila = productos.rowid) AS TEXT) "
+                "WHERE categoria = ?", (categoria,))
+            conexion.execute("DELETE FROM nuevo_orden")
+            _incrementar_version(conexion, categoria)
+    return renumerados
+
+#Aplica operaciones con el mismo formato y efecto que las del diario del motor CSV
+#(ver almacenamiento.aplicar_operaciones), todas en una sola transacción
+def registrar_operaciones(ruta: str, operaciones: list) -> None:
+    with _lock:
+        conexion = _conexion()
+        with conexion:
+            categoria = _id_categoria(conexion, ruta, crear=True)
+            for op in operaciones:
+                tipo = op.get("op")
+                if tipo == "alta":
+                    siguiente = conexion.execute(
+                        "SELECT COALESCE(MAX(posicion), -1) + 1 FROM productos WHERE categoria = ?",
+                        (categoria,)).fetchone()[0]
+                    conexion.execute(
+                        "INSERT INTO productos (categoria, posicion, id, nombre, precio, stock) "
+                        "VALUES (?, ?, ?, ?, ?, ?)", (categoria, siguiente) + _valores(op["fila"]))
+                elif tipo == "modificar":
+                    cambios = {COLUMNAS[c]: v for c, v in op["campos"].items() if c in COLUMNAS}
+                    if not cambios:
+                        continue
+                    asignaciones = ", ".join(f"{columna} = ?" for columna in cambios)
+                    conexion.execute(
+                        f"UPDATE productos SET {asignaciones} WHERE rowid = ("
+                        "SELECT rowid FROM productos WHERE categoria = ? AND id = ? ORDER BY posicion LIMIT 1)",
+                        (*cambios.values(), categoria, op["id"]))
+                elif tipo == "eliminar":
+                    conexion.execute("DELETE FROM productos WHERE categoria = ? AND id = ?",
+                                     (categoria, op["id"]))
+                    if op.get("renumerar", True):
+                        filas = conexion.execute(
+                            "SELECT rowid FROM productos WHERE categoria = ? ORDER BY posicion",
+                            (categoria,)).fetchall()
+                        conexion.executemany("UPDATE productos SET id = ? WHERE rowid = ?",
+                                             ((str(idx), fila[0]) for idx, fila in enumerate(filas, 1)))
+            _incrementar_version(conexion, categoria)
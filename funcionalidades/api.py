@@ -0,0 +1,234 @@
+import os
+from datetime import datetime, timedelta, time as hora
+from .config import RUTA_BASE, NOMBRE_CSV
+from .validar_inputs import texto_correcto, numero_correcto, id_correcto, parse_precio
+from .cache_catalogo import obtener_productos, cantidad_productos, firma_categoria
+from .bloqueos import metricas_bloqueos
+from .motor import listar_hojas, existe_categoria, existe_carpeta
+from .indice_nombres import buscar_por_nombre
+from .agregados import describir
+from .estadisticas import resumen_categoria, resumen_global, resumen_carpeta
+from .consultas import rango as rango_jerarquia, top as top_jerarquia
+from .historial import estado_en, trayectoria as trayectoria_producto
+from .ordenamiento import normalizar_claves, ordenar_jerarquia as ordenar_jerarquia_csv
+from .funciones import (alta_items_lote, buscar_producto, modificar_producto, eliminar_producto,
+                        ordenar_productos, guardar_orden, guardar_orden_externo)
+
+#Operaciones del sistema sin menú ni input(), para usar desde scripts.
+#Las categorías se indican con su ruta dentro de la carpeta base, por ejemplo
+#"Bebidas/Gaseosas/Zero". Los errores se informan con ValueError.
+
+#Ruta del CSV que corresponde a una categoría, exista o no
+def armar_ruta(categoria: str) -> str:
+    partes = [p for p in categoria.replace("\\", "/").split("/") if p]
+    if not partes or any(p in (".", "..") for p in partes):
+        raise ValueError(f"Categoría inválida: '{categoria}'")
+    return os.path.join(RUTA_BASE, *partes, NOMBRE_CSV)
+
+#Ruta del CSV de una categoría hoja
+def ruta_categoria(categoria: str) -> str:
+    ruta = armar_ruta(categoria)
+    if not existe_categoria(ruta):
+        raise ValueError(f"Categoría inexistente: '{categoria}'")
+    return ruta
+
+#Nombre de la categoría ("Bebidas/Gaseosas/Zero") a partir de la ruta de su CSV
+def nombre_categoria(ruta: str) -> str:
+    return os.path.relpath(os.path.dirname(ruta), RUTA_BASE).replace(os.sep, "/")
+
+def _validar_producto(nombre: str, precio: str, stock: str) -> dict:
+    nombre, precio, stock = str(nombre).strip(), str(precio).strip(), str(stock).strip()
+    if not texto_correcto(nombre):
+        raise ValueError("El nombre no puede estar vacío")
+    if not numero_correcto(precio):
+        raise ValueError(f"Precio inválido: '{precio}'")
+    if not numero_correcto(stock):
+        raise ValueError(f"Stock inválido: '{stock}'")
+    return {"Nombre": nombre, "Precio": precio, "Stock": stock}
+
+def _validar_id(id_producto) -> str:
+    id_producto = str(id_producto).strip()
+    if not id_correcto(id_producto):
+        raise ValueError(f"ID inválido: '{id_producto}'")
+    return id_producto
+
+#Todas las categorías hoja
+def listar_categorias() -> list:
+    return sorted(nombre_categoria(ruta) for ruta in listar_hojas())
+
+#Da de alta un producto y retorna su ID
+def agregar(categoria: str, nombre: str, precio: str, stock: str) -> str:
+    return agregar_lote(categoria, [{"Nombre": nombre, "Precio": precio, "Stock": stock}])[0]
+
+#Da de alta varios productos con una sola escritura y retorna sus IDs
+def agregar_lote(categoria: str, productos: list) -> list:
+    ruta = ruta_categoria(categoria)
+    validados = [_validar_producto(p["Nombre"], p["Precio"], p["Stock"]) for p in productos]
+    ids = alta_items_lote(ruta, validados)
+    if validados and not ids:
+        raise ValueError(f"No se pudo escribir en '{categoria}'")
+    return ids
+
+#Productos de una categoría
+def listar(categoria: str) -> list:
+    return obtener_productos(ruta_categoria(categoria))
+
+#Producto por ID
+def obtener(categoria: str, id_producto: str) -> dict:
+    producto = buscar_producto(ruta_categoria(categoria), _validar_id(id_producto))
+    if producto is None:
+        raise ValueError(f"ID no encontrado: {id_producto}")
+    return producto
+
+#Busca por nombre en todas las categorías (o solo en una).
+#Cada resultado incluye la clave "Categoría"
+def buscar(texto: str, categoria: str = None, prefijo: bool = False) -> list:
+    ruta = ruta_categoria(categoria) if categoria else None
+    resultados = []
+    for ruta_csv, producto in buscar_por_nombre(texto, prefijo=prefijo):
+        if ruta is None or os.path.normpath(ruta_csv) == os.path.normpath(ruta):
+            resultados.append({"Categoría": nombre_categoria(ruta_csv), **producto})
+    return resultados
+
+#Modifica nombre, precio y/o stock de un producto y retorna cómo quedó
+def actualizar(categoria: str, id_producto: str, nombre: str = None, precio: str = None, stock: str = None) -> dict:
+    ruta = ruta_categoria(categoria)
+    cambios = {}
+    if nombre is not None:
+        if not texto_correcto(str(nombre).strip()):
+            raise ValueError("El nombre no puede estar vacío")
+        cambios["Nombre"] = str(nombre).strip()
+    if precio is not None:
+        if not numero_correcto(str(precio).strip()):
+            raise ValueError(f"Precio inválido: '{precio}'")
+        cambios["Precio"] = str(precio).strip()
+    if stock is not None:
+        if not numero_correcto(str(stock).strip()):
+            raise ValueError(f"Stock inválido: '{stock}'")
+        cambios["Stock"] = str(stock).strip()
+    if not cambios:
+        raise ValueError("No se indicó ningún cambio")
+
+    producto = modificar_producto(ruta, _validar_id(id_producto), cambios)
+    if producto is None:
+        raise ValueError(f"ID no encontrado: {id_producto}")
+    return producto
+
+#Elimina un producto y retorna el producto eliminado
+def eliminar(categoria: str, id_producto: str) -> dict:
+    producto = eliminar_producto(ruta_categoria(categoria), _validar_id(id_producto))
+    if producto is None:
+        raise ValueError(f"ID no encontrado: {id_producto}")
+    return producto
+
+#Ordena una categoría por "Precio" o "Stock" (o varios: "Precio,Stock");
+#si guardar es True el orden queda en el archivo
+def ordenar(categoria: str, campo: str = "Precio", descendente: bool = False, guardar: bool = True) -> list:
+    claves = normalizar_claves(campo, descendente)
+    ruta = ruta_categoria(categoria)
+    firma_base = firma_categoria(ruta)
+    datos = ordenar_productos(ruta, claves)
+    # Si otro proceso cambió la categoría mientras se ordenaba, guardar_orden lanza ConflictoVersion
+    if guardar and datos and not guardar_orden(ruta, datos, firma_base):
+        raise ValueError(f"No se pudo escribir en '{categoria}'")
+    return datos
+
+#Ordena y guarda una categoría sin cargarla en memoria (ordenamiento externo).
+#Retorna la cantidad de productos
+def ordenar_en_disco(categoria: str, campo: str = "Precio", descendente: bool = False) -> int:
+    claves = normalizar_claves(campo, descendente)
+    ruta = ruta_categoria(categoria)
+    if not guardar_orden_externo(ruta, claves):
+        raise ValueError(f"No se pudo escribir en '{categoria}'")
+    return cantidad_productos(ruta)
+
+#Ordena los productos de todas las categorías juntos y los escribe en el CSV destino,
+#con la columna "Categoría". Retorna la cantidad de productos escritos
+def ordenar_todo(destino: str, campo: str = "Precio", descendente: bool = False) -> int:
+    return ordenar_jerarquia_csv(normalizar_claves(campo, descendente), destino)
+
+#Esperas por los bloqueos de categoría en este proceso (ver bloqueos.metricas_bloqueos)
+def esperas_bloqueos() -> dict:
+    return metricas_bloqueos()
+
+#Carpeta de una categoría que puede ser una hoja o una carpeta intermedia ("Bebidas");
+#sin categoría, la carpeta base
+def carpeta_categoria(categoria: str = None) -> str:
+    if not categoria:
+        return RUTA_BASE
+    carpeta = os.path.dirname(armar_ruta(categoria))
+    if not existe_categoria(os.path.join(carpeta, NOMBRE_CSV)) and not existe_carpeta(carpeta):
+        raise ValueError(f"Categoría inexistente: '{categoria}'")
+    return carpeta
+
+#Promedio, mínimo, máximo y mediana de precio y stock.
+#Sin categoría es el global; la categoría puede ser una hoja o una carpeta intermedia ("Bebidas")
+def estadisticas(categoria: str = None) -> dict:
+    if not categoria:
+        return describir(resumen_global()[1])
+    carpeta = carpeta_categoria(categoria)
+    if existe_categoria(os.path.join(carpeta, NOMBRE_CSV)):
+        return describir(resumen_categoria(os.path.join(carpeta, NOMBRE_CSV)))
+    return describir(resumen_carpeta(carpeta))
+
+def _limite_numerico(valor, nombre: str):
+    if valor is None or str(valor).strip() == "":
+        return None
+    numero = parse_precio(valor)
+    if numero is None:
+        raise ValueError(f"{nombre} inválido: '{valor}'")
+    return numero
+
+def _con_categoria(resultados: list) -> list:
+    return [{"Categoría": nombre_categoria(ruta), **producto} for ruta, producto in resultados]
+
+#Productos con "Precio" o "Stock" entre minimo y maximo (inclusive; cualquiera puede faltar),
+#de menor a mayor, en todo el catálogo o dentro de una categoría o carpeta.
+#Cada resultado incluye la clave "Categoría"
+def rango(campo: str, minimo=None, maximo=None, categoria: str = None, limite: int = None) -> list:
+    return _con_categoria(rango_jerarquia(campo, _limite_numerico(minimo, "Mínimo"), _limite_numerico(maximo, "Máximo"),
+                                          carpeta_categoria(categoria), limite=limite))
+
+#Los cantidad productos de mayor "Precio" o "Stock" (o de menor, con menores=True)
+def top(campo: str, cantidad: int = 10, categoria: str = None, menores: bool = False) -> list:
+    try:
+        cantidad = int(cantidad)
+    except (TypeError, ValueError):
+        raise ValueError(f"Cantidad inválida: '{cantidad}'")
+    return _con_categoria(top_jerarquia(campo, cantidad, not menores, carpeta_categoria(categoria)))
+
+#Informe de reposición: productos con stock menor que minimo, del menor stock al mayor
+def reposicion(minimo, categoria: str = None, limite: int = None) -> list:
+    return _con_categoria(rango_jerarquia("Stock", None, _limite_numerico(minimo, "Stock mínimo"),
+                                          carpeta_categoria(categoria), incluir_maximo=False, limite=limite))
+
+#Fecha "2026-10-01" (el final de ese día) o con hora: "2026-10-01T12:30"
+def _fecha(valor) -> datetime:
+    texto = str(valor).strip()
+    try:
+        momento = datetime.fromisoformat(texto)
+    except ValueError:
+        raise ValueError(f"Fecha inválida: '{valor}' (use AAAA-MM-DD o AAAA-MM-DDTHH:MM)")
+    if len(texto) == 10:
+        momento = datetime.combine(momento.date(), hora.max)
+    return momento
+
+#Precio y stock que tenía un producto en una fecha, según el historial de su categoría.
+#El producto se indica por su ID actual: el historial lo sigue aunque los IDs se hayan renumerado
+def historial_en(categoria: str, id_producto: str, fecha) -> dict:
+    id_producto = _validar_id(id_producto)
+    estado = estado_en(ruta_categoria(categoria), id_producto, _fecha(fecha))
+    if estado is None:
+        raise ValueError(f"Sin historial del ID {id_producto} en '{categoria}' hasta {fecha}")
+    return estado
+
+#Cambios de precio y stock de un producto en los últimos dias días (el primero es el
+#estado vigente al comienzo del período)
+def trayectoria(categoria: str, id_producto: str, dias=30) -> list:
+    try:
+        dias = float(dias)
+    except (TypeError, ValueError):
+        raise ValueError(f"Cantidad de días inválida: '{dias}'")
+    if dias < 0:
+        raise ValueError(f"Cantidad de días inválida: '{dias:g}'")
+    return trayectoria_producto(ruta_categoria(categoria), _validar_id(id_producto), datetime.now() - timedelta(days=dias))
@@ -0,0 +1,136 @@
+import os
+import time
+import zlib
+import threading
+from contextlib import contextmanager
+from . import config
+
+try:
+    import fcntl
+except ImportError:
+    # Sin fcntl (Windows) solo se bloquea entre hilos del mismo proceso
+    fcntl = None
+
+#Bloqueo por categoría, entre hilos y entre procesos. Cada operación que lee, calcula
+#y escribe una categoría lo hace dentro de bloquear_categoria, así dos operadores pueden
+#editar categorías distintas en paralelo y solo esperan si tocan la misma hoja.
+#En CSV se usa flock sobre "Productos.csv.lock" (no sobre el CSV, que se reemplaza al
+#reescribirlo); con SQLite, un byte por categoría de un archivo junto a la base.
+#El bloqueo es reentrante dentro del mismo hilo.
+
+#Una operación se basó en datos que otro proceso cambió antes de que pudiera guardar
+class ConflictoVersion(ValueError):
+    pass
+
+_bloqueos = {}
+_guardia = threading.Lock()
+_metricas = {}
+_archivo_sqlite = {}
+
+def _estado(clave: str) -> dict:
+    with _guardia:
+        if clave not in _bloqueos:
+            _bloqueos[clave] = {"lock": threading.RLock(), "nivel": 0, "archivo": None}
+        return _bloqueos[clave]
+
+#Descriptor compartido del archivo de bloqueos de SQLite. No se cierra: cerrar cualquier
+#descriptor del archivo liberaría todos los bloqueos de este proceso sobre él
+def _descriptor_sqlite() -> int:
+    ruta = config.RUTA_SQLITE + config.EXTENSION_BLOQUEO
+    with _guardia:
+        if ruta not in _archivo_sqlite:
+            _archivo_sqlite[ruta] = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o644)
+        return _archivo_sqlite[ruta]
+
+#Toma el bloqueo del sistema operativo; retorna (recurso, hubo que esperar)
+def _bloquear_sistema(clave: str) -> tuple:
+    if fcntl is None:
+        return None, False
+    if config.MOTOR == "sqlite":
+        descriptor = _descriptor_sqlite()
+        byte = zlib.crc32(clave.encode("utf-8"))
+        try:
+            fcntl.lockf(descriptor, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, byte)
+            return (descriptor, byte), False
+        except OSError:
+            fcntl.lockf(descriptor, fcntl.LOCK_EX, 1, byte)
+            return (descriptor, byte), True
+    try:
+        archivo = open(clave + config.EXTENSION_BLOQUEO, "ab")
+    except FileNotFoundError:
+        # La carpeta todavía no existe: no hay nada que otro proceso pueda estar escribiendo
+        return None, False
+    try:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return archivo, False
+    except OSError:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_EX)
+        return archivo, True
+
+def _liberar_sistema(recurso) -> None:
+    if recurso is None:
+        return
+    if isinstance(recurso, tuple):
+        descriptor, byte = recurso
+        fcntl.lockf(descriptor, fcntl.LOCK_UN, 1, byte)
+    else:
+        fcntl.flock(recurso.fileno(), fcntl.LOCK_UN)
+        recurso.close()
+
+def _registrar_espera(clave: str, espera: float, contendido: bool) -> None:
+    with _guardia:
+        metricas = _metricas.setdefault(clave, {"adquisiciones": 0, "con_espera": 0,
+                                                "espera_total": 0.0, "espera_maxima": 0.0})
+        metricas["adquisiciones"] += 1
+        if contendido:
+            metricas["con_espera"] += 1
+            metricas["espera_total"] += espera
+            metricas["espera_maxima"] = max(metricas["espera_maxima"], espera)
+
+#Bloquea la categoría (la ruta de su Productos.csv) mientras dura el bloque with
+@contextmanager
+def bloquear_categoria(ruta: str):
+    clave = os.path.normpath(ruta)
+    estado = _estado(clave)
+    inicio = time.perf_counter()
+    contendido = not estado["lock"].acquire(blocking=False)
+    if contendido:
+        estado["lock"].acquire()
+    try:
+        if estado["nivel"] == 0:
+            estado["archivo"], espero_proceso = _bloquear_sistema(clave)
+            _registrar_espera(clave, time.perf_counter() - inicio, contendido or espero_proceso)
+        estado["nivel"] += 1
+        try:
+            yield
+        finally:
+            estado["nivel"] -= 1
+            if estado["nivel"] == 0:
+                recurso, estado["archivo"] = estado["archivo"], None
+                _liberar_sistema(recurso)
+    finally:
+        estado["lock"].release()
+
+#Verifica, con la categoría bloqueada, que siga en la versión sobre la que se calcularon los cambios
+def verificar_version(ruta: str, firma_esperada: tuple, firma_actual: tuple) -> None:
+    if firma_esperada != firma_actual:
+        raise ConflictoVersion(f"La categoría '{ruta}' cambió mientras se editaba; vuelva a intentarlo")
+
+#Verifica, con la categoría bloqueada, que el producto siga como lo vio el usuario.
+#Es más fino que comparar la firma: cambios en otros productos no son conflicto
+def verificar_producto(ruta: str, esperado: dict, actual: dict) -> None:
+    if any(esperado.get(campo) != actual.get(campo) for campo in config.ENCABEZADOS):
+        raise ConflictoVersion(f"El producto {esperado.get('ID')} de '{ruta}' cambió mientras se editaba; "
+                               "vuelva a intentarlo")
+
+#Esperas por bloqueo: por categoría y el total (tiempos en segundos)
+def metricas_bloqueos() -> dict:
+    with _guardia:
+        por_categoria = {clave: dict(valores) for clave, valores in _metricas.items()}
+    total = {"adquisiciones": 0, "con_espera": 0, "espera_total": 0.0, "espera_maxima": 0.0}
+    for valores in por_categoria.values():
+        total["adquisiciones"] += valores["adquisiciones"]
+        total["con_espera"] += valores["con_espera"]
+        total["espera_total"] += valores["espera_total"]
+        total["espera_maxima"] = max(total["espera_maxima"], valores["espera_maxima"])
+    return {"total": total, "categorias": por_categoria}
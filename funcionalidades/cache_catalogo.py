@@ -0,0 +1,251 @@
+import os
+from . import config
+from . import columnas
+from .almacenamiento import aplicar_operaciones, indexar_ids
+from .motor import leer_categoria, firma_categoria, leer_maximo_id
+from .columnas import desde_filas, a_filas, representable
+from .instantanea import tabla as tabla_instantanea
+
+#Caché en memoria de los productos de cada categoría (hoja).
+#Cada entrada guarda la firma de la categoría (ver motor.firma_categoria) y sus productos,
+#de forma que una categoría solo se vuelve a leer si cambió.
+#Los productos se guardan como tabla columnar (ver columnas.py) y las filas se arman a
+#pedido. Las categorías que no se pueden representar en columnas (filas con columnas de
+#más o de menos, como puede quedar un CSV sin validar) se guardan como filas, y en ese caso
+#la tabla se arma recién cuando se pide.
+_entradas = {}
+_contadores = {"aciertos": 0, "fallos": 0, "recargas": 0}
+
+#Normaliza la ruta para que "a/b" y "a\\b" compartan la misma entrada
+def _clave(ruta: str) -> str:
+    return os.path.normpath(ruta)
+
+#Mayor ID numérico de una lista de productos (0 si no hay ninguno)
+def _calcular_maximo_id(productos: list[dict]) -> int:
+    maximo = 0
+    for producto in productos:
+        valor = (producto.get("ID") or "").strip()
+        if valor.isdigit() and int(valor) > maximo:
+            maximo = int(valor)
+    return maximo
+
+#Mayor ID de una tabla columnar: sale directo de la columna salvo para los IDs que
+#quedaron con su texto original
+def _maximo_columnas(tabla: dict) -> int:
+    originales = {p: texto for (p, campo), texto in tabla["originales"].items() if campo == "ID"}
+    if not originales:
+        return max(tabla["ids"], default=0)
+    maximo = max((v for p, v in enumerate(tabla["ids"]) if p not in originales), default=0)
+    return max(maximo, _calcular_maximo_id([{"ID": texto} for texto in originales.values()]))
+
+#Entrada de una categoría guardada como tabla columnar
+def _entrada_desde_columnas(firma: tuple, tabla: dict) -> dict:
+    return {"firma": firma, "columnas": tabla, "filas": None, "maximo_id": _maximo_columnas(tabla), "indice": None}
+
+#Entrada de una categoría que se guarda como filas
+def _entrada_desde_filas(firma: tuple, productos: list[dict]) -> dict:
+    return {"firma": firma, "columnas": None, "filas": productos, "maximo_id": _calcular_maximo_id(productos),
+            "indice": None}
+
+#Crea la entrada de caché de una categoría recién leída
+def _nueva_entrada(firma: tuple, productos: list[dict]) -> dict:
+    if representable(productos):
+        return _entrada_desde_columnas(firma, desde_filas(productos))
+    return _entrada_desde_filas(firma, productos)
+
+#Pasa una entrada guardada como tabla a filas (para cambios que la tabla no puede representar)
+def _pasar_a_filas(entrada: dict) -> list[dict]:
+    if entrada["filas"] is None:
+        entrada["filas"] = a_filas(entrada["columnas"])
+    entrada["columnas"] = None
+    return entrada["filas"]
+
+#Tabla columnar de la entrada; si se guarda como filas se arma una vez y se reutiliza
+def _tabla(entrada: dict) -> dict:
+    if entrada["columnas"] is None:
+        entrada["columnas"] = desde_filas(entrada["filas"])
+    return entrada["columnas"]
+
+#Índice ID -> posición de la entrada; se arma la primera vez que se pide y se mantiene con los cambios
+def _indice(entrada: dict) -> dict:
+    if entrada["indice"] is None:
+        if entrada["filas"] is not None:
+            entrada["indice"] = indexar_ids(entrada["filas"])
+        else:
+            entrada["indice"] = columnas.indice_ids(entrada["columnas"])
+    return entrada["indice"]
+
+#Con bajas con marca los IDs no se renumeran ni se reutilizan: el mayor ID asignado que
+#guardó la baja (ver motor.guardar_maximo_id) vale aunque su fila ya no esté en la categoría
+def _conservar_maximo(clave: str, entrada: dict) -> None:
+    if config.BAJA_CON_MARCA:
+        entrada["maximo_id"] = max(entrada["maximo_id"], leer_maximo_id(clave))
+
+#Devuelve la entrada vigente de la categoría, recargándola si cambió en disco
+def _obtener_entrada(ruta: str) -> dict:
+    clave = _clave(ruta)
+    firma = firma_categoria(clave)
+    if firma is None:
+        _entradas.pop(clave, None)
+        return None
+
+    entrada = _entradas.get(clave)
+    if entrada is not None and entrada["firma"] == firma:
+        _contadores["aciertos"] += 1
+        return entrada
+
+    _contadores["fallos"] += 1
+    if entrada is not None:
+        _contadores["recargas"] += 1
+    # Si la categoría sigue igual que en la instantánea no hace falta parsear el CSV
+    tabla = tabla_instantanea(clave, firma)
+    if tabla is not None:
+        entrada = _entrada_desde_columnas(firma, tabla)
+    else:
+        entrada = _nueva_entrada(firma, leer_categoria(clave))
+    _conservar_maximo(clave, entrada)
+    _entradas[clave] = entrada
+    return entrada
+
+#Devuelve los productos de la categoría, leyendo el archivo solo si cambió.
+#Las filas se arman en cada llamada: quien llama las puede modificar
+def obtener_productos(ruta: str) -> list[dict]:
+    entrada = _obtener_entrada(ruta)
+    if entrada is None:
+        return []
+    if entrada["filas"] is not None:
+        return [dict(p) for p in entrada["filas"]]
+    return a_filas(entrada["columnas"])
+
+#Cantidad de productos de la categoría, sin armar las filas
+def cantidad_productos(ruta: str) -> int:
+    entrada = _obtener_entrada(ruta)
+    if entrada is None:
+        return 0
+    if entrada["filas"] is not None:
+        return len(entrada["filas"])
+    return entrada["columnas"]["cantidad"]
+
+#Devuelve el mayor ID de la categoría sin recorrer sus productos
+def maximo_id(ruta: str) -> int:
+    entrada = _obtener_entrada(ruta)
+    return entrada["maximo_id"] if entrada else 0
+
+#Devuelve las filas y la tabla columnar (ver columnas.py) de la misma versión de la
+#categoría. Las filas son nuevas; la tabla es la de la caché y no se debe modificar
+def obtener_con_columnas(ruta: str) -> tuple:
+    entrada = _obtener_entrada(ruta)
+    if entrada is None:
+        return [], desde_filas([])
+    tabla = _tabla(entrada)
+    if entrada["filas"] is not None:
+        return [dict(p) for p in entrada["filas"]], tabla
+    return a_filas(tabla), tabla
+
+#Tabla columnar de la categoría, sin armar las filas. Cambia en el lugar cuando cambia
+#la categoría (ver "version" en columnas.vacia)
+def obtener_columnas(ruta: str) -> dict:
+    entrada = _obtener_entrada(ruta)
+    if entrada is None:
+        return desde_filas([])
+    return _tabla(entrada)
+
+#Indica si la categoría está cargada y vigente, sin leer el archivo
+def esta_en_cache(ruta: str) -> bool:
+    entrada = _entradas.get(_clave(ruta))
+    return entrada is not None and entrada["firma"] == firma_categoria(ruta)
+
+#Posición en la categoría de la fila con el ID indicado (None si no existe)
+def posicion_id(ruta: str, id_producto: str) -> int:
+    entrada = _obtener_entrada(ruta)
+    if entrada is None:
+        return None
+    return _indice(entrada).get(id_producto)
+
+#Filas de las posiciones indicadas, de la versión vigente de la categoría
+def filas_en(ruta: str, posiciones) -> list[dict]:
+    entrada = _obtener_entrada(ruta)
+    if entrada is None:
+        return []
+    if entrada["filas"] is not None:
+        return [dict(entrada["filas"][p]) for p in posiciones]
+    return a_filas(entrada["columnas"], posiciones)
+
+#Producto con el ID indicado, como fila nueva (None si no existe)
+def obtener_producto(ruta: str, id_producto: str) -> dict:
+    posicion = posicion_id(ruta, id_producto)
+    return filas_en(ruta, [posicion])[0] if posicion is not None else None
+
+#Guarda en caché filas que se acaban de escribir, evitando releer el archivo
+def actualizar(ruta: str, productos: list[dict]) -> None:
+    clave = _clave(ruta)
+    firma = firma_categoria(clave)
+    if firma is None:
+        _entradas.pop(clave, None)
+        return
+    if representable(productos):
+        entrada = _entrada_desde_columnas(firma, desde_filas(productos))
+    else:
+        entrada = _entrada_desde_filas(firma, [dict(p) for p in productos])
+    _conservar_maximo(clave, entrada)
+    _entradas[clave] = entrada
+
+#Suma a la caché filas que se agregaron al final del archivo.
+#Solo es válido si la entrada correspondía al archivo previo al agregado;
+#si no, se descarta y se releerá en el próximo acceso.
+def registrar_agregados(ruta: str, filas: list[dict], firma_previa: tuple) -> None:
+    clave = _clave(ruta)
+    entrada = _entradas.get(clave)
+    firma = firma_categoria(clave)
+    if entrada is None or firma is None or entrada["firma"] != firma_previa:
+        _entradas.pop(clave, None)
+        return
+    if entrada["filas"] is None and representable(filas):
+        tabla = entrada["columnas"]
+        inicio = tabla["cantidad"]
+        columnas.agregar(tabla, filas)
+    else:
+        productos = _pasar_a_filas(entrada)
+        inicio = len(productos)
+        productos.extend(dict(f) for f in filas)
+    if entrada["indice"] is not None:
+        for posicion, fila in enumerate(filas, inicio):
+            entrada["indice"].setdefault(fila.get("ID"), posicion)
+    entrada["maximo_id"] = max(entrada["maximo_id"], _calcular_maximo_id(filas))
+    entrada["firma"] = firma
+
+#Aplica a la caché operaciones que se acaban de registrar en el diario,
+#con la misma condición que registrar_agregados
+def aplicar_en_cache(ruta: str, operaciones: list, firma_previa: tuple) -> None:
+    clave = _clave(ruta)
+    entrada = _entradas.get(clave)
+    firma = firma_categoria(clave)
+    if entrada is None or firma is None or entrada["firma"] != firma_previa:
+        _entradas.pop(clave, None)
+        return
+    if entrada["filas"] is None and columnas.operaciones_representables(operaciones):
+        entrada["indice"] = columnas.aplicar_operaciones(entrada["columnas"], operaciones, entrada["indice"])
+    else:
+        entrada["indice"] = aplicar_operaciones(_pasar_a_filas(entrada), operaciones, entrada["indice"])
+    # Solo una baja que renumera puede bajar el mayor ID: sin renumerar, el ID del producto
+    # eliminado no se vuelve a asignar
+    if any(op.get("op") == "eliminar" and op.get("renumerar", True) for op in operaciones):
+        if entrada["filas"] is not None:
+            entrada["maximo_id"] = _calcular_maximo_id(entrada["filas"])
+        else:
+            entrada["maximo_id"] = _maximo_columnas(entrada["columnas"])
+    else:
+        nuevas = [op["fila"] for op in operaciones if op.get("op") == "alta"]
+        entrada["maximo_id"] = max(entrada["maximo_id"], _calcular_maximo_id(nuevas))
+    entrada["firma"] = firma
+
+#Descarta una categoría (o toda la caché si no se indica ruta)
+def invalidar(ruta: str = None) -> None:
+    if ruta is None:
+        _entradas.clear()
+    else:
+        _entradas.pop(_clave(ruta), None)
+
+#Contadores de uso para monitoreo
+def estadisticas_cache() -> dict:
+    return {**_contadores, "categorias": len(_entradas)}
@@ -0,0 +1,282 @@
+import sys
+import math
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from .config import ENCABEZADOS
+from .lector_csv import a_precio, a_entero
+
+#Representación columnar de una categoría: en lugar de un diccionario de textos
+#por producto se guardan arrays de números (8 bytes por valor) y una lista de
+#nombres internados. Ordenar, filtrar y promediar trabajan sobre las columnas
+#sin volver a convertir textos.
+#
+#Los precios inválidos se guardan como NaN y los stocks inválidos en el conjunto
+#"sin_stock". Los textos que no se pueden reconstruir desde el número (por ejemplo
+#"1,5" o " 7") se guardan aparte en "originales" para devolver exactamente lo leído.
+#
+#La caché del catálogo guarda las categorías en esta forma y la modifica en el lugar
+#con agregar, modificar, quitar y renumerar.
+
+#Las filas se pueden reconstruir desde la tabla columnar solo si tienen exactamente
+#las columnas de ENCABEZADOS, todas con texto (como quedan después de validar)
+def representable(productos) -> bool:
+    ancho = len(ENCABEZADOS)
+    return all(len(producto) == ancho and None not in producto.values() for producto in productos)
+
+#Tabla sin filas. "version" cuenta los cambios hechos sobre la tabla, para que quien
+#guarde algo calculado a partir de ella (por ejemplo, un orden) sepa cuándo rehacerlo
+def vacia() -> dict:
+    return {
+        "cantidad": 0, "ids": array("q"), "nombres": [], "precios": array("d"),
+        "stocks": array("q"), "sin_stock": set(), "originales": {}, "version": 0,
+    }
+
+#Arma la tabla columnar a partir de filas de diccionarios
+def desde_filas(productos: list) -> dict:
+    return agregar(vacia(), productos)
+
+#Columna de enteros de textos en forma canónica ("12", no "012" ni " 12"); None si alguno no lo está
+def _enteros_canonicos(textos: list):
+    try:
+        valores = array("q", map(int, textos))
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return valores if list(map(str, valores)) == textos else None
+
+#Caso común (un CSV validado): todos los números están en forma canónica y no hace falta
+#guardar ningún texto original, así que cada columna se convierte de una vez.
+#Retorna False, sin tocar la tabla, si alguna fila no cumple
+def _agregar_canonicas(tabla: dict, productos: list) -> bool:
+    ids = _enteros_canonicos([p.get("ID") for p in productos])
+    if ids is None:
+        return False
+    precios = _enteros_canonicos([p.get("Precio") for p in productos])
+    if precios is None or (precios and (min(precios) < 0 or max(precios) > 2 ** 53)):
+        return False
+    stocks = _enteros_canonicos([p.get("Stock") for p in productos])
+    if stocks is None:
+        return False
+    tabla["ids"].extend(ids)
+    tabla["precios"].extend(array("d", precios))
+    tabla["stocks"].extend(stocks)
+    tabla["nombres"].extend(sys.intern(p.get("Nombre") or "") for p in productos)
+    return True
+
+#Agrega filas al final de la tabla. Retorna la misma tabla
+def agregar(tabla: dict, productos: list) -> dict:
+    if _agregar_canonicas(tabla, productos):
+        tabla["cantidad"] = len(tabla["nombres"])
+        tabla["version"] += 1
+        return tabla
+    ids = tabla["ids"]
+    precios = tabla["precios"]
+    stocks = tabla["stocks"]
+    nombres = tabla["nombres"]
+    sin_stock = tabla["sin_stock"]
+    originales = tabla["originales"]
+
+    for posicion, producto in enumerate(productos, tabla["cantidad"]):
+        id_texto = producto.get("ID") or ""
+        id_valor = a_entero(id_texto)
+        ids.append(id_valor if id_valor is not None else 0)
+        if id_valor is None or str(id_valor) != id_texto:
+            originales[(posicion, "ID")] = id_texto
+
+        nombres.append(sys.intern(producto.get("Nombre") or ""))
+
+        precio_texto = producto.get("Precio") or ""
+        precio = a_precio(precio_texto)
+        precios.append(float(precio) if precio is not None else math.nan)
+        if (precio is None or not isinstance(precio, int) or precio > 2 ** 53
+                or str(precio) != precio_texto):
+            originales[(posicion, "Precio")] = precio_texto
+
+        stock_texto = producto.get("Stock") or ""
+        stock = a_entero(stock_texto)
+        if stock is None:
+            sin_stock.add(posicion)
+            stocks.append(0)
+        else:
+            stocks.append(stock)
+        if stock is None or str(stock) != stock_texto:
+            originales[(posicion, "Stock")] = stock_texto
+
+    tabla["cantidad"] = len(nombres)
+    tabla["version"] += 1
+    return tabla
+
+#Reemplaza los campos indicados de la fila de una posición
+def modificar(tabla: dict, posicion: int, campos: dict) -> None:
+    nueva = desde_filas([{**fila(tabla, posicion), **campos}])
+    for columna in ("ids", "nombres", "precios", "stocks"):
+        tabla[columna][posicion] = nueva[columna][0]
+    for campo in ("ID", "Precio", "Stock"):
+        texto = nueva["originales"].get((0, campo))
+        if texto is None:
+            tabla["originales"].pop((posicion, campo), None)
+        else:
+            tabla["originales"][(posicion, campo)] = texto
+    if nueva["sin_stock"]:
+        tabla["sin_stock"].add(posicion)
+    else:
+        tabla["sin_stock"].discard(posicion)
+    tabla["version"] += 1
+
+#Quita las filas de las posiciones indicadas; las siguientes se corren hacia adelante
+def quitar(tabla: dict, posiciones) -> None:
+    quitadas = sorted(set(posiciones))
+    if not quitadas:
+        return
+    for posicion in reversed(quitadas):
+        for columna in ("ids", "nombres", "precios", "stocks"):
+            del tabla[columna][posicion]
+
+    def nueva(posicion):
+        return posicion - bisect_left(quitadas, posicion)
+    conjunto = set(quitadas)
+    tabla["originales"] = {(nueva(p), campo): texto for (p, campo), texto in tabla["originales"].items()
+                           if p not in conjunto}
+    tabla["sin_stock"] = {nueva(p) for p in tabla["sin_stock"] if p not in conjunto}
+    tabla["cantidad"] = len(tabla["nombres"])
+    tabla["version"] += 1
+
+#Numera los IDs de 1 en adelante, en el orden de las filas
+def renumerar(tabla: dict) -> None:
+    tabla["ids"] = array("q", range(1, tabla["cantidad"] + 1))
+    tabla["originales"] = {clave: texto for clave, texto in tabla["originales"].items() if clave[1] != "ID"}
+    tabla["version"] += 1
+
+#Índice ID (texto) -> posición; si un ID se repite queda su primera aparición
+def indice_ids(tabla: dict) -> dict:
+    textos = list(map(str, tabla["ids"]))
+    for (posicion, campo), texto in tabla["originales"].items():
+        if campo == "ID":
+            textos[posicion] = texto
+    return dict(zip(reversed(textos), range(len(textos) - 1, -1, -1)))
+
+#Posiciones de todas las filas con el ID indicado (texto), sin convertir la columna a textos
+def posiciones_id(tabla: dict, id_producto: str) -> list:
+    originales = tabla["originales"]
+    posiciones = [p for (p, campo), texto in originales.items() if campo == "ID" and texto == id_producto]
+    numero = a_entero(id_producto)
+    if numero is not None and str(numero) == id_producto:
+        posiciones += [p for p, valor in enumerate(tabla["ids"]) if valor == numero and (p, "ID") not in originales]
+    return sorted(posiciones)
+
+#Como almacenamiento.aplicar_operaciones, pero sobre la tabla (la modifica).
+#Las filas de las altas y los campos modificados tienen que ser representables.
+#Retorna el índice ID -> posición actualizado (None si una baja lo dejó inválido)
+def aplicar_operaciones(tabla: dict, operaciones: list, indice: dict = None) -> dict:
+    for op in operaciones:
+        tipo = op.get("op")
+        if tipo == "alta":
+            if indice is not None:
+                indice.setdefault(op["fila"].get("ID"), tabla["cantidad"])
+            agregar(tabla, [op["fila"]])
+        elif tipo == "modificar":
+            if indice is None:
+                indice = indice_ids(tabla)
+            posicion = indice.get(op["id"])
+            if posicion is not None:
+                modificar(tabla, posicion, op["campos"])
+        elif tipo == "eliminar":
+            quitar(tabla, posiciones_id(tabla, op["id"]))
+            if op.get("renumerar", True):
+                renumerar(tabla)
+            indice = None
+    return indice
+
+#Indica si las operaciones se pueden aplicar sobre la tabla sin perder datos
+def operaciones_representables(operaciones: list) -> bool:
+    for op in operaciones:
+        tipo = op.get("op")
+        if tipo == "alta" and not representable([op["fila"]]):
+            return False
+        if tipo == "modificar" and not (set(op["campos"]) <= set(ENCABEZADOS)
+                                         and all(isinstance(v, str) for v in op["campos"].values())):
+            return False
+    return True
+
+#Reconstruye la fila (diccionario de textos) de una posición
+def fila(tabla: dict, posicion: int) -> dict:
+    originales = tabla["originales"]
+    producto = {
+        "ID": str(tabla["ids"][posicion]),
+        "Nombre": tabla["nombres"][posicion],
+        "Precio": None,
+        "Stock": str(tabla["stocks"][posicion]),
+    }
+    for campo in ("ID", "Precio", "Stock"):
+        if (posicion, campo) in originales:
+            producto[campo] = originales[(posicion, campo)]
+    if producto["Precio"] is None:
+        producto["Precio"] = str(int(tabla["precios"][posicion]))
+    return producto
+
+#Filas de las posiciones indicadas (todas si no se indican). La tabla completa se
+#reconstruye columna a columna y después se reponen los textos originales
+def a_filas(tabla: dict, posiciones=None) -> list:
+    if posiciones is not None:
+        return [fila(tabla, p) for p in posiciones]
+    filas = [{"ID": str(i), "Nombre": nombre, "Precio": str(int(p)) if math.isfinite(p) else "", "Stock": str(s)}
+             for i, nombre, p, s in zip(tabla["ids"], tabla["nombres"], tabla["precios"], tabla["stocks"])]
+    for (posicion, campo), texto in tabla["originales"].items():
+        filas[posicion][campo] = texto
+    return filas
+
+#Columna usada como clave de orden; los valores inválidos ordenan como 0 (igual que key_precio/key_stock)
+def columna_orden(tabla: dict, campo: str):
+    if campo == "Precio":
+        precios = tabla["precios"]
+        if any(p != p for p in precios):
+            return array("d", (0.0 if p != p else p for p in precios))
+        return precios
+    if campo == "Stock":
+        return tabla["stocks"]
+    if campo == "ID":
+        return tabla["ids"]
+    raise ValueError(f"Campo de orden desconocido: {campo}")
+
+#Permutación de posiciones que ordena la tabla por el campo indicado (orden estable)
+def orden(tabla: dict, campo: str, descendente: bool = False) -> list:
+    return orden_por_claves(tabla, [(campo, descendente)])
+
+#Permutación para varias claves [(campo, descendente)]: se ordena de la última clave
+#a la primera, aprovechando que cada ordenamiento es estable
+def orden_por_claves(tabla: dict, claves: list) -> list:
+    posiciones = list(range(tabla["cantidad"]))
+    for campo, descendente in reversed(claves):
+        posiciones.sort(key=columna_orden(tabla, campo).__getitem__, reverse=descendente)
+    return posiciones
+
+#Posiciones de los productos cuyo nombre contiene el texto (sin distinguir mayúsculas)
+def filtrar(tabla: dict, texto: str) -> list:
+    texto = texto.lower()
+    return [p for p, nombre in enumerate(tabla["nombres"]) if texto in nombre.lower()]
+
+#Promedios de precio y stock: (promedio, cantidad) de cada campo; promedio None si no hay datos
+def promedios(tabla: dict) -> dict:
+    precios = [p for p in tabla["precios"] if p == p]
+    cantidad_stock = tabla["cantidad"] - len(tabla["sin_stock"])
+    suma_stock = sum(tabla["stocks"])
+    return {
+        "precio": (math.fsum(precios) / len(precios) if precios else None, len(precios)),
+        "stock": (suma_stock / cantidad_stock if cantidad_stock else None, cantidad_stock),
+    }
+
+#Resumen compatible con agregados (conteos de valores incluidos) calculado sobre las columnas
+def resumir(tabla: dict) -> dict:
+    precios = Counter(int(p) if p.is_integer() else p for p in tabla["precios"] if p == p)
+    stocks = Counter(tabla["stocks"])
+    for posicion in tabla["sin_stock"]:
+        stocks[0] -= 1
+    stocks = +stocks
+    return {
+        "cantidad_precio": sum(precios.values()),
+        "suma_precio": math.fsum(v * n for v, n in precios.items()),
+        "precios": precios,
+        "cantidad_stock": tabla["cantidad"] - len(tabla["sin_stock"]),
+        "suma_stock": sum(tabla["stocks"]),
+        "stocks": stocks,
+    }
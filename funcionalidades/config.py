@@ -1,3 +1,81 @@
 RUTA_BASE = "Supermercado"
 NOMBRE_CSV = "Productos.csv"
-ENCABEZADOS = ["ID", "Nombre", "Precio", "Stock"]
\ No newline at end of file
+ENCABEZADOS = ["ID", "Nombre", "Precio", "Stock"]
+
+#Motor de almacenamiento: "csv" (un Productos.csv por categoría dentro de RUTA_BASE)
+#o "sqlite" (todo el catálogo en RUTA_SQLITE). Para pasar de uno a otro: migrar.py
+MOTOR = "csv"
+RUTA_SQLITE = "Supermercado.db"
+
+#Diario de operaciones: si está activo, las altas, modificaciones y bajas
+#se agregan a "Productos.csv.diario" en lugar de reescribir el CSV,
+#y el diario se compacta en segundo plano al superar el tamaño indicado
+USAR_DIARIO = False
+EXTENSION_DIARIO = ".diario"
+TAMANO_MAXIMO_DIARIO = 64 * 1024
+SINCRONIZAR_DIARIO = True
+
+#Bloqueo de categorías entre procesos: "Productos.csv.lock" en cada carpeta
+#(con SQLite, un solo archivo junto a la base con un byte por categoría)
+EXTENSION_BLOQUEO = ".lock"
+
+#Índice persistente de IDs ("Productos.csv.indice")
+EXTENSION_INDICE = ".indice"
+
+#Historial de precios y stock (ver historial.py): "Productos.csv.historial" con un registro
+#por cambio y "Productos.csv.historial.cabezas" con el último registro de cada producto
+USAR_HISTORIAL = True
+EXTENSION_HISTORIAL = ".historial"
+EXTENSION_CABEZAS = ".cabezas"
+
+#Bajas con marca: si está activo, eliminar un producto no renumera los IDs;
+#la baja se registra en el diario en lugar de reescribir el CSV. El mayor ID asignado se
+#guarda en "Productos.csv.maximo" (en SQLite, en la tabla maximos) para que el ID de un
+#producto eliminado no se vuelva a asignar después de compactar el diario o de reiniciar
+BAJA_CON_MARCA = False
+EXTENSION_MAXIMO = ".maximo"
+
+#Listado paginado: las categorías con al menos PAGINAR_DESDE productos se muestran
+#de a TAMANO_PAGINA filas, leyendo del archivo solo la página pedida
+PAGINAR_DESDE = 2000
+TAMANO_PAGINA = 20
+
+#Impresión de listados (ver impresion.py): formato ("tabla", "csv" o "jsonl"), ancho mínimo
+#de cada columna de la tabla y filas que se formatean antes de cada escritura
+FORMATO_LISTADO = "tabla"
+ANCHO_COLUMNA = 12
+LOTE_IMPRESION = 1000
+
+#Ordenamiento externo: memoria aproximada (en bytes) de cada tramo ordenado en memoria
+#y cantidad máxima de tramos que se mezclan a la vez
+MEMORIA_ORDENAMIENTO = 64 * 1024 * 1024
+MAX_TRAMOS = 64
+#Carpeta de los tramos (None: la temporal del sistema). No debe estar dentro de RUTA_BASE:
+#la vigilancia y la validación verían aparecer y desaparecer carpetas en las categorías
+CARPETA_ORDENAMIENTO = None
+
+#Servidor HTTP/JSON (servidor.py): dirección por defecto, tamaño máximo del cuerpo de un pedido
+#y cantidad de categorías cuyo listado serializado se mantiene en memoria
+HOST_SERVIDOR = "127.0.0.1"
+PUERTO_SERVIDOR = 8080
+MAXIMO_CUERPO_SERVIDOR = 1024 * 1024
+LECTURAS_SERVIDOR = 64
+
+#Importación de listas de precios (ver importacion.py): filas que se acumulan antes de
+#escribir las categorías tocadas y cantidad máxima de errores que se informan con detalle
+LOTE_IMPORTACION = 100000
+MAXIMO_ERRORES_IMPORTACION = 100
+
+#Instrumentación (ver instrumentacion.py): si está activa se registran llamadas, tiempos,
+#filas y bytes de las operaciones principales; RUTA_METRICAS es donde se vuelcan
+INSTRUMENTAR = False
+RUTA_METRICAS = "metricas.json"
+
+#Validación inicial: manifiesto con la suma, la fecha y el tamaño de cada CSV ya validado
+#y cantidad mínima de archivos para repartir la validación en procesos
+NOMBRE_MANIFIESTO = ".validacion.json"
+MIN_ARCHIVOS_PARALELO = 64
+
+#Instantánea binaria del catálogo validado (ver instantanea.py), dentro de la carpeta base
+USAR_INSTANTANEA = True
+NOMBRE_INSTANTANEA = ".instantanea.bin"
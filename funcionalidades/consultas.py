@@ -0,0 +1,137 @@
+import os
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from .config import RUTA_BASE
+from .motor import listar_hojas
+from .vigilancia import cubre, cambios, hojas
+from .cache_catalogo import firma_categoria, obtener_columnas
+from .columnas import fila
+
+#Consultas por rango y top-k de Precio y Stock sobre toda la jerarquía (o una carpeta).
+#Cada hoja guarda, por campo, sus valores ordenados y la posición de cada uno en la tabla
+#columnar de la categoría (ver columnas.py); los productos con el valor inválido no figuran.
+#La tabla y el índice de una hoja se arman la primera vez que se consulta el campo y se
+#descartan si cambia su firma (o si la caché modificó la tabla), como el índice de nombres.
+#Un rango se busca con bisect en cada hoja y se mezclan los tramos, que ya están ordenados;
+#el top-k mezcla con un heap las hojas recorridas desde el extremo pedido y se detiene en k,
+#así que cuesta O(hojas + k log hojas) sin ordenar todo el catálogo.
+
+CAMPOS_CONSULTA = ("Precio", "Stock")
+
+_hojas = {}   # ruta del CSV -> {"firma": ..., "tabla": tabla columnar, campo -> (valores, posiciones)}
+
+#Valores ordenados del campo y sus posiciones en la tabla (a igual valor, en el orden del archivo)
+def _ordenar_campo(tabla: dict, campo: str) -> tuple:
+    if campo == "Precio":
+        columna = tabla["precios"]
+        posiciones = [p for p in range(tabla["cantidad"]) if columna[p] == columna[p]]
+    else:
+        columna = tabla["stocks"]
+        invalidos = tabla["sin_stock"]
+        posiciones = [p for p in range(tabla["cantidad"]) if p not in invalidos]
+    posiciones.sort(key=columna.__getitem__)
+    return array(columna.typecode, [columna[p] for p in posiciones]), array("q", posiciones)
+
+def _indexar_hoja(ruta: str) -> None:
+    firma = firma_categoria(ruta)
+    hoja = _hojas.get(ruta)
+    if hoja is None or hoja["firma"] != firma:
+        _hojas[ruta] = {"firma": firma}
+
+def _indice(ruta: str, campo: str) -> tuple:
+    hoja = _hojas[ruta]
+    if "tabla" in hoja and hoja["version"] != hoja["tabla"]["version"]:
+        # La caché modificó la tabla en el lugar: los órdenes armados sobre ella ya no sirven
+        hoja = _hojas[ruta] = {"firma": firma_categoria(ruta)}
+    if "tabla" not in hoja:
+        hoja["tabla"] = obtener_columnas(ruta)
+        hoja["version"] = hoja["tabla"]["version"]
+    if campo not in hoja:
+        hoja[campo] = _ordenar_campo(hoja["tabla"], campo)
+    return hoja[campo]
+
+#Pone al día las hojas indexadas. Con la vigilancia de carpetas activa solo se revisan
+#las hojas que informó como cambiadas
+def actualizar_consultas(base: str = RUTA_BASE) -> None:
+    cambiadas = cambios("consultas") if cubre(base) else None
+    if cambiadas is not None:
+        vigentes = set(hojas())
+        for ruta in cambiadas | {r for r in vigentes if r not in _hojas}:
+            if ruta in vigentes:
+                _indexar_hoja(ruta)
+            else:
+                _hojas.pop(ruta, None)
+        return
+
+    vigentes = set(listar_hojas(base))
+    for ruta in vigentes:
+        _indexar_hoja(ruta)
+    for ruta in [r for r in _hojas if r not in vigentes]:
+        del _hojas[ruta]
+
+#Hojas dentro de la carpeta (o la hoja misma), en orden
+def _hojas_en(carpeta: str) -> list:
+    prefijo = os.path.normpath(carpeta) + os.sep
+    return sorted(r for r in _hojas if r.startswith(prefijo))
+
+def _campo(campo: str) -> str:
+    campo = str(campo).strip().capitalize()
+    if campo not in CAMPOS_CONSULTA:
+        raise ValueError(f"Campo inválido: '{campo}' (use Precio o Stock)")
+    return campo
+
+def _tramo(ruta: str, valores: array, posiciones: array, desde: int, hasta: int):
+    for i in range(desde, hasta):
+        yield valores[i], ruta, posiciones[i]
+
+#Tramo completo desde el final: el valor y la posición negados lo mantienen ordenado
+def _tramo_inverso(ruta: str, valores: array, posiciones: array):
+    for i in range(len(valores) - 1, -1, -1):
+        yield -valores[i], ruta, -posiciones[i]
+
+def _resultados(claves) -> list:
+    return [(ruta, fila(_hojas[ruta]["tabla"], posicion)) for _, ruta, posicion in claves]
+
+#Productos con el campo entre minimo y maximo (sin límite si son None), de menor a mayor.
+#Con incluir_maximo=False el máximo queda afuera ("Stock menor que 10").
+#Retorna una lista de (ruta del CSV, producto), como buscar_por_nombre
+def rango(campo: str, minimo=None, maximo=None, carpeta: str = RUTA_BASE,
+          incluir_maximo: bool = True, limite: int = None) -> list:
+    campo = _campo(campo)
+    actualizar_consultas()
+    tramos = []
+    for ruta in _hojas_en(carpeta):
+        valores, posiciones = _indice(ruta, campo)
+        desde = 0 if minimo is None else bisect_left(valores, minimo)
+        if maximo is None:
+            hasta = len(valores)
+        else:
+            hasta = (bisect_right if incluir_maximo else bisect_left)(valores, maximo)
+        if desde < hasta:
+            tramos.append(_tramo(ruta, valores, posiciones, desde, hasta))
+    return _resultados(islice(heapq.merge(*tramos), limite))
+
+#Los cantidad productos con mayor campo (o menor, con mayores=False).
+#A igual valor, los de las hojas anteriores primero
+def top(campo: str, cantidad: int, mayores: bool = True, carpeta: str = RUTA_BASE) -> list:
+    campo = _campo(campo)
+    if cantidad <= 0:
+        return []
+    actualizar_consultas()
+    tramos = []
+    for ruta in _hojas_en(carpeta):
+        valores, posiciones = _indice(ruta, campo)
+        if mayores:
+            tramos.append(_tramo_inverso(ruta, valores, posiciones))
+        else:
+            tramos.append(_tramo(ruta, valores, posiciones, 0, len(valores)))
+    primeros = islice(heapq.merge(*tramos), cantidad)
+    if mayores:
+        primeros = ((-valor, ruta, -posicion) for valor, ruta, posicion in primeros)
+    return _resultados(primeros)
+
+#Vacía el índice (la próxima consulta vuelve a indexar)
+def reiniciar() -> None:
+    _hojas.clear()
@@ -0,0 +1,140 @@
+import os
+from .config import RUTA_BASE
+from .motor import listar_hojas
+from .vigilancia import cubre, cambios, hojas
+from .cache_catalogo import firma_categoria, esta_en_cache, obtener_columnas
+from .agregados import nuevo_resumen, acumular, combinar, resumir_archivos
+from .columnas import resumir
+from .instantanea import tabla as tabla_instantanea
+
+#Estadísticas materializadas: un resumen (ver agregados) por cada hoja y por cada
+#carpeta intermedia de la jerarquía. Las operaciones de funciones informan sus cambios
+#con aplicar_cambio y el resumen se corrige restando/sumando solo esos productos,
+#así el promedio de una categoría se responde sin leer su archivo.
+_hojas = {}     # ruta del CSV -> {"firma": ..., "resumen": ...}
+_nodos = {}     # carpeta -> resumen acumulado de todas las hojas debajo
+
+def _clave(ruta: str) -> str:
+    return os.path.normpath(ruta)
+
+#Carpetas desde la hoja hasta la carpeta base (inclusive)
+def _ancestros(ruta_csv: str) -> list:
+    base = _clave(RUTA_BASE)
+    carpeta = os.path.dirname(_clave(ruta_csv))
+    carpetas = []
+    while carpeta:
+        carpetas.append(carpeta)
+        if carpeta == base:
+            break
+        carpeta = os.path.dirname(carpeta)
+    return carpetas
+
+#Resta el resumen origen del destino (inversa de agregados.combinar)
+def _restar(destino: dict, origen: dict) -> None:
+    for clave in ("cantidad_precio", "suma_precio", "cantidad_stock", "suma_stock"):
+        destino[clave] -= origen[clave]
+    for campo in ("precios", "stocks"):
+        destino[campo].subtract(origen[campo])
+        for valor in [v for v, n in destino[campo].items() if n <= 0]:
+            del destino[campo][valor]
+
+def _propagar(ruta_csv: str, delta: dict, restar: bool = False) -> None:
+    for carpeta in _ancestros(ruta_csv):
+        resumen = _nodos.setdefault(carpeta, nuevo_resumen())
+        if restar:
+            _restar(resumen, delta)
+        else:
+            combinar(resumen, delta)
+
+def _quitar_hoja(ruta: str) -> None:
+    hoja = _hojas.pop(ruta, None)
+    if hoja is not None:
+        _propagar(ruta, hoja["resumen"], restar=True)
+
+def _poner_hoja(ruta: str, firma: tuple, resumen: dict) -> None:
+    _quitar_hoja(ruta)
+    _hojas[ruta] = {"firma": firma, "resumen": resumen}
+    _propagar(ruta, resumen)
+
+#Recalcula las hojas cuya firma no coincide con la guardada
+def _sincronizar(rutas: list) -> None:
+    desactualizadas = {}
+    for ruta in rutas:
+        firma = firma_categoria(ruta)
+        hoja = _hojas.get(ruta)
+        if hoja is None or hoja["firma"] != firma:
+            desactualizadas[ruta] = firma
+    if not desactualizadas:
+        return
+    # Las categorías que ya están en la caché o en la instantánea se resumen sobre
+    # sus columnas; el resto se recorre desde disco
+    en_disco = []
+    for ruta, firma in desactualizadas.items():
+        columnas = obtener_columnas(ruta) if esta_en_cache(ruta) else tabla_instantanea(ruta, firma)
+        if columnas is not None:
+            _poner_hoja(ruta, firma, resumir(columnas))
+        else:
+            en_disco.append(ruta)
+    if not en_disco:
+        return
+    resumenes, _ = resumir_archivos(en_disco)
+    for ruta, resumen in resumenes.items():
+        _poner_hoja(ruta, desactualizadas[ruta], resumen)
+
+#Informa un cambio hecho sobre una categoría: productos quitados y agregados
+#(una modificación es quitar la versión anterior y agregar la nueva).
+#firma_previa es la firma de la categoría antes de escribir: si no coincide con
+#la guardada, hubo otro cambio que no conocemos y la hoja se recalculará desde disco
+def aplicar_cambio(ruta: str, firma_previa: tuple, quitar: list = (), agregar: list = ()) -> None:
+    clave = _clave(ruta)
+    hoja = _hojas.get(clave)
+    if hoja is None:
+        return
+    if hoja["firma"] != firma_previa:
+        _quitar_hoja(clave)
+        return
+
+    delta_quitar = nuevo_resumen()
+    for producto in quitar:
+        acumular(delta_quitar, producto)
+    delta_agregar = nuevo_resumen()
+    for producto in agregar:
+        acumular(delta_agregar, producto)
+
+    _restar(hoja["resumen"], delta_quitar)
+    combinar(hoja["resumen"], delta_agregar)
+    _propagar(clave, delta_quitar, restar=True)
+    _propagar(clave, delta_agregar)
+    hoja["firma"] = firma_categoria(clave)
+
+#Resumen de una hoja (se calcula la primera vez o si cambió en disco)
+def resumen_categoria(ruta: str) -> dict:
+    clave = _clave(ruta)
+    _sincronizar([clave])
+    return _hojas[clave]["resumen"] if clave in _hojas else nuevo_resumen()
+
+#Resumen de todas las categorías y el de cada hoja.
+#Solo se revisan las firmas de las hojas; se leen las que cambiaron.
+#Con la vigilancia de carpetas activa ni siquiera se revisan las que no informó como cambiadas
+def resumen_global(base: str = RUTA_BASE) -> tuple:
+    cambiadas = cambios("estadisticas") if cubre(base) else None
+    rutas = listar_hojas(base) if cambiadas is None else hojas()
+    vigentes = set(rutas)
+    for ruta in [r for r in _hojas if r not in vigentes]:
+        _quitar_hoja(ruta)
+    if cambiadas is None:
+        _sincronizar(rutas)
+    else:
+        _sincronizar([r for r in rutas if r in cambiadas or r not in _hojas])
+    por_hoja = {ruta: _hojas[ruta]["resumen"] for ruta in rutas if ruta in _hojas}
+    return por_hoja, _nodos.get(_clave(base), nuevo_resumen())
+
+#Resumen de una carpeta intermedia cualquiera (por ejemplo "Supermercado/Bebidas")
+def resumen_carpeta(carpeta: str) -> dict:
+    resumen_global()
+    return _nodos.get(_clave(carpeta), nuevo_resumen())
+
+#Olvida todos los resúmenes calculados (la próxima consulta vuelve a leer las categorías)
+def reiniciar() -> None:
+    _hojas.clear()
+    _nodos.clear()
@@ -1,48 +1,62 @@
 import os
 import csv
-from .lectura_recursiva import iniciar_lectura
-from .config import NOMBRE_CSV, ENCABEZADOS, RUTA_BASE
+from .lectura_recursiva import hijos, es_hoja, ruta_hoja, leer_csv
+from . import config
+from .config import ENCABEZADOS, RUTA_BASE
 from .validar_inputs import ingresar_texto, ingresar_numero, ingresar_id
+from .lector_csv import a_precio, a_entero
+from .cache_catalogo import (actualizar, maximo_id, firma_categoria, registrar_agregados,
+                             aplicar_en_cache, esta_en_cache, posicion_id, obtener_producto, obtener_con_columnas,
+                             invalidar)
+from .almacenamiento import existe_diario, programar_compactacion, reemplazar_categoria
+from .motor import usa_sqlite, guardar_categoria, registrar_operaciones, leer_fila, guardar_maximo_id
+from .indice_ids import ruta_indice, reindexar, indexar_agregados
+from .indice_nombres import buscar_por_nombre
+from .agregados import describir
+from .estadisticas import aplicar_cambio, resumen_categoria, resumen_global
+from .columnas import orden_por_claves, filtrar
+from .paginado import pagina, es_grande
+from .ordenamiento import normalizar_claves, ordenar_csv
+from .almacenamiento_sqlite import ordenar_categoria
+from .bloqueos import bloquear_categoria, verificar_version, verificar_producto, ConflictoVersion
+from .instrumentacion import instrumentar, tamano
+from .impresion import imprimir_tabla
+from .historial import registrar as registrar_historial, reordenar as reordenar_historial
 
 #Muestra las categorías y subcategorías disponibles de forma jerárquica
-#Recibe una lista de diccionarios anidados
-def mostrar_categorias(estructura, nivel=0) -> None:
-    if not estructura:
+#Recibe un nodo del árbol de categorías (ver lectura_recursiva)
+def mostrar_categorias(nodo, nivel=0) -> None:
+    subcategorias = hijos(nodo)
+    if not subcategorias and nivel == 0:
         print("(vacío)")
         return
-    
-    for bloque in estructura:
-        for nombre, contenido in bloque.items():
-            print("  " * nivel + f"- {nombre}")
-            # Si el contenido es un dict, seguir descendiendo
-            if isinstance(contenido, dict):
-                mostrar_categorias([{k: v} for k, v in contenido.items()], nivel + 1)
+
+    for hijo in subcategorias:
+        print("  " * nivel + f"- {hijo['nombre']}")
+        mostrar_categorias(hijo, nivel + 1)
 
 #Permite al usuario navegar entre categorías y subcategorías,
-#retornando una referencia al nivel seleccionado
+#retornando la ruta del CSV de la categoría final seleccionada.
+#Recibe el nodo raíz; las subcategorías se listan a medida que se entra en ellas
 def seleccionar_categoria(estructura) -> str:
-    if not estructura:
+    if not estructura or not hijos(estructura):
         print("No hay categorías disponibles.")
         return None
 
-    nivel_actual = estructura
-    ruta = []  # Guarda la ruta seleccionada como lista
+    camino = [estructura]  # Nodos recorridos; volver es quitar el último
 
     while True:
         # Obtener las categorías del nivel actual
-        opciones = []
-        for bloque in nivel_actual:
-            for nombre, contenido in bloque.items():
-                opciones.append((nombre, contenido))
+        opciones = hijos(camino[-1])
 
         if not opciones:
             print("No hay más subcategorías.")
-            return "/".join(ruta) if ruta else None
+            return None
 
         print("\nCategorías disponibles:")
-        for i, (nombre, _) in enumerate(opciones, 1):
-            print(f"{i}. {nombre}")
-        print("0. Volver al nivel anterior" if ruta else "0. Salir")
+        for i, nodo in enumerate(opciones, 1):
+            print(f"{i}. {nodo['nombre']}")
+        print("0. Volver al nivel anterior" if len(camino) > 1 else "0. Salir")
 
         try:
             opcion = int(input("\nSeleccione una opción: ").strip())
@@ -52,123 +66,323 @@ def seleccionar_categoria(estructura) -> str:
 
         # Opción salir / volver
         if opcion == 0:
-            if ruta:
-                ruta.pop()  # Subir un nivel
-                nivel_actual = estructura
-                for paso in ruta:
-                    for bloque in nivel_actual:
-                        if paso in bloque:
-                            contenido = bloque[paso]
-                            nivel_actual = (
-                                [{k: v} for k, v in contenido.items()]
-                                if isinstance(contenido, dict)
-                                else contenido
-                            )
-                            break
+            if len(camino) > 1:
+                camino.pop()  # Subir un nivel
             else:
                 return None
             continue
 
         if 1 <= opcion <= len(opciones):
-            nombre, contenido = opciones[opcion - 1]
-            ruta.append(nombre)
-            if isinstance(contenido, dict):
-                # Bajar al siguiente nivel
-                nivel_actual = [{k: v} for k, v in contenido.items()]
-            elif isinstance(contenido, list):
+            nodo = opciones[opcion - 1]
+            if es_hoja(nodo):
                 # Llegamos al nivel final
-                ruta_relativa = os.path.join(RUTA_BASE, *ruta, NOMBRE_CSV)
+                ruta_relativa = ruta_hoja(nodo)
                 print(f"\nCategoría seleccionada: {ruta_relativa}")
                 return ruta_relativa
+            # Bajar al siguiente nivel
+            camino.append(nodo)
         else:
             print("Número fuera de rango.")
 
-#Busca en la estructura jerárquica la categoría indicada por ruta_relativa
-#retorna la lista de productos.
-def leer_csv(ruta) -> list:
-    if not os.path.exists(ruta):
-        return []
-    
-    productos = []
+#Como leer_csv, pero además devuelve la tabla columnar de la misma versión de la categoría
+def leer_csv_columnas(ruta) -> tuple:
     try:
-        with open(ruta, "r", newline="", encoding="utf-8") as archivo:
-            lector = csv.DictReader(archivo)
-            
-            for producto in lector:
-                productos.append(producto)
-        return productos
-        
+        return obtener_con_columnas(ruta)
     except Exception as e:
         print(f"Error al leer el archivo '{ruta}': {e}")
-        return []
+        return [], None
 
 #Escribe una lista de diccionarios en el archivo CSV recibido.
-def escribir_csv(ruta, datos, campos) -> None:
+#La escritura es atómica (archivo temporal + rename), así que un corte no trunca la categoría.
+#Retorna True si se pudo escribir
+@instrumentar("escribir_csv", lambda a, r: {"filas": len(a[1]), "bytes_escritos": tamano(a[0]) if r else 0})
+def escribir_csv(ruta, datos, campos) -> bool:
+    try:
+        guardar_categoria(ruta, datos, campos)
+        actualizar(ruta, datos)
+        if os.path.exists(ruta_indice(ruta)):
+            reindexar(ruta)
+        return True
+    except Exception as e:
+        print(f"Error al escribir en el archivo '{ruta}': {e}")
+        return False
+
+#Usa el diario de operaciones si está activo o si la categoría tiene uno pendiente
+#(en ese caso no se puede tocar el CSV base sin compactar antes).
+#Con el motor SQLite las operaciones también se registran de a una, cada una en su transacción
+def usa_diario(ruta) -> bool:
+    return config.USAR_DIARIO or usa_sqlite() or existe_diario(ruta)
+
+#Registra operaciones en el diario de la categoría (o en la base) y las refleja en la caché
+def persistir_operaciones(ruta, operaciones) -> bool:
+    firma_previa = firma_categoria(ruta)
+    try:
+        registrar_operaciones(ruta, operaciones)
+    except Exception as e:
+        print(f"Error al escribir en el diario de '{ruta}': {e}")
+        return False
+    aplicar_en_cache(ruta, operaciones, firma_previa)
+    programar_compactacion(ruta)
+    return True
+
+#Guarda los cambios hechos sobre una categoría: con diario solo se agregan
+#las operaciones, sin diario se reescribe el archivo completo
+def persistir_cambios(ruta, datos, operaciones) -> bool:
+    if usa_diario(ruta):
+        return persistir_operaciones(ruta, operaciones)
+    return escribir_csv(ruta, datos, ENCABEZADOS)
+
+#Agrega filas al final del CSV sin reescribir las existentes.
+#Todas las filas se escriben con una sola apertura y un solo fsync
+def agregar_filas_csv(ruta, filas, campos) -> bool:
+    firma_previa = firma_categoria(ruta)
     try:
-        with open(ruta, "w", newline="", encoding="utf-8") as archivo:
+        tamano = os.path.getsize(ruta) if os.path.exists(ruta) else 0
+        firma_indice = list(firma_previa[:2]) if firma_previa else None
+        # Si el archivo no termina en salto de línea, la primera fila quedaría pegada a la última
+        falta_salto = False
+        if tamano > 0:
+            with open(ruta, "rb") as archivo:
+                archivo.seek(-1, os.SEEK_END)
+                falta_salto = archivo.read(1) != b"\n"
+
+        with open(ruta, "a", newline="", encoding="utf-8") as archivo:
             writer = csv.DictWriter(archivo, fieldnames=campos)
-            writer.writeheader()
-            writer.writerows(datos)
-            print("Item agregado exitosamente")
+            if tamano == 0:
+                writer.writeheader()
+            elif falta_salto:
+                archivo.write("\r\n")
+            writer.writerows(filas)
+            archivo.flush()
+            os.fsync(archivo.fileno())
     except Exception as e:
         print(f"Error al escribir en el archivo '{ruta}': {e}")
+        return False
+
+    registrar_agregados(ruta, filas, firma_previa)
+    if tamano > 0:
+        indexar_agregados(ruta, filas, firma_indice, tamano + (2 if falta_salto else 0))
+    return True
+
+#Busca un producto por ID. Si la categoría ya está en caché usa el índice en memoria;
+#si no, lee solo esa fila usando el índice del motor. Retorna None si no existe
+def buscar_producto(ruta, id_producto) -> dict:
+    if esta_en_cache(ruta) or existe_diario(ruta):
+        return obtener_producto(ruta, id_producto)
+    try:
+        return leer_fila(ruta, id_producto)
+    except OSError:
+        return None
+
+#Posición del ID dentro de una copia de la categoría obtenida con leer_csv.
+#Usa el índice de la caché y solo recorre la lista si la copia quedó desfasada
+def ubicar_id(ruta, datos, id_producto) -> int:
+    posicion = posicion_id(ruta, id_producto)
+    if posicion is not None and posicion < len(datos) and datos[posicion].get('ID') == id_producto:
+        return posicion
+    for posicion, item in enumerate(datos):
+        if item.get('ID') == id_producto:
+            return posicion
+    return None
+
+#Da de alta varios productos en una categoría con una sola escritura.
+#Los IDs se asignan a partir del mayor ID guardado en caché, con la categoría bloqueada
+#para que otro proceso no asigne los mismos.
+#Retorna la lista de IDs asignados (vacía si no se pudo escribir)
+def alta_items_lote(ruta_csv, productos) -> list:
+    if not productos:
+        return []
+    with bloquear_categoria(ruta_csv):
+        siguiente = maximo_id(ruta_csv) + 1
+        filas = []
+        for desplazamiento, producto in enumerate(productos):
+            filas.append({
+                'ID': str(siguiente + desplazamiento),
+                'Nombre': producto['Nombre'],
+                'Precio': producto['Precio'],
+                'Stock': producto['Stock']
+            })
+        firma_previa = firma_categoria(ruta_csv)
+        if usa_diario(ruta_csv):
+            guardado = persistir_operaciones(ruta_csv, [{"op": "alta", "fila": fila} for fila in filas])
+        else:
+            guardado = agregar_filas_csv(ruta_csv, filas, ENCABEZADOS)
+        # El historial se registra con la categoría bloqueada: va por ID y otro proceso podría renumerarlos
+        if guardado:
+            registrar_historial(ruta_csv, agregar=filas)
+    if not guardado:
+        return []
+    aplicar_cambio(ruta_csv, firma_previa, agregar=filas)
+    return [fila['ID'] for fila in filas]
 
 #Añade un nuevo producto dentro de la categoría seleccionada
+@instrumentar("menu.alta_item")
 def alta_item(estructura) -> None:
     ruta_csv = seleccionar_categoria(estructura)
     if not ruta_csv:
         return
 
-    campos = ENCABEZADOS
-    datos = leer_csv(ruta_csv)
-    ultimo_id = int(datos[-1]["ID"])
-
-    nuevo_id = str(ultimo_id + 1)
     nombre = ingresar_texto("Ingrese nombre del producto: ")
     precio = ingresar_numero("Ingrese precio del producto: ")
     stock = ingresar_numero("Ingrese stock del producto: ")
     nuevo_item = {
-        'ID': nuevo_id,
         'Nombre': nombre,
         'Precio': precio,
         'Stock': stock
     }
-    datos.append(nuevo_item)
-    escribir_csv(ruta_csv, datos, campos)
+    if alta_items_lote(ruta_csv, [nuevo_item]):
+        print("Item agregado exitosamente")
+
+#Busca por nombre en todas las categorías usando el índice de nombres
+#(no distingue acentos: "lacteo" encuentra "Lácteo")
+def buscar_en_todas() -> None:
+    filtro = ingresar_texto("Ingrese texto para buscar por nombre: ")
+    prefijo = input("Solo palabras que empiecen con el texto? (s/n, por defecto n): ").strip().lower() == 's'
+    resultados = buscar_por_nombre(filtro, prefijo=prefijo)
+    if not resultados:
+        print("No se encontraron productos que coincidan con el filtro.")
+        return
+
+    print(f"\nProductos encontrados: {len(resultados)}")
+    imprimir_tabla(({"Categoría": os.path.relpath(os.path.dirname(ruta), RUTA_BASE), **item}
+                    for ruta, item in resultados), ["Categoría"] + ENCABEZADOS)
 
 #Muestra los productos de la categoría seleccionada (permite filtrar por nombre)
+@instrumentar("menu.mostrar_items")
 def mostrar_items(estructura, filtrado=False) -> None:
+    if filtrado:
+        alcance = input("Buscar en todas las categorías? (s/n, por defecto n): ").strip().lower()
+        if alcance == 's':
+            buscar_en_todas()
+            return
+
     ruta_csv = seleccionar_categoria(estructura)
     if not ruta_csv:
         return
 
-    productos = leer_csv(ruta_csv)
+    # Las categorías muy grandes se muestran por páginas sin cargarlas completas
+    if es_grande(ruta_csv):
+        filtro = ingresar_texto("Ingrese texto para filtrar por nombre: ") if filtrado else None
+        mostrar_paginado(ruta_csv, filtro)
+        return
+
+    productos, tabla = leer_csv_columnas(ruta_csv)
     if not productos:
         print("No hay productos en esta categoría.")
         return
 
     if filtrado:
-        filtro = ingresar_texto("Ingrese texto para filtrar por nombre: ").lower()
-        productos = [
-            item for item in productos
-            if filtro in item.get('Nombre', '').lower()
-        ]
+        filtro = ingresar_texto("Ingrese texto para filtrar por nombre: ")
+        productos = [productos[posicion] for posicion in filtrar(tabla, filtro)]
         if not productos:
             print("No se encontraron productos que coincidan con el filtro.")
             return
 
     print(f"\nProductos en: {ruta_csv}")
-    headers = list(productos[0].keys())
-    header_str = " | ".join(f"{h:^12}" for h in headers)
-    print("-" * len(header_str))
-    print(header_str)
-    print("-" * len(header_str))
-    for item in productos:
-        row = " | ".join(f"{str(item.get(h, '')):^12}" for h in headers)
-        print(row)
-    print("-" * len(header_str))
+    imprimir_tabla(productos, list(productos[0].keys()))
+
+#Muestra una categoría de a una página, leyendo solo las filas de la página pedida
+def mostrar_paginado(ruta_csv, filtro=None) -> None:
+    numero = 1
+    while True:
+        productos, hay_mas = pagina(ruta_csv, numero, filtro=filtro)
+        if not productos:
+            print("No se encontraron productos que coincidan con el filtro." if filtro and numero == 1
+                  else "No hay productos en esta página.")
+            if numero == 1:
+                return
+        else:
+            print(f"\nProductos en: {ruta_csv} (página {numero})")
+            imprimir_tabla(productos, ENCABEZADOS)
+
+        opcion = input("Enter: página siguiente | número: ir a esa página | 0: salir: ").strip()
+        if opcion == "0":
+            return
+        if opcion.isdigit():
+            numero = int(opcion)
+        elif not opcion and hay_mas:
+            numero += 1
+        elif not opcion:
+            print("No hay más páginas.")
+            return
+        else:
+            print("Opción inválida.")
+
+#Aplica cambios (Nombre, Precio y/o Stock) al producto con el ID indicado y los guarda.
+#Con diario no hace falta copiar la categoría: se toma solo la fila por su ID.
+#Si se indica el producto que vio el usuario (esperado) y otro proceso lo cambió
+#mientras tanto, lanza ConflictoVersion sin guardar.
+#Retorna el producto modificado, o None si el ID no existe o no se pudo guardar
+def modificar_producto(ruta, id_producto, cambios, esperado=None) -> dict:
+    with bloquear_categoria(ruta):
+        if usa_diario(ruta):
+            datos = None
+            item = buscar_producto(ruta, id_producto)
+            if item is None:
+                return None
+        else:
+            datos = leer_csv(ruta)
+            posicion = ubicar_id(ruta, datos, id_producto)
+            if posicion is None:
+                return None
+            item = datos[posicion]
+        if esperado is not None:
+            verificar_producto(ruta, esperado, item)
+
+        anterior = dict(item)
+        item.update(cambios)
+        operacion = {"op": "modificar", "id": id_producto, "campos": cambios}
+        firma_previa = firma_categoria(ruta)
+        if not persistir_cambios(ruta, datos, [operacion]):
+            return None
+        registrar_historial(ruta, quitar=[anterior], agregar=[item])
+    aplicar_cambio(ruta, firma_previa, quitar=[anterior], agregar=[item])
+    return item
+
+#Elimina el producto con el ID indicado. Sin bajas con marca, los IDs se renumeran.
+#Como en modificar_producto, con esperado se verifica que sea el producto que vio el usuario
+#(después de una baja renumerada en otro proceso, el mismo ID puede ser otro producto).
+#Retorna el producto eliminado, o None si el ID no existe o no se pudo guardar
+def eliminar_producto(ruta, id_producto, esperado=None) -> dict:
+    renumerar = not config.BAJA_CON_MARCA
+    operacion = {"op": "eliminar", "id": id_producto, "renumerar": renumerar}
+
+    with bloquear_categoria(ruta):
+        firma_previa = firma_categoria(ruta)
+        if not renumerar or usa_diario(ruta):
+            # La baja queda registrada en el diario (con marca, los demás IDs no cambian)
+            item = buscar_producto(ruta, id_producto)
+            if item is None:
+                return None
+            if esperado is not None:
+                verificar_producto(ruta, esperado, item)
+            if not renumerar:
+                # Antes de la baja, para que su ID no se reasigne aunque se compacte el diario
+                guardar_maximo_id(ruta, maximo_id(ruta))
+            guardado = persistir_operaciones(ruta, [operacion])
+        else:
+            datos = leer_csv(ruta)
+            posicion = ubicar_id(ruta, datos, id_producto)
+            if posicion is None:
+                return None
+            item = datos[posicion]
+            if esperado is not None:
+                verificar_producto(ruta, esperado, item)
+            datos_nuevos = datos[:posicion] + datos[posicion + 1:]
+            # Reindexar IDs
+            for idx, producto in enumerate(datos_nuevos, 1):
+                producto['ID'] = str(idx)
+            guardado = persistir_cambios(ruta, datos_nuevos, [operacion])
+        if guardado:
+            registrar_historial(ruta, quitar=[item], renumerar=id_producto if renumerar else None)
+
+    if not guardado:
+        return None
+    aplicar_cambio(ruta, firma_previa, quitar=[item])
+    return item
 
 #Modifica un item existente en el CSV seleccionado
+@instrumentar("menu.modificar_item")
 def modificar_item(archivos_csv) -> None:
     archivo = seleccionar_categoria(archivos_csv)
     if not archivo:
@@ -179,47 +393,41 @@ def modificar_item(archivos_csv) -> None:
         return
 
     print("\nItems disponibles:")
-    headers = ENCABEZADOS
-    header_str = " | ".join(f"{h:^12}" for h in headers)
-    print("-" * len(header_str))
-    print(header_str)
-    print("-" * len(header_str))
-    for item in datos:
-        row = " | ".join(f"{str(item.get(h,'')):^12}" for h in headers)
-        print(row)
-    print("-" * len(header_str))
+    imprimir_tabla(datos, ENCABEZADOS)
 
     id_modificar = ingresar_id("\nIngresar id del producto a modificar: ")
-    item_encontrado = False
-    
-    for item in datos:
-        if item.get('ID') == id_modificar:
-            item_encontrado = True
-            print(f"\nModificando item {id_modificar}:")
-            print(f"Nombre actual: {item['Nombre']}")
-            print(f"Precio actual: {item['Precio']}")
-            print(f"Stock actual: {item['Stock']}")
-            
-            try:
-                nombre = input("\nNuevo nombre (Enter para mantener actual): ").strip()
-                precio = input("Nuevo precio (Enter para mantener actual): ").strip()
-                stock = input("Nuevo stock (Enter para mantener actual): ").strip()
-            except ValueError:
-                print("Valores incorrectos. Abortando")
-                return
-            
-            if nombre: item['Nombre'] = nombre
-            if precio: item['Precio'] = precio
-            if stock: item['Stock'] = stock
-            break
-
-    if item_encontrado:
-        escribir_csv(archivo, datos, headers)
-        print("\nItem modificado exitosamente")
-    else:
+    posicion = ubicar_id(archivo, datos, id_modificar)
+    if posicion is None:
         print("\nID no encontrado")
+        return
+
+    item = datos[posicion]
+    print(f"\nModificando item {id_modificar}:")
+    print(f"Nombre actual: {item['Nombre']}")
+    print(f"Precio actual: {item['Precio']}")
+    print(f"Stock actual: {item['Stock']}")
+
+    try:
+        nombre = input("\nNuevo nombre (Enter para mantener actual): ").strip()
+        precio = input("Nuevo precio (Enter para mantener actual): ").strip()
+        stock = input("Nuevo stock (Enter para mantener actual): ").strip()
+    except ValueError:
+        print("Valores incorrectos. Abortando")
+        return
+
+    cambios = {}
+    if nombre: cambios['Nombre'] = nombre
+    if precio: cambios['Precio'] = precio
+    if stock: cambios['Stock'] = stock
+
+    try:
+        if modificar_producto(archivo, id_modificar, cambios, esperado=item):
+            print("\nItem modificado exitosamente")
+    except ConflictoVersion as e:
+        print(f"\n{e}")
 
 #Elimina un item existente en el CSV seleccionado
+@instrumentar("menu.eliminar_item")
 def eliminar_item(archivos_csv) -> None:
     archivo = seleccionar_categoria(archivos_csv)
     if not archivo:
@@ -230,84 +438,105 @@ def eliminar_item(archivos_csv) -> None:
         return
 
     print("\nItems disponibles:")
-    headers = ENCABEZADOS
-    header_str = " | ".join(f"{h:^12}" for h in headers)
-    print("-" * len(header_str))
-    print(header_str)
-    print("-" * len(header_str))
-    for item in datos:
-        row = " | ".join(f"{str(item.get(h,'')):^12}" for h in headers)
-        print(row)
-    print("-" * len(header_str))
+    imprimir_tabla(datos, ENCABEZADOS)
 
     id_eliminar = ingresar_id("\nIngrese ID del item a eliminar: ")
-    item_a_eliminar = None
-    for item in datos:
-        if item.get('ID') == id_eliminar:
-            item_a_eliminar = item
-            break
-
-    if item_a_eliminar:
-        confirmacion = input(f"\n¿Está seguro que desea eliminar '{item_a_eliminar['Nombre']}'? (s/n): ").lower().strip()
-        if confirmacion == 's':
-            datos_nuevos = [item for item in datos if item.get('ID') != id_eliminar]
-            # Reindexar IDs
-            for idx, item in enumerate(datos_nuevos, 1):
-                item['ID'] = str(idx)
-            escribir_csv(archivo, datos_nuevos, headers)
-            print("\nItem eliminado exitosamente")
-        else:
-            print("\nOperación cancelada")
-    else:
+    posicion = ubicar_id(archivo, datos, id_eliminar)
+    if posicion is None:
         print("\nID no encontrado")
+        return
 
-#Intenta convertir una cadena de precio a float
-def parse_precio(valor) -> float:
-    if valor is None:
-        return None
-    try:
-        s = str(valor).strip()
-        # Si hay una coma y no hay punto, la usamos como separador decimal
-        if s.count(',') >= 1 and s.count('.') == 0:
-            s = s.replace(',', '.')
-        return float(s)
-    except Exception:
-        return None
+    item_a_eliminar = datos[posicion]
+    confirmacion = input(f"\n¿Está seguro que desea eliminar '{item_a_eliminar['Nombre']}'? (s/n): ").lower().strip()
+    if confirmacion != 's':
+        print("\nOperación cancelada")
+        return
 
-#Convierte a int cuando sea posible. Devuelve None si no se puede
-def parse_entero(valor) -> int:
-    if valor is None:
-        return None
     try:
-        return int(float(str(valor).strip()))
-    except Exception:
-        return None
+        if eliminar_producto(archivo, id_eliminar, esperado=item_a_eliminar):
+            print("\nItem eliminado exitosamente")
+    except ConflictoVersion as e:
+        print(f"\n{e}")
 
 #Recorre una lista de diccionarios, obteniendo solo el precio
 def key_precio(item) -> tuple:
-    p = parse_precio(item.get('Precio'))
+    p = a_precio(item.get('Precio'))
     return (p if p is not None else 0.0)
 
 #Recorre una lista de diccionarios, obteniendo solo el stock
 def key_stock(item) -> tuple:
-    s = parse_entero(item.get('Stock'))
+    s = a_entero(item.get('Stock'))
     return (s if s is not None else 0)
 
+#Devuelve una copia de los productos de la categoría ordenada por 'Precio' o 'Stock'.
+#campo también puede ser una lista de campos (por ejemplo ['Precio', 'Stock'])
+def ordenar_productos(ruta, campo, descendente=False) -> list:
+    datos, tabla = leer_csv_columnas(ruta)
+    if not datos:
+        return []
+    return [datos[posicion] for posicion in orden_por_claves(tabla, normalizar_claves(campo, descendente))]
+
+#Guarda el orden recibido en el archivo, renumerando los IDs.
+#firma_base es la firma de la categoría cuando se leyeron los datos: si otro proceso
+#la cambió desde entonces, guardar pisaría sus cambios y se lanza ConflictoVersion
+def guardar_orden(ruta, datos_ordenados, firma_base=None) -> bool:
+    # Reindexar IDs (el historial de cada producto pasa a su ID nuevo)
+    renumerados = {}
+    for idx, item in enumerate(datos_ordenados, 1):
+        if item['ID'] != str(idx):
+            renumerados[item['ID']] = idx
+        item['ID'] = str(idx)
+    with bloquear_categoria(ruta):
+        # Reordenar no cambia precios ni stocks: las estadísticas solo actualizan la firma
+        firma_previa = firma_categoria(ruta)
+        if firma_base is not None:
+            verificar_version(ruta, firma_base, firma_previa)
+        if not escribir_csv(ruta, datos_ordenados, ENCABEZADOS):
+            return False
+        reordenar_historial(ruta, renumerados)
+    aplicar_cambio(ruta, firma_previa)
+    return True
+
+#Ordena una categoría sin cargarla en memoria y guarda el resultado con los IDs renumerados.
+#En CSV se ordena a un temporal junto al archivo (ordenamiento externo) que después lo reemplaza;
+#en SQLite el orden lo resuelve la base. Retorna True si se pudo guardar
+def guardar_orden_externo(ruta, claves) -> bool:
+    with bloquear_categoria(ruta):
+        firma_previa = firma_categoria(ruta)
+        try:
+            if usa_sqlite():
+                renumerados = ordenar_categoria(ruta, claves)
+            else:
+                temporal = ruta + ".orden"
+                renumerados = {}
+                ordenar_csv(ruta, claves, temporal, renumerados=renumerados)
+                # ordenar_csv compacta el diario si había uno: la firma previa es la posterior a eso
+                firma_previa = firma_categoria(ruta)
+                reemplazar_categoria(ruta, temporal)
+        except Exception as e:
+            print(f"Error al ordenar '{ruta}': {e}")
+            return False
+        invalidar(ruta)
+        if os.path.exists(ruta_indice(ruta)):
+            reindexar(ruta)
+        reordenar_historial(ruta, renumerados)
+    aplicar_cambio(ruta, firma_previa)
+    return True
+
 #Ordena los productos de una categoría por Precio y/o Stock
+@instrumentar("menu.ordenar_items")
 def ordenar_items(archivos_csv) -> None:
     archivo = seleccionar_categoria(archivos_csv)
     if not archivo:
         return
-    datos = leer_csv(archivo)
-    if not datos:
-        print("No hay productos para ordenar.")
-        return
 
     print("\nOpciones de ordenamiento:")
     print("1. Precio")
     print("2. Stock")
-    opcion = input("Elija opción (1/2): ").strip()
-    if opcion not in ('1', '2'):
+    print("3. Precio y luego Stock")
+    print("4. Stock y luego Precio")
+    opcion = input("Elija opción (1/2/3/4): ").strip()
+    if opcion not in ('1', '2', '3', '4'):
         print("Opción inválida. Operación cancelada.")
         return
 
@@ -315,95 +544,100 @@ def ordenar_items(archivos_csv) -> None:
     reverse = False
     if orden == 'n':
         reverse = True
+    campos = {'1': ['Precio'], '2': ['Stock'], '3': ['Precio', 'Stock'], '4': ['Stock', 'Precio']}[opcion]
+    claves = normalizar_claves(campos, reverse)
+
+    # Las categorías muy grandes se ordenan en disco y se muestra la primera página del resultado
+    if es_grande(archivo):
+        guardar = input("\nLa categoría es grande: se ordenará directamente en el archivo. Continuar? (s/n): ").strip().lower()
+        if guardar != 's':
+            print("\nOperación terminada sin guardar.")
+            return
+        if guardar_orden_externo(archivo, claves):
+            print("\nArchivo actualizado con el nuevo orden.")
+            mostrar_paginado(archivo)
+        return
 
-    if opcion == '1':
-        datos_ordenados = sorted(datos, key=key_precio, reverse=reverse)
-    elif opcion == '2':
-        datos_ordenados = sorted(datos, key=key_stock, reverse=reverse)
+    firma_base = firma_categoria(archivo)
+    datos, tabla = leer_csv_columnas(archivo)
+    if not datos:
+        print("No hay productos para ordenar.")
+        return
+
+    # El orden se calcula sobre las columnas numéricas, sin convertir textos en cada clave
+    datos_ordenados = [datos[posicion] for posicion in orden_por_claves(tabla, claves)]
 
     # Mostrar resultados en tabla
-    headers = ENCABEZADOS
-    header_str = " | ".join(f"{h:^12}" for h in headers)
     print("\nResultado del ordenamiento:")
-    print("-" * len(header_str))
-    print(header_str)
-    print("-" * len(header_str))
-    for item in datos_ordenados:
-        row = " | ".join(f"{str(item.get(h,'')):^12}" for h in headers)
-        print(row)
-    print("-" * len(header_str))
+    imprimir_tabla(datos_ordenados, ENCABEZADOS)
 
     guardar = input("\nDesea guardar el nuevo orden en el archivo? (s/n): ").strip().lower()
     if guardar == 's':
-        # Reindexar IDs
-        for idx, item in enumerate(datos_ordenados, 1):
-            item['ID'] = str(idx)
-        escribir_csv(archivo, datos_ordenados, headers)
-        print("\nArchivo actualizado con el nuevo orden.")
+        try:
+            if guardar_orden(archivo, datos_ordenados, firma_base):
+                print("\nArchivo actualizado con el nuevo orden.")
+        except ConflictoVersion as e:
+            print(f"\n{e}")
     else:
         print("\nOperación terminada sin guardar.")
 
 #Calcula el promedio de Precio y Stock
+@instrumentar("menu.promedio_productos")
 def promedio_productos(archivos_csv):
     print("\nCalcular promedio:")
     print("1. Categoría seleccionada")
     print("2. Todas las categorías (global)")
     opcion = input("Elija opción (1/2): ").strip()
 
-    rutas_csv = []
-
+    # Las estadísticas se mantienen por categoría y por carpeta; solo se leen
+    # de disco las categorías que cambiaron desde la última consulta
     if opcion == '1':
         ruta_csv = seleccionar_categoria(archivos_csv)
         if not ruta_csv:
             return
-        rutas_csv = [ruta_csv]
+        por_categoria = {ruta_csv: resumen_categoria(ruta_csv)}
+        total = por_categoria[ruta_csv]
 
     elif opcion == '2':
-        rutas_csv = []
-        # Recorre todo el árbol desde la base y agrega todos los archivos productos.csv
-        for root, _, files in os.walk(RUTA_BASE):
-            for f in files:
-                if f.lower() == NOMBRE_CSV.lower():
-                    rutas_csv.append(os.path.join(root, f))
-        if not rutas_csv:
+        por_categoria, total = resumen_global()
+        if not por_categoria:
             print("No se encontraron archivos CSV para procesar.")
             return
     else:
         print("Opción inválida.")
         return
 
-    total_precio = total_stock = 0.0
-    count_precio = count_stock = 0
-
-    for ruta in rutas_csv:
-        datos = leer_csv(ruta)
-        for item in datos:
-            precio = parse_precio(item.get("Precio"))
-            if precio is not None:
-                total_precio += precio
-                count_precio += 1
-
-            stock = parse_entero(item.get("Stock"))
-            if stock is not None:
-                total_stock += stock
-                count_stock += 1
+    resultado = describir(total)
+    precio, stock = resultado["precio"], resultado["stock"]
 
     # Resultados
-    if count_precio == 0 and count_stock == 0:
+    if precio is None and stock is None:
         print("No se encontraron datos numéricos válidos para calcular promedios.")
         return
 
+    if len(por_categoria) > 1:
+        print("\nPromedios por categoría:")
+        for ruta, resumen in por_categoria.items():
+            detalle = describir(resumen)
+            categoria = os.path.relpath(os.path.dirname(ruta), RUTA_BASE)
+            if detalle["precio"] is None:
+                print(f"- {categoria}: sin productos")
+                continue
+            texto_stock = f"{detalle['stock']['promedio']:.2f}" if detalle["stock"] else "-"
+            print(f"- {categoria}: precio {detalle['precio']['promedio']:.2f}, "
+                  f"stock {texto_stock} ({detalle['precio']['cantidad']} productos)")
+
     print("\nResultados del promedio:")
 
-    if count_precio > 0:
-        promedio_precio = total_precio / count_precio
-        print(f"Promedio de precio: {promedio_precio:.2f} (sobre {count_precio} productos)")
+    if precio is not None:
+        print(f"Promedio de precio: {precio['promedio']:.2f} (sobre {precio['cantidad']} productos)")
+        print(f"  Mínimo: {precio['minimo']} | Máximo: {precio['maximo']} | Mediana: {precio['mediana']:.2f}")
     else:
         print("No hay datos de precio válidos.")
 
-    if count_stock > 0:
-        promedio_stock = total_stock / count_stock
-        print(f"Promedio de stock: {promedio_stock:.2f} (sobre {count_stock} productos)")
+    if stock is not None:
+        print(f"Promedio de stock: {stock['promedio']:.2f} (sobre {stock['cantidad']} productos)")
+        print(f"  Mínimo: {stock['minimo']} | Máximo: {stock['maximo']} | Mediana: {stock['mediana']:.2f}")
     else:
         print("No hay datos de stock válidos.")
 
@@ -0,0 +1,64 @@
+import os
+import csv
+import random
+from .config import NOMBRE_CSV, ENCABEZADOS
+
+#Catálogos sintéticos con la forma de Supermercado/ para medir rendimiento.
+#Cada nivel tiene "ramas" subcarpetas y las carpetas del último nivel son hojas con
+#"filas" productos. Una fracción de las líneas ("invalidas") sale con errores que la
+#validación tiene que descartar o corregir. Con la misma semilla se genera el mismo catálogo.
+
+_PRODUCTOS = ("Leche", "Yogur", "Queso", "Avena", "Copos", "Galletitas", "Gaseosa", "Jugo",
+              "Agua", "Café", "Té", "Azúcar", "Harina", "Arroz", "Fideos", "Aceite")
+_VARIANTES = ("Entera", "Descremada", "Light", "Zero", "Natural", "Clásico", "Integral",
+              "Familiar", "Chocolate", "Vainilla", "Naranja", "Limón", "Sin TACC", "Orgánico")
+
+#Una línea inválida de alguno de los tipos que rechaza validar_csv
+def _fila_invalida(azar: random.Random, id_producto: int, nombre: str) -> list:
+    tipo = azar.randrange(5)
+    if tipo == 0:
+        return [str(id_producto), nombre, "abc", "10"]            # precio no numérico
+    if tipo == 1:
+        return [str(id_producto), "", "100", "10"]                # nombre vacío
+    if tipo == 2:
+        return [str(id_producto), nombre, "100"]                  # columnas de menos
+    if tipo == 3:
+        return [str(id_producto), nombre, "100", "10", "extra"]   # columnas de más
+    return [f" {id_producto}", f" {nombre} ", "100 ", "10"]      # espacios de más (se corrige)
+
+def _escribir_hoja(ruta: str, azar: random.Random, filas: int, invalidas: float) -> int:
+    cantidad_invalidas = 0
+    with open(ruta, "w", newline="", encoding="utf-8") as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(ENCABEZADOS)
+        for id_producto in range(1, filas + 1):
+            nombre = f"{azar.choice(_PRODUCTOS)} {azar.choice(_VARIANTES)} {azar.randrange(1000)}"
+            if invalidas and azar.random() < invalidas:
+                escritor.writerow(_fila_invalida(azar, id_producto, nombre))
+                cantidad_invalidas += 1
+            else:
+                escritor.writerow([id_producto, nombre, azar.randrange(50, 50000), azar.randrange(0, 500)])
+    return cantidad_invalidas
+
+#Genera el catálogo en base (que no debería existir) y retorna un resumen de lo generado
+def generar_catalogo(base: str, profundidad: int = 3, ramas: int = 4, filas: int = 1000,
+                     invalidas: float = 0.0, semilla: int = 0) -> dict:
+    if profundidad < 1 or ramas < 1 or filas < 0:
+        raise ValueError("La profundidad y las ramas tienen que ser al menos 1 y las filas no negativas")
+    azar = random.Random(semilla)
+    resumen = {"hojas": 0, "carpetas": 0, "filas": 0, "invalidas": 0, "bytes": 0}
+    pendientes = [(base, 0)]
+    while pendientes:
+        carpeta, nivel = pendientes.pop()
+        os.makedirs(carpeta, exist_ok=True)
+        resumen["carpetas"] += 1
+        if nivel == profundidad:
+            ruta = os.path.join(carpeta, NOMBRE_CSV)
+            resumen["invalidas"] += _escribir_hoja(ruta, azar, filas, invalidas)
+            resumen["hojas"] += 1
+            resumen["filas"] += filas
+            resumen["bytes"] += os.path.getsize(ruta)
+            continue
+        for rama in range(ramas, 0, -1):
+            pendientes.append((os.path.join(carpeta, f"Sección {nivel + 1}.{rama}"), nivel + 1))
+    return resumen
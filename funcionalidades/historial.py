@@ -0,0 +1,348 @@
+import os
+import math
+import time
+import struct
+import hashlib
+from datetime import datetime
+from . import config
+from .config import EXTENSION_HISTORIAL, EXTENSION_CABEZAS
+from .motor import usa_sqlite
+from .bloqueos import bloquear_categoria
+from .lector_csv import a_precio, a_entero
+
+#Historial de precios y stock de cada categoría, de solo agregado ("Productos.csv.historial").
+#Cada cambio es un registro de ancho fijo: el ID del producto, el instante, el precio y el stock
+#que quedaron, el tipo de registro y el número del registro anterior del mismo producto. Así cada
+#producto tiene su propia cadena hacia atrás y una consulta recorre solo los cambios de ese producto.
+#Un alta empieza una cadena nueva, así un ID que se vuelve a asignar no hereda el historial anterior.
+#Cuando los IDs se renumeran la cadena sigue al producto:
+#  - una baja que renumera agrega un registro de desplazamiento: los IDs mayores bajan uno
+#  - un orden guardado agrega, por cada producto con historial que cambió de ID, un enlace del
+#    ID nuevo a su cadena, y cierra las cadenas de los IDs que quedaron con otro producto sin historial
+#El índice de cabezas ("Productos.csv.historial.cabezas") guarda en una ranura fija por ID su
+#último registro, que se sobrescribe en el lugar, y cuántos registros del historial refleja: al
+#abrirlo solo se leen los registros posteriores (los que quedaron sin indexar si se cortó una
+#escritura o los que agregó otro proceso). Después de un desplazamiento las ranuras quedan con los
+#IDs anteriores, así que no se tocan: el índice se reescribe entero (con otra generación, para que
+#los demás procesos lo vuelvan a leer) recién cuando los registros sin reflejar superan a las ranuras.
+#Con SQLite los historiales van en la carpeta RUTA_SQLITE + ".historial".
+#
+#Formato (little endian):
+#  historial  MAGICO, versión y los registros: ID, instante (ns), precio (NaN: inválido),
+#             stock (SIN_STOCK: inválido), registro anterior (-1: ninguno), tipo, precio entero
+#  cabezas    MAGICO_CABEZAS, versión, registros reflejados, generación y las ranuras: ID, último registro
+
+MAGICO = b"SUPH"
+MAGICO_CABEZAS = b"SUPC"
+VERSION = 2
+_CABECERA = struct.Struct("<4sHxx")
+_CABECERA_CABEZAS = struct.Struct("<4sHxxQQ")
+_REGISTRO = struct.Struct("<QqdqqBB6x")
+_RANURA = struct.Struct("<Qq")
+_LEER_DE_A = 65536
+SIN_STOCK = -2 ** 63
+
+#Tipos de registro
+CAMBIO, BAJA, DESPLAZAMIENTO, ENLACE, CIERRE = range(5)
+
+_historiales = {}   # ruta del CSV -> estado (ver _nuevo_estado)
+
+def ruta_historial(ruta: str) -> str:
+    if usa_sqlite():
+        nombre = hashlib.blake2b(os.path.normpath(ruta).encode("utf-8"), digest_size=8).hexdigest()
+        return os.path.join(config.RUTA_SQLITE + EXTENSION_HISTORIAL, nombre + EXTENSION_HISTORIAL)
+    return ruta + EXTENSION_HISTORIAL
+
+def ruta_cabezas(ruta: str) -> str:
+    return ruta_historial(ruta) + EXTENSION_CABEZAS
+
+#ID numérico de un producto (None si no tiene uno válido: no se registra)
+def _id(valor) -> int:
+    numero = a_entero(str(valor).strip()) if valor is not None else None
+    return numero if numero is not None and numero >= 0 else None
+
+#Cantidad de registros completos del historial (un registro cortado al final no cuenta).
+#Un historial sin cabecera o de otra versión cuenta como vacío y se reemplaza al registrar
+def _cantidad(ruta_h: str) -> int:
+    try:
+        with open(ruta_h, "rb") as archivo:
+            if archivo.read(_CABECERA.size) != _CABECERA.pack(MAGICO, VERSION):
+                return 0
+            tamano = os.fstat(archivo.fileno()).st_size
+    except OSError:
+        return 0
+    return (tamano - _CABECERA.size) // _REGISTRO.size
+
+def _leer_registros(ruta_h: str, desde: int, hasta: int):
+    with open(ruta_h, "rb") as archivo:
+        if archivo.read(_CABECERA.size) != _CABECERA.pack(MAGICO, VERSION):
+            raise ValueError(f"Historial inválido: '{ruta_h}'")
+        archivo.seek(_CABECERA.size + desde * _REGISTRO.size)
+        while desde < hasta:
+            cantidad = min(_LEER_DE_A, hasta - desde)
+            yield from enumerate(_REGISTRO.iter_unpack(archivo.read(cantidad * _REGISTRO.size)), desde)
+            desde += cantidad
+
+#Estado en memoria del historial de una categoría: registros leídos, cabezas (ID -> último
+#registro), ranuras del índice (ID -> ranura), IDs con cabeza sin escribir en el índice, y del
+#índice en disco: registros reflejados, generación y si hubo un desplazamiento posterior
+def _nuevo_estado() -> dict:
+    return {"registros": 0, "cabezas": {}, "ranuras": {}, "pendientes": set(),
+            "reflejados": 0, "generacion": None, "desplazado": False}
+
+#Lee el índice de cabezas. Con un estado nuevo (primera) toma sus ranuras y sus cabezas; con
+#uno ya cargado solo las ranuras que agregaron otros procesos, porque las cabezas salen de los
+#registros nuevos. Retorna False si el índice ya no es el que se había leído (apareció,
+#desapareció o se reescribió con otra generación)
+def _leer_cabezas(ruta: str, estado: dict, total: int, primera: bool = False) -> bool:
+    conocidas = len(estado["ranuras"])
+    try:
+        with open(ruta_cabezas(ruta), "rb") as archivo:
+            magico, version, reflejados, generacion = _CABECERA_CABEZAS.unpack(archivo.read(_CABECERA_CABEZAS.size))
+            if magico != MAGICO_CABEZAS or version != VERSION or reflejados > total:
+                generacion = None
+            elif primera or generacion == estado["generacion"]:
+                archivo.seek(_CABECERA_CABEZAS.size + conocidas * _RANURA.size)
+                datos = archivo.read()
+    except (OSError, struct.error):
+        generacion = None
+    if not primera and generacion != estado["generacion"]:
+        return False
+    if generacion is None:
+        return True
+    estado["generacion"] = generacion
+    estado["reflejados"] = reflejados
+    datos = datos[:len(datos) - len(datos) % _RANURA.size]
+    for ranura, (clave, registro) in enumerate(_RANURA.iter_unpack(datos), conocidas):
+        estado["ranuras"][clave] = ranura
+        if primera and 0 <= registro < total and registro > estado["cabezas"].get(clave, -1):
+            estado["cabezas"][clave] = registro
+    return True
+
+#Aplica al estado un registro ya escrito en el historial
+def _aplicar(estado: dict, numero: int, clave: int, tipo: int) -> None:
+    if tipo == DESPLAZAMIENTO:
+        # Se eliminó el ID clave y los mayores bajaron uno
+        estado["cabezas"] = {c - (c > clave): r for c, r in estado["cabezas"].items() if c != clave}
+        estado["desplazado"] = True
+    else:
+        estado["cabezas"][clave] = numero
+        estado["pendientes"].add(clave)
+
+#Pone al día el estado en memoria de una categoría con lo que agregaron otros procesos
+def _sincronizar(ruta: str) -> dict:
+    ruta_h = ruta_historial(ruta)
+    total = _cantidad(ruta_h)
+    estado = _historiales.get(ruta)
+    if estado is not None and (total < estado["registros"] or not _leer_cabezas(ruta, estado, total)):
+        estado = None
+    if estado is None:
+        # Primera vez, o el historial o el índice se reemplazaron: se parte del índice de cabezas
+        estado = _historiales[ruta] = _nuevo_estado()
+        _leer_cabezas(ruta, estado, total, primera=True)
+        estado["registros"] = estado["reflejados"]
+    if estado["registros"] < total:
+        for numero, registro in _leer_registros(ruta_h, estado["registros"], total):
+            _aplicar(estado, numero, registro[0], registro[5])
+        estado["registros"] = total
+    return estado
+
+#Reescribe el índice de cabezas entero, con una generación nueva
+def _reescribir_cabezas(ruta: str, estado: dict) -> None:
+    ruta_c = ruta_cabezas(ruta)
+    claves = sorted(estado["cabezas"])
+    generacion = time.time_ns()
+    with open(ruta_c + ".tmp", "wb") as archivo:
+        archivo.write(_CABECERA_CABEZAS.pack(MAGICO_CABEZAS, VERSION, estado["registros"], generacion))
+        archivo.write(b"".join(_RANURA.pack(clave, estado["cabezas"][clave]) for clave in claves))
+    os.replace(ruta_c + ".tmp", ruta_c)
+    estado.update(ranuras={clave: ranura for ranura, clave in enumerate(claves)}, generacion=generacion,
+                  reflejados=estado["registros"], desplazado=False)
+    estado["pendientes"].clear()
+
+#Escribe en el índice de cabezas las de los productos que cambiaron
+def _escribir_cabezas(ruta: str, estado: dict) -> None:
+    if estado["desplazado"]:
+        # Las ranuras tienen los IDs de antes del desplazamiento: se reescribe todo solo cuando
+        # leer los registros sin reflejar ya cuesta más que escribir las ranuras
+        if estado["registros"] - estado["reflejados"] > len(estado["cabezas"]):
+            _reescribir_cabezas(ruta, estado)
+        return
+    try:
+        archivo = open(ruta_cabezas(ruta), "r+b") if estado["generacion"] is not None else None
+    except FileNotFoundError:
+        archivo = None
+    if archivo is None:
+        # Índice inexistente o dañado
+        _reescribir_cabezas(ruta, estado)
+        return
+    with archivo:
+        ranuras = estado["ranuras"]
+        for clave in sorted(estado["pendientes"], key=lambda c: ranuras.get(c, len(ranuras))):
+            ranura = ranuras.get(clave)
+            if ranura is None:
+                ranura = ranuras[clave] = len(ranuras)
+            archivo.seek(_CABECERA_CABEZAS.size + ranura * _RANURA.size)
+            archivo.write(_RANURA.pack(clave, estado["cabezas"][clave]))
+        archivo.seek(0)
+        archivo.write(_CABECERA_CABEZAS.pack(MAGICO_CABEZAS, VERSION, estado["registros"], estado["generacion"]))
+    estado["reflejados"] = estado["registros"]
+    estado["pendientes"].clear()
+
+#Agrega registros al historial de la categoría. armar recibe el estado al día (con la categoría
+#bloqueada) y retorna los registros como (ID, precio, stock, registro anterior, tipo, precio entero)
+def _agregar(ruta: str, armar, instante: int = None) -> int:
+    instante = time.time_ns() if instante is None else instante
+    ruta = os.path.normpath(ruta)
+    ruta_h = ruta_historial(ruta)
+    with bloquear_categoria(ruta):
+        if usa_sqlite():
+            os.makedirs(os.path.dirname(ruta_h), exist_ok=True)
+        estado = _sincronizar(ruta)
+        registros = armar(estado)
+        if not registros:
+            return 0
+        datos = [_REGISTRO.pack(clave, instante, precio, stock, anterior, tipo, entero)
+                 for clave, precio, stock, anterior, tipo, entero in registros]
+        with open(ruta_h, "ab") as archivo:
+            # Historial nuevo, de otra versión o con un registro cortado al final por una escritura interrumpida
+            if estado["registros"] == 0:
+                archivo.truncate(0)
+                datos.insert(0, _CABECERA.pack(MAGICO, VERSION))
+            else:
+                archivo.truncate(_CABECERA.size + estado["registros"] * _REGISTRO.size)
+            archivo.write(b"".join(datos))
+        for numero, (clave, _, _, _, tipo, _) in enumerate(registros, estado["registros"]):
+            _aplicar(estado, numero, clave, tipo)
+        estado["registros"] += len(registros)
+        _escribir_cabezas(ruta, estado)
+    return len(registros)
+
+#Precio (NaN si es inválido), stock (SIN_STOCK si es inválido) y si el precio es entero,
+#como lo convierte lector_csv.a_precio
+def _valores(producto: dict) -> tuple:
+    precio = a_precio(producto.get("Precio"))
+    stock = a_entero(producto.get("Stock"))
+    return (math.nan if precio is None else float(precio), SIN_STOCK if stock is None else stock,
+            int(isinstance(precio, int)))
+
+def _iguales(antes: tuple, despues: tuple) -> bool:
+    return antes[1:] == despues[1:] and (antes[0] == despues[0] or math.isnan(antes[0]) and math.isnan(despues[0]))
+
+#Cambios de precio o stock entre los productos quitados y agregados de una operación, como
+#(ID, valores, tipo, sigue la cadena). Los productos que solo cambiaron de nombre no cuentan
+def _cambios(quitar, agregar) -> list:
+    antes = {_id(producto.get("ID")): _valores(producto) for producto in quitar}
+    despues = {_id(producto.get("ID")): _valores(producto) for producto in agregar}
+    antes.pop(None, None)
+    despues.pop(None, None)
+    cambios = [(clave, valores, CAMBIO, clave in antes) for clave, valores in despues.items()
+               if clave not in antes or not _iguales(antes[clave], valores)]
+    cambios += [(clave, valores, BAJA, True) for clave, valores in antes.items() if clave not in despues]
+    return cambios
+
+#Registra en el historial los cambios de una operación ya guardada (mismos quitar y agregar
+#que estadisticas.aplicar_cambio). Si la baja renumeró los IDs, renumerar es el ID eliminado.
+#Se llama con la categoría todavía bloqueada, así ningún cambio posterior se registra con los
+#IDs de antes. Retorna la cantidad de registros agregados
+def registrar(ruta: str, quitar: list = (), agregar: list = (), instante: int = None, renumerar=None) -> int:
+    if not config.USAR_HISTORIAL:
+        return 0
+    cambios = _cambios(quitar, agregar)
+    eliminado = _id(renumerar) if renumerar is not None else None
+    if not cambios and eliminado is None:
+        return 0
+
+    def armar(estado):
+        cabezas = estado["cabezas"]
+        registros = [(clave, precio, stock, cabezas.get(clave, -1) if sigue else -1, tipo, entero)
+                     for clave, (precio, stock, entero), tipo, sigue in cambios]
+        if eliminado is not None:
+            registros.append((eliminado, math.nan, SIN_STOCK, -1, DESPLAZAMIENTO, 0))
+        return registros
+    return _agregar(ruta, armar, instante)
+
+#Registra que un orden guardado cambió los IDs: nuevos es ID anterior -> ID nuevo de los productos
+#que cambiaron (alcanza con los que tienen historial). Como registrar, se llama
+#con la categoría bloqueada. Retorna la cantidad de registros agregados
+def reordenar(ruta: str, nuevos: dict, instante: int = None) -> int:
+    if not config.USAR_HISTORIAL or not nuevos:
+        return 0
+    nuevos = {_id(viejo): _id(nuevo) for viejo, nuevo in nuevos.items()}
+    nuevos.pop(None, None)
+    origenes = {nuevo: viejo for viejo, nuevo in nuevos.items() if nuevo is not None}
+
+    def armar(estado):
+        cabezas = estado["cabezas"]
+        registros = []
+        for clave in sorted(nuevos.keys() | origenes.keys()):
+            origen = origenes.get(clave)
+            if origen in cabezas:
+                registros.append((clave, math.nan, SIN_STOCK, cabezas[origen], ENLACE, 0))
+            elif clave in cabezas:
+                registros.append((clave, math.nan, SIN_STOCK, -1, CIERRE, 0))
+        return registros
+    return _agregar(ruta, armar, instante)
+
+#Registros con precio y stock de un producto, del más nuevo al más viejo (los enlaces de un
+#orden se saltean y un cierre termina la cadena)
+def _cadena(ruta: str, id_producto):
+    ruta = os.path.normpath(ruta)
+    estado = _sincronizar(ruta)
+    numero = estado["cabezas"].get(_id(id_producto), -1)
+    if numero < 0:
+        return
+    with open(ruta_historial(ruta), "rb") as archivo:
+        while numero >= 0:
+            archivo.seek(_CABECERA.size + numero * _REGISTRO.size)
+            registro = _REGISTRO.unpack(archivo.read(_REGISTRO.size))
+            tipo = registro[5]
+            if tipo == CIERRE:
+                return
+            if tipo == DESPLAZAMIENTO:
+                raise ValueError(f"Historial inválido: '{ruta_historial(ruta)}'")
+            if tipo != ENLACE:
+                yield registro
+            # La cadena siempre apunta hacia atrás; cualquier otra cosa es un archivo dañado
+            numero = registro[4] if registro[4] < numero else -1
+
+def _entrada(registro: tuple) -> dict:
+    _, instante, precio, stock, _, tipo, entero = registro
+    if math.isnan(precio):
+        precio = None
+    elif entero:
+        precio = int(precio)
+    return {
+        "Fecha": datetime.fromtimestamp(instante / 1e9).isoformat(timespec="seconds"),
+        "Precio": precio,
+        "Stock": None if stock == SIN_STOCK else stock,
+        "Baja": tipo == BAJA,
+    }
+
+def _a_ns(momento: datetime) -> int:
+    return round(momento.timestamp() * 1_000_000) * 1000
+
+#Precio y stock que tenía el producto en ese momento (el último cambio registrado hasta
+#entonces), o None si todavía no tenía historial
+def estado_en(ruta: str, id_producto, momento: datetime) -> dict:
+    limite = _a_ns(momento)
+    for registro in _cadena(ruta, id_producto):
+        if registro[1] <= limite:
+            return _entrada(registro)
+    return None
+
+#Cambios del producto desde ese momento, del más viejo al más nuevo. Si el producto ya tenía
+#historial, el primero es el estado vigente en ese momento, así la trayectoria arranca de un valor conocido
+def trayectoria(ruta: str, id_producto, desde: datetime) -> list:
+    limite = _a_ns(desde)
+    entradas = []
+    for registro in _cadena(ruta, id_producto):
+        entradas.append(_entrada(registro))
+        if registro[1] <= limite:
+            break
+    entradas.reverse()
+    return entradas
+
+#Descarta el estado en memoria (se vuelve a leer de los índices de cabezas)
+def reiniciar() -> None:
+    _historiales.clear()
@@ -0,0 +1,206 @@
+import os
+import json
+import tempfile
+from .config import ENCABEZADOS, LOTE_IMPORTACION, MAXIMO_ERRORES_IMPORTACION
+from .validar_inputs import texto_correcto, numero_correcto
+from .lector_csv import iterar_filas
+from .cache_catalogo import obtener_productos, maximo_id, firma_categoria
+from .bloqueos import bloquear_categoria
+from .motor import usa_sqlite, listar_hojas, existe_categoria, existe_carpeta, crear_categoria, leer_categoria
+from .almacenamiento import escribir_atomico
+from .agregados import iterar_filas as iterar_productos_categoria
+from .estadisticas import aplicar_cambio
+from .historial import registrar as registrar_historial
+from .indice_nombres import clave_nombre
+from .funciones import escribir_csv
+from .api import armar_ruta, nombre_categoria
+
+#Importación y exportación masiva de listas de precios.
+#El archivo de origen (CSV o JSONL, una fila o un objeto por línea) tiene las columnas
+#"Categoría", "Nombre", "Precio" y "Stock" (el "ID", si está, se ignora): es el mismo formato
+#que genera exportar. Se lee de a una fila y se valida con las reglas de validar_inputs;
+#dentro de cada categoría un producto con el mismo nombre (sin distinguir mayúsculas ni
+#espacios de más) se actualiza y los demás se dan de alta con IDs nuevos.
+#Las filas se acumulan hasta completar un lote y recién ahí se escribe cada categoría tocada,
+#una sola vez y con la categoría bloqueada, así que la memoria depende del lote y no del archivo.
+
+CAMPOS_IMPORTACION = ["Categoría", "Nombre", "Precio", "Stock"]
+
+#"csv" o "jsonl" según el formato pedido o la extensión del archivo
+def formato_de(ruta: str, formato: str = None) -> str:
+    formato = (formato or os.path.splitext(ruta)[1].lstrip(".") or "csv").lower()
+    if formato in ("json", "jsonl", "ndjson"):
+        return "jsonl"
+    if formato != "csv":
+        raise ValueError(f"Formato no soportado: '{formato}' (use csv o jsonl)")
+    return formato
+
+#Filas del origen como (número de línea, fila): un diccionario en CSV y el texto de la línea en JSONL
+def _filas_csv(origen: str):
+    filas = iterar_filas(origen)
+    campos = next(filas, None)
+    faltantes = [campo for campo in CAMPOS_IMPORTACION if campo not in (campos or [])]
+    if faltantes:
+        raise ValueError(f"Faltan columnas en '{origen}': {', '.join(faltantes)}")
+    for numero, fila in enumerate(filas, start=2):
+        yield numero, dict(zip(campos, fila))
+
+def _filas_jsonl(origen: str):
+    with open(origen, encoding="utf-8") as archivo:
+        for numero, linea in enumerate(archivo, start=1):
+            if linea.strip():
+                yield numero, linea
+
+#Valida una fila del origen y retorna (categoría, producto) o lanza ValueError
+def _validar(fila) -> tuple:
+    if isinstance(fila, str):
+        try:
+            fila = json.loads(fila)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSON inválido: {e.msg}")
+    if not isinstance(fila, dict):
+        raise ValueError("Se esperaba un objeto")
+    valores = {}
+    for campo in CAMPOS_IMPORTACION:
+        valor = fila.get(campo)
+        valores[campo] = "" if valor is None else str(valor).strip()
+    if not valores["Categoría"]:
+        raise ValueError("Falta la categoría")
+    if not texto_correcto(valores["Nombre"]):
+        raise ValueError("El nombre no puede estar vacío")
+    if not numero_correcto(valores["Precio"]):
+        raise ValueError(f"Precio inválido: '{valores['Precio']}'")
+    if not numero_correcto(valores["Stock"]):
+        raise ValueError(f"Stock inválido: '{valores['Stock']}'")
+    return valores["Categoría"], {"Nombre": valores["Nombre"], "Precio": valores["Precio"], "Stock": valores["Stock"]}
+
+#Ruta de la categoría de una fila; si no existe y se pidió, se crea como hoja nueva
+def _resolver(categoria: str, crear: bool) -> str:
+    ruta = armar_ruta(categoria)
+    if existe_categoria(ruta):
+        return ruta
+    if not crear:
+        raise ValueError(f"Categoría inexistente: '{categoria}'")
+    if existe_carpeta(os.path.dirname(ruta)):
+        raise ValueError(f"'{categoria}' es una carpeta con subcategorías, no una categoría")
+    # Una categoría no puede tener subcategorías: no se crea nada debajo de una hoja existente
+    partes = [p for p in categoria.replace("\\", "/").split("/") if p]
+    for fin in range(1, len(partes)):
+        superior = "/".join(partes[:fin])
+        if existe_categoria(armar_ruta(superior)):
+            raise ValueError(f"'{categoria}' quedaría dentro de la categoría '{superior}', que no puede tener subcategorías")
+    crear_categoria(ruta)
+    return ruta
+
+#Aplica sobre una categoría los productos pendientes (clave de nombre -> producto) y la
+#escribe una sola vez. Retorna (altas, actualizadas)
+def _volcar_categoria(ruta: str, pendientes: dict) -> tuple:
+    with bloquear_categoria(ruta):
+        firma_previa = firma_categoria(ruta)
+        datos = obtener_productos(ruta)
+        posiciones = {clave_nombre(producto.get("Nombre") or ""): i for i, producto in enumerate(datos)}
+        siguiente = maximo_id(ruta) + 1
+        quitados, agregados = [], []
+        for clave, nuevo in pendientes.items():
+            posicion = posiciones.get(clave)
+            if posicion is None:
+                producto = {"ID": str(siguiente), **nuevo}
+                siguiente += 1
+                datos.append(producto)
+                agregados.append(producto)
+                continue
+            actual = datos[posicion]
+            if all(actual.get(campo) == nuevo[campo] for campo in ("Nombre", "Precio", "Stock")):
+                continue
+            quitados.append(dict(actual))
+            actual.update(nuevo)
+            agregados.append(actual)
+        if not agregados:
+            return 0, 0
+        if not escribir_csv(ruta, datos, ENCABEZADOS):
+            raise OSError(f"No se pudo escribir la categoría '{nombre_categoria(ruta)}'")
+        registrar_historial(ruta, quitar=quitados, agregar=agregados)
+    aplicar_cambio(ruta, firma_previa, quitar=quitados, agregar=agregados)
+    return len(agregados) - len(quitados), len(quitados)
+
+#Importa un archivo de productos. crear: dar de alta las categorías que no existan.
+#Retorna un resumen con las filas leídas, altas, actualizadas, sin cambios, rechazadas,
+#las categorías escritas y el detalle de los primeros errores
+def importar(origen: str, formato: str = None, crear: bool = False, lote: int = LOTE_IMPORTACION) -> dict:
+    formato = formato_de(origen, formato)
+    filas = _filas_jsonl(origen) if formato == "jsonl" else _filas_csv(origen)
+    resumen = {"filas": 0, "altas": 0, "actualizadas": 0, "sin_cambios": 0, "rechazadas": 0,
+               "categorias": 0, "errores": []}
+    rutas = {}
+    pendientes = {}
+    acumuladas = 0
+    tocadas = set()
+
+    def volcar():
+        for ruta, productos in pendientes.items():
+            altas, actualizadas = _volcar_categoria(ruta, productos)
+            resumen["altas"] += altas
+            resumen["actualizadas"] += actualizadas
+            if altas or actualizadas:
+                tocadas.add(ruta)
+        pendientes.clear()
+
+    for numero, fila in filas:
+        resumen["filas"] += 1
+        try:
+            categoria, producto = _validar(fila)
+            if categoria not in rutas:
+                rutas[categoria] = _resolver(categoria, crear)
+            ruta = rutas[categoria]
+        except ValueError as e:
+            resumen["rechazadas"] += 1
+            if len(resumen["errores"]) < MAXIMO_ERRORES_IMPORTACION:
+                resumen["errores"].append({"linea": numero, "error": str(e)})
+            continue
+        # Si el nombre se repite dentro del lote queda la última fila
+        pendientes.setdefault(ruta, {})[clave_nombre(producto["Nombre"])] = producto
+        acumuladas += 1
+        if acumuladas >= lote:
+            volcar()
+            acumuladas = 0
+    volcar()
+    # Los nombres repetidos dentro de un lote cuentan como filas sin cambios
+    resumen["sin_cambios"] = resumen["filas"] - resumen["rechazadas"] - resumen["altas"] - resumen["actualizadas"]
+    resumen["categorias"] = len(tocadas)
+    return resumen
+
+#Productos de todas las categorías con la columna "Categoría", leídos de a una categoría
+def _productos_jerarquia():
+    for ruta in listar_hojas():
+        categoria = nombre_categoria(ruta)
+        productos = leer_categoria(ruta) if usa_sqlite() else iterar_productos_categoria(ruta)
+        for producto in productos:
+            yield {"Categoría": categoria, **{campo: producto.get(campo) or "" for campo in ENCABEZADOS}}
+
+#Exporta todo el catálogo a un solo archivo CSV o JSONL (escrito de forma atómica).
+#Retorna la cantidad de productos exportados
+def exportar(destino: str, formato: str = None) -> int:
+    formato = formato_de(destino, formato)
+    cantidad = 0
+    def productos():
+        nonlocal cantidad
+        for cantidad, producto in enumerate(_productos_jerarquia(), 1):
+            yield producto
+    if formato == "csv":
+        escribir_atomico(destino, productos(), ["Categoría"] + ENCABEZADOS)
+        return cantidad
+
+    carpeta = os.path.dirname(destino) or "."
+    descriptor, temporal = tempfile.mkstemp(prefix=f".{os.path.basename(destino)}.", suffix=".tmp", dir=carpeta)
+    try:
+        with os.fdopen(descriptor, "w", encoding="utf-8") as archivo:
+            for producto in productos():
+                archivo.write(json.dumps(producto, ensure_ascii=False) + "\n")
+        os.replace(temporal, destino)
+    except BaseException:
+        try:
+            os.remove(temporal)
+        except OSError:
+            pass
+        raise
+    return cantidad
@@ -0,0 +1,85 @@
+import io
+import sys
+import csv
+import json
+from itertools import islice, repeat
+from . import config
+from .config import ANCHO_COLUMNA, LOTE_IMPRESION
+
+#Impresión de listados de productos, compartida por todas las opciones del menú.
+#Las filas pueden venir de una lista o de un iterador (no hace falta tenerlas todas):
+#se formatean de a LOTE_IMPRESION y cada lote se escribe con una sola llamada.
+#Formatos (config.FORMATO_LISTADO, o el que se pida):
+#  "tabla": columnas centradas de al menos ANCHO_COLUMNA caracteres separadas por " | "
+#  "csv":   encabezados y filas en CSV, para redirigir a un archivo
+#  "jsonl": un objeto JSON por fila
+FORMATOS = ("tabla", "csv", "jsonl")
+_destino = {"salida": None}   # salida de los listados (None: la salida estándar del momento)
+
+#Fija la salida por defecto de los listados, aunque después se reemplace sys.stdout
+#(main.py deja así solo los listados en la salida estándar)
+def dirigir_listados(salida) -> None:
+    _destino["salida"] = salida
+
+#Texto de la fila en cada campo (los campos que faltan quedan vacíos)
+def _valores(fila: dict, campos: list) -> list:
+    return [valor if isinstance(valor, str) else str(valor) for valor in map(fila.get, campos, repeat(""))]
+
+def _lotes(filas):
+    iterador = iter(filas)
+    while True:
+        lote = list(islice(iterador, LOTE_IMPRESION))
+        if not lote:
+            return
+        yield lote
+
+def _tabla(filas, campos: list, salida) -> int:
+    # El formato de cada fila se arma una sola vez con el ancho de cada columna;
+    # "!s" convierte a texto los valores que no lo son (None, números)
+    anchos = [max(ANCHO_COLUMNA, len(campo)) for campo in campos]
+    formato = " | ".join(f"{{!s:^{ancho}}}" for ancho in anchos)
+    encabezado = formato.format(*campos)
+    separador = "-" * len(encabezado)
+    salida.write(f"{separador}\n{encabezado}\n{separador}\n")
+    vacios = [""] * len(campos)
+    cantidad = 0
+    for lote in _lotes(filas):
+        salida.write("\n".join([formato.format(*map(fila.get, campos, vacios)) for fila in lote]) + "\n")
+        cantidad += len(lote)
+    salida.write(separador + "\n")
+    return cantidad
+
+def _csv(filas, campos: list, salida) -> int:
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator="\n")
+    escritor.writerow(campos)
+    cantidad = 0
+    for lote in _lotes(filas):
+        escritor.writerows(_valores(fila, campos) for fila in lote)
+        salida.write(buffer.getvalue())
+        buffer.seek(0)
+        buffer.truncate()
+        cantidad += len(lote)
+    salida.write(buffer.getvalue())
+    return cantidad
+
+def _jsonl(filas, campos: list, salida) -> int:
+    cantidad = 0
+    for lote in _lotes(filas):
+        salida.write("".join(json.dumps(dict(zip(campos, _valores(fila, campos))), ensure_ascii=False) + "\n"
+                             for fila in lote))
+        cantidad += len(lote)
+    return cantidad
+
+#Imprime las filas (diccionarios) con los campos indicados en el formato pedido
+#(por defecto config.FORMATO_LISTADO) en salida (por defecto la de dirigir_listados o la salida estándar).
+#Retorna la cantidad de filas impresas
+def imprimir_tabla(filas, campos: list, formato: str = None, salida=None) -> int:
+    formato = formato or config.FORMATO_LISTADO
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de listado inválido: '{formato}' (use {', '.join(FORMATOS)})")
+    salida = salida or _destino["salida"] or sys.stdout
+    escribir = {"tabla": _tabla, "csv": _csv, "jsonl": _jsonl}[formato]
+    cantidad = escribir(filas, list(campos), salida)
+    salida.flush()
+    return cantidad
@@ -0,0 +1,185 @@
+import os
+import io
+import csv
+import struct
+from .config import ENCABEZADOS, EXTENSION_INDICE
+from .almacenamiento import existe_diario
+from .lector_csv import dividir_linea, fin_de_registro, iterar_productos
+
+#Índice persistente ID -> posición de la fila dentro de Productos.csv ("Productos.csv.indice").
+#Es binario y de ancho fijo: una cabecera con la firma (mtime y tamaño) del CSV para el que
+#fue construido y una entrada (ID, desplazamiento, largo) por fila, ordenadas por ID, así
+#una búsqueda lee log2(n) entradas sin cargar el índice. Las altas toman IDs mayores que
+#todos los anteriores, de modo que sus entradas se agregan al final sin desordenarlo.
+#Las filas se delimitan respetando las comillas (un nombre puede tener comas y saltos de línea).
+#Si la firma no coincide el índice se reconstruye.
+#Los IDs que no están en su forma numérica canónica ("007", " 7") no entran en el índice:
+#queda marcado como incompleto y esos IDs se buscan recorriendo el archivo.
+
+MAGICO = b"SUPX"
+VERSION = 1
+_CABECERA = struct.Struct("<4sHBxqq")   # mágico, versión, completo, mtime_ns y tamaño del CSV
+_ENTRADA = struct.Struct("<qQQ")        # ID, desplazamiento y largo de la fila (sin el salto de línea)
+
+def ruta_indice(ruta: str) -> str:
+    return ruta + EXTENSION_INDICE
+
+def _firma(ruta: str) -> tuple:
+    estado = os.stat(ruta)
+    return estado.st_mtime_ns, estado.st_size
+
+#Número del ID si está en su forma canónica; None si no
+def _numero_id(texto: str):
+    if texto.isdigit() and str(int(texto)) == texto:
+        return int(texto)
+    return None
+
+#Recorre los bytes del CSV y anota dónde empieza y cuánto ocupa cada fila.
+#Retorna (firma del CSV leído, entradas ordenadas por ID, si todas las filas quedaron indexadas)
+def construir_indice(ruta: str) -> tuple:
+    firma = _firma(ruta)
+    with open(ruta, "rb") as archivo:
+        contenido = archivo.read()
+
+    entradas = []
+    completo = True
+    total = len(contenido)
+    inicio = fin_de_registro(contenido, 0) + 1
+    while inicio < total:
+        fin = fin_de_registro(contenido, inicio)
+        fila = contenido[inicio:fin]
+        if fila.strip():
+            if fila.startswith(b'"'):
+                id_fila = dividir_linea(fila.decode("utf-8").rstrip("\r"))[0]
+            else:
+                id_fila = fila.split(b",", 1)[0].rstrip(b"\r").decode("utf-8")
+            numero = _numero_id(id_fila)
+            if numero is None:
+                completo = False
+            else:
+                entradas.append((numero, inicio, fin - inicio))
+        inicio = fin + 1
+    # A igual ID queda primero la primera aparición
+    entradas.sort()
+    return firma, entradas, completo
+
+#Guarda el índice de forma atómica
+def guardar_indice(ruta: str, firma: tuple, entradas: list, completo: bool) -> None:
+    destino = ruta_indice(ruta)
+    temporal = destino + ".tmp"
+    with open(temporal, "wb") as archivo:
+        archivo.write(_CABECERA.pack(MAGICO, VERSION, completo, *firma))
+        archivo.write(b"".join(_ENTRADA.pack(*entrada) for entrada in entradas))
+    os.replace(temporal, destino)
+
+#Reconstruye el índice (por ejemplo, después de reescribir el CSV completo)
+def reindexar(ruta: str) -> None:
+    try:
+        guardar_indice(ruta, *construir_indice(ruta))
+    except OSError:
+        pass
+
+#Cabecera del índice abierto: (completo, firma) o None si no es un índice válido
+def _cabecera(archivo) -> tuple:
+    try:
+        magico, version, completo, mtime, tamano = _CABECERA.unpack(archivo.read(_CABECERA.size))
+    except struct.error:
+        return None
+    if magico != MAGICO or version != VERSION:
+        return None
+    return bool(completo), (mtime, tamano)
+
+#Búsqueda binaria sobre las entradas del índice abierto: (desplazamiento, largo) o None
+def _buscar(archivo, numero: int) -> tuple:
+    cantidad = (os.fstat(archivo.fileno()).st_size - _CABECERA.size) // _ENTRADA.size
+    bajo, alto = 0, cantidad
+    while bajo < alto:
+        medio = (bajo + alto) // 2
+        archivo.seek(_CABECERA.size + medio * _ENTRADA.size)
+        if _ENTRADA.unpack(archivo.read(_ENTRADA.size))[0] < numero:
+            bajo = medio + 1
+        else:
+            alto = medio
+    if bajo == cantidad:
+        return None
+    archivo.seek(_CABECERA.size + bajo * _ENTRADA.size)
+    id_entrada, desplazamiento, largo = _ENTRADA.unpack(archivo.read(_ENTRADA.size))
+    return (desplazamiento, largo) if id_entrada == numero else None
+
+#Ubica un ID con el índice vigente, reconstruyéndolo si no corresponde al CSV.
+#Retorna ((desplazamiento, largo) o None, si el índice cubre todas las filas)
+def ubicar(ruta: str, id_producto: str) -> tuple:
+    for _ in range(2):
+        try:
+            firma = _firma(ruta)
+            with open(ruta_indice(ruta), "rb") as archivo:
+                cabecera = _cabecera(archivo)
+                if cabecera is not None and cabecera[1] == firma:
+                    numero = _numero_id(id_producto)
+                    return (None if numero is None else _buscar(archivo, numero)), cabecera[0]
+        except OSError:
+            pass
+        reindexar(ruta)
+    return None, False
+
+#Suma al índice las filas agregadas al final del CSV.
+#Solo se actualiza si el índice correspondía al archivo antes del agregado; si los IDs
+#nuevos no son mayores que los indexados se descarta y se reconstruirá en la próxima búsqueda
+def indexar_agregados(ruta: str, filas: list, firma_previa: list, desplazamiento: int) -> None:
+    descartar = False
+    try:
+        with open(ruta_indice(ruta), "r+b") as archivo:
+            cabecera = _cabecera(archivo)
+            if cabecera is None or list(cabecera[1]) != list(firma_previa):
+                return
+            fin = archivo.seek(0, os.SEEK_END)
+            ultimo = -1
+            if fin > _CABECERA.size:
+                archivo.seek(fin - _ENTRADA.size)
+                ultimo = _ENTRADA.unpack(archivo.read(_ENTRADA.size))[0]
+
+            buffer = io.StringIO(newline="")
+            writer = csv.DictWriter(buffer, fieldnames=ENCABEZADOS, lineterminator="\r\n")
+            nuevas = []
+            for fila in filas:
+                numero = _numero_id(str(fila["ID"]))
+                if numero is None or numero <= ultimo:
+                    descartar = True
+                    break
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerow(fila)
+                largo = len(buffer.getvalue().encode("utf-8"))
+                nuevas.append(_ENTRADA.pack(numero, desplazamiento, largo - 1))
+                desplazamiento += largo
+                ultimo = numero
+            if not descartar:
+                archivo.seek(fin)
+                archivo.write(b"".join(nuevas))
+                archivo.seek(0)
+                archivo.write(_CABECERA.pack(MAGICO, VERSION, cabecera[0], *_firma(ruta)))
+    except OSError:
+        return
+    if descartar:
+        try:
+            os.remove(ruta_indice(ruta))
+        except OSError:
+            pass
+
+#Lee una sola fila por ID sin cargar el resto del archivo.
+#Retorna None si el ID no existe o si la categoría tiene operaciones en el diario
+#(en ese caso el CSV no refleja el estado actual y hay que leerla completa)
+def leer_fila(ruta: str, id_producto: str) -> dict:
+    if existe_diario(ruta):
+        return None
+    ubicacion, completo = ubicar(ruta, id_producto)
+    if ubicacion is None:
+        if completo:
+            return None
+        # El ID puede estar en una fila que el índice no cubre
+        return next((dict(p) for p in iterar_productos(ruta) if p.get("ID") == id_producto), None)
+    desplazamiento, largo = ubicacion
+    with open(ruta, "rb") as archivo:
+        archivo.seek(desplazamiento)
+        texto = archivo.read(largo).decode("utf-8")
+    return dict(zip(ENCABEZADOS, dividir_linea(texto.rstrip("\r"))))
@@ -0,0 +1,201 @@
+import re
+import unicodedata
+from bisect import bisect_left
+from .config import RUTA_BASE
+from .cache_catalogo import obtener_columnas, filas_en, firma_categoria
+from .motor import listar_hojas
+from .vigilancia import cubre, cambios, hojas
+
+#Índice invertido de nombres de productos de toda la jerarquía.
+#Cada producto indexado es un "documento" con un número propio; se guardan
+#los trigramas y las palabras de su nombre normalizado apuntando a esos números.
+#El índice se actualiza por categoría: solo se reindexan las hojas cuya firma cambió.
+#Los documentos guardan la posición del producto en la tabla columnar de la caché
+#(ver columnas.py); las filas se piden a la caché solo para los resultados.
+_hojas = {}          # ruta -> {"firma": ..., "tabla": tabla columnar, "version": ..., "docs": [números]}
+_documentos = {}     # número -> (ruta, posición, nombre normalizado)
+_trigramas = {}      # trigrama -> set de números
+_palabras = {}       # palabra -> set de números
+_cortos = set()      # documentos con nombres de menos de tres letras (sin trigramas)
+_palabras_ordenadas = []
+_estado = {"siguiente": 0, "palabras_desordenadas": False}
+
+_PATRON_PALABRA = re.compile(r"\w+")
+
+#Pasa a minúsculas y, si se pide, quita los acentos ("Lácteos" -> "lacteos")
+def normalizar(texto: str, sin_acentos: bool = True) -> str:
+    texto = (texto or "").lower()
+    if sin_acentos:
+        texto = "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+    return texto
+
+#Clave con la que se comparan los nombres dentro de una categoría
+#(sin distinguir mayúsculas ni espacios de más)
+def clave_nombre(nombre: str) -> str:
+    return normalizar(" ".join((nombre or "").split()), sin_acentos=False)
+
+def _trigramas_de(texto: str) -> set:
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+def _agregar_documento(ruta: str, posicion: int, nombre: str) -> int:
+    numero = _estado["siguiente"]
+    _estado["siguiente"] += 1
+    nombre = normalizar(nombre)
+    _documentos[numero] = (ruta, posicion, nombre)
+    if len(nombre) < 3:
+        _cortos.add(numero)
+    for trigrama in _trigramas_de(nombre):
+        _trigramas.setdefault(trigrama, set()).add(numero)
+    for palabra in _PATRON_PALABRA.findall(nombre):
+        if palabra not in _palabras:
+            _palabras[palabra] = set()
+            _estado["palabras_desordenadas"] = True
+        _palabras[palabra].add(numero)
+    return numero
+
+def _quitar_documento(numero: int) -> None:
+    _, _, nombre = _documentos.pop(numero)
+    _cortos.discard(numero)
+    for trigrama in _trigramas_de(nombre):
+        numeros = _trigramas.get(trigrama)
+        if numeros is not None:
+            numeros.discard(numero)
+            if not numeros:
+                del _trigramas[trigrama]
+    for palabra in _PATRON_PALABRA.findall(nombre):
+        numeros = _palabras.get(palabra)
+        if numeros is not None:
+            numeros.discard(numero)
+            if not numeros:
+                del _palabras[palabra]
+                _estado["palabras_desordenadas"] = True
+
+def _quitar_hoja(ruta: str) -> None:
+    for numero in _hojas.pop(ruta)["docs"]:
+        _quitar_documento(numero)
+
+#Indica si la caché modificó en el lugar la tabla de la hoja después de indexarla
+def _tabla_cambiada(hoja: dict) -> bool:
+    return hoja["version"] != hoja["tabla"]["version"]
+
+#Reindexa una hoja si su firma cambió
+def _indexar_hoja(ruta: str) -> None:
+    firma = firma_categoria(ruta)
+    hoja = _hojas.get(ruta)
+    if hoja is not None and hoja["firma"] == firma and not _tabla_cambiada(hoja):
+        return
+    if hoja is not None:
+        _quitar_hoja(ruta)
+    tabla = obtener_columnas(ruta)
+    _hojas[ruta] = {"firma": firma, "tabla": tabla, "version": tabla["version"],
+                    "docs": [_agregar_documento(ruta, p, n) for p, n in enumerate(tabla["nombres"])]}
+
+#Pone al día el índice: agrega hojas nuevas, reindexa las que cambiaron y quita las borradas.
+#Con la vigilancia de carpetas activa solo se revisan las hojas que informó como cambiadas
+def actualizar_indice(base: str = RUTA_BASE) -> None:
+    cambiadas = cambios("indice_nombres") if cubre(base) else None
+    if cambiadas is not None:
+        vigentes = set(hojas())
+        cambiadas |= {r for r, hoja in _hojas.items() if _tabla_cambiada(hoja)}
+        for ruta in cambiadas | {r for r in vigentes if r not in _hojas}:
+            if ruta in vigentes:
+                _indexar_hoja(ruta)
+            elif ruta in _hojas:
+                _quitar_hoja(ruta)
+        return
+
+    vigentes = set()
+    for ruta in listar_hojas(base):
+        vigentes.add(ruta)
+        _indexar_hoja(ruta)
+
+    for ruta in [r for r in _hojas if r not in vigentes]:
+        _quitar_hoja(ruta)
+
+def _palabras_con_prefijo(prefijo: str) -> set:
+    if _estado["palabras_desordenadas"]:
+        _palabras_ordenadas[:] = sorted(_palabras)
+        _estado["palabras_desordenadas"] = False
+    numeros = set()
+    i = bisect_left(_palabras_ordenadas, prefijo)
+    while i < len(_palabras_ordenadas) and _palabras_ordenadas[i].startswith(prefijo):
+        numeros |= _palabras[_palabras_ordenadas[i]]
+        i += 1
+    return numeros
+
+#Números de documento candidatos para una búsqueda por subcadena
+def _candidatos_subcadena(texto: str) -> set:
+    if len(texto) < 3:
+        # Con menos de tres letras no hay trigramas que buscar, pero el texto está dentro de
+        # algún trigrama de cada nombre que lo contiene: se revisan los trigramas distintos
+        # (muchos menos que los nombres) y los nombres demasiado cortos para tenerlos
+        candidatos = set(_cortos)
+        for trigrama, numeros in _trigramas.items():
+            if texto in trigrama:
+                candidatos |= numeros
+        return candidatos
+    conjuntos = []
+    for trigrama in _trigramas_de(texto):
+        numeros = _trigramas.get(trigrama)
+        if not numeros:
+            return set()
+        conjuntos.append(numeros)
+    conjuntos.sort(key=len)
+    return set.intersection(*conjuntos)
+
+#Busca productos por nombre en todas las categorías.
+#prefijo: cada palabra buscada debe ser el comienzo de una palabra del nombre.
+#sin_acentos: "lacteos" coincide con "Lácteos".
+#Retorna una lista de (ruta del CSV, producto)
+def buscar_por_nombre(texto: str, prefijo: bool = False, sin_acentos: bool = True) -> list:
+    actualizar_indice()
+    consulta = normalizar(texto.strip())
+    if not consulta:
+        return []
+
+    if prefijo:
+        palabras = _PATRON_PALABRA.findall(consulta)
+        if not palabras:
+            return []
+        candidatos = _palabras_con_prefijo(palabras[0])
+        for palabra in palabras[1:]:
+            candidatos &= _palabras_con_prefijo(palabra)
+    else:
+        candidatos = _candidatos_subcadena(consulta)
+
+    # Los índices trabajan sin acentos; si se piden acentos exactos se verifica con el nombre original
+    exacta = normalizar(texto.strip(), sin_acentos=False)
+    coincidencias = []
+    for numero in sorted(candidatos):
+        ruta, posicion, nombre = _documentos[numero]
+        if not sin_acentos:
+            nombre = normalizar(_hojas[ruta]["tabla"]["nombres"][posicion], sin_acentos=False)
+            consulta_final = exacta
+        else:
+            consulta_final = consulta
+        if prefijo:
+            palabras_nombre = _PATRON_PALABRA.findall(nombre)
+            coincide = all(any(p.startswith(q) for p in palabras_nombre) for q in _PATRON_PALABRA.findall(consulta_final))
+        else:
+            coincide = consulta_final in nombre
+        if coincide:
+            coincidencias.append((ruta, posicion))
+    return _filas(coincidencias)
+
+#Filas de las coincidencias (ruta, posición), pidiéndolas a la caché una vez por categoría
+def _filas(coincidencias: list) -> list:
+    por_ruta = {}
+    for ruta, posicion in coincidencias:
+        por_ruta.setdefault(ruta, []).append(posicion)
+    filas = {ruta: iter(filas_en(ruta, posiciones)) for ruta, posiciones in por_ruta.items()}
+    return [(ruta, next(filas[ruta])) for ruta, _ in coincidencias]
+
+#Vacía el índice (la próxima búsqueda vuelve a indexar todas las categorías)
+def reiniciar() -> None:
+    _hojas.clear()
+    _documentos.clear()
+    _trigramas.clear()
+    _palabras.clear()
+    _cortos.clear()
+    _palabras_ordenadas.clear()
+    _estado.update(siguiente=0, palabras_desordenadas=False)
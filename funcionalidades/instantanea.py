@@ -0,0 +1,216 @@
+import os
+import sys
+import mmap
+import struct
+import tempfile
+from array import array
+from . import config
+from .config import RUTA_BASE, NOMBRE_INSTANTANEA
+from .motor import usa_sqlite, listar_hojas, firma_categoria, leer_categoria
+from .columnas import desde_filas, representable
+from .lector_csv import a_entero
+
+#Instantánea binaria del catálogo validado, para arrancar sin volver a leer los CSV.
+#Se escribe después de la validación inicial y al salir, y en el arranque siguiente se abre
+#con mmap: solo se lee el índice de hojas. Una hoja de la instantánea vale mientras su
+#Productos.csv conserve la fecha de modificación y el tamaño con que se guardó (y no tenga
+#diario pendiente); la validación la saltea y la caché y las estadísticas arman su tabla
+#columnar (ver columnas.py) desde la instantánea en lugar de parsear el archivo.
+#
+#Formato (little endian, cada sección alineada a 8 bytes):
+#  cabecera    MAGICO, versión, cantidad de hojas, filas, excepciones y textos, bytes de textos
+#  hojas       ruta (n.º de texto), mtime_ns, tamaño, primera fila, filas, primera excepción,
+#              excepciones, posición y largo de sus nombres
+#  columnas    ids (q), precios (d) y stocks (q) de todas las filas
+#  excepciones fila, campo (0 ID, 1 Precio, 2 Stock) y texto: los valores que no se reconstruyen
+#              desde el número (los "originales" de columnas.py)
+#  textos      posición de cada texto (Q, uno más que la cantidad) y los textos en UTF-8
+#  nombres     los nombres de cada hoja en UTF-8, separados por "\0" (se decodifican de una vez)
+
+MAGICO = b"SUPI"
+VERSION = 1
+_CABECERA = struct.Struct("<4sHxxIQQQQQ")
+_HOJA = struct.Struct("<QqqQQQQQQ")
+_EXCEPCION = struct.Struct("<QQQ")
+_CAMPOS_EXCEPCION = ("ID", "Precio", "Stock")
+
+_estado = {"hojas": {}, "vista": None, "secciones": None}
+
+def ruta_instantanea(base: str = RUTA_BASE) -> str:
+    return os.path.join(base, NOMBRE_INSTANTANEA)
+
+def _alinear(posicion: int) -> int:
+    return (posicion + 7) & ~7
+
+#Posición de cada sección según las cantidades de la cabecera
+def _secciones(hojas: int, filas: int, excepciones: int, textos: int, bytes_textos: int) -> dict:
+    secciones = {}
+    posicion = _CABECERA.size
+    for nombre, tamano in (("hojas", hojas * _HOJA.size), ("ids", filas * 8), ("precios", filas * 8),
+                           ("stocks", filas * 8), ("excepciones", excepciones * _EXCEPCION.size),
+                           ("posiciones", (textos + 1) * 8), ("textos", 0), ("nombres", 0)):
+        posicion = _alinear(posicion)
+        secciones[nombre] = posicion
+        posicion += tamano if nombre != "textos" else bytes_textos
+    return secciones
+
+def _texto(numero: int) -> str:
+    vista, secciones = _estado["vista"], _estado["secciones"]
+    inicio, fin = struct.unpack_from("<QQ", vista, secciones["posiciones"] + numero * 8)
+    return str(vista[secciones["textos"] + inicio:secciones["textos"] + fin], "utf-8")
+
+#Abre la instantánea de la carpeta base y lee su índice de hojas.
+#Si no existe o no se puede usar, queda vacía y todas las hojas se leen de sus CSV
+def cargar(base: str = RUTA_BASE) -> int:
+    reiniciar()
+    if usa_sqlite() or not config.USAR_INSTANTANEA:
+        return 0
+    try:
+        with open(ruta_instantanea(base), "rb") as archivo:
+            mapa = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return 0
+    vista = memoryview(mapa)
+    try:
+        (magico, version, hojas, filas, excepciones, textos, bytes_textos,
+         bytes_nombres) = _CABECERA.unpack_from(vista, 0)
+        if magico != MAGICO or version != VERSION:
+            return 0
+        secciones = _secciones(hojas, filas, excepciones, textos, bytes_textos)
+        if secciones["nombres"] + bytes_nombres != len(vista):
+            return 0
+        _estado.update(vista=vista, secciones=secciones)
+        indice = {}
+        for ruta, mtime, tamano, *ubicacion in _HOJA.iter_unpack(
+                vista[secciones["hojas"]:secciones["hojas"] + hojas * _HOJA.size]):
+            indice[_texto(ruta)] = ((mtime, tamano, None), *ubicacion)
+    except (struct.error, ValueError):
+        _estado.update(vista=None, secciones=None)
+        return 0
+    _estado["hojas"] = indice
+    return len(indice)
+
+#Descarta la instantánea abierta (todas las hojas se vuelven a leer de sus CSV)
+def reiniciar() -> None:
+    _estado.update(hojas={}, vista=None, secciones=None)
+
+#Indica si la hoja está en la instantánea con la misma firma que tiene ahora
+def vigente(ruta: str, firma: tuple = None) -> bool:
+    hoja = _estado["hojas"].get(os.path.normpath(ruta))
+    if hoja is None:
+        return False
+    return hoja[0] == (firma if firma is not None else firma_categoria(ruta))
+
+def _columna(seccion: str, codigo: str, inicio: int, cantidad: int) -> array:
+    posicion = _estado["secciones"][seccion] + inicio * 8
+    columna = array(codigo)
+    columna.frombytes(_estado["vista"][posicion:posicion + cantidad * 8])
+    return columna
+
+#Tabla columnar de la hoja tomada de la instantánea, o None si no está o cambió desde entonces
+def tabla(ruta: str, firma: tuple = None) -> dict:
+    if not vigente(ruta, firma):
+        return None
+    _, inicio, cantidad, primera, diferentes, posicion, largo = _estado["hojas"][os.path.normpath(ruta)]
+    posicion += _estado["secciones"]["nombres"]
+    nombres = list(map(sys.intern, str(_estado["vista"][posicion:posicion + largo], "utf-8").split("\0")))
+    if not cantidad:
+        nombres = []
+    originales = {}
+    sin_stock = set()
+    posicion = _estado["secciones"]["excepciones"] + primera * _EXCEPCION.size
+    for fila, campo, numero in _EXCEPCION.iter_unpack(
+            _estado["vista"][posicion:posicion + diferentes * _EXCEPCION.size]):
+        texto = _texto(numero)
+        originales[(fila - inicio, _CAMPOS_EXCEPCION[campo])] = texto
+        if campo == 2 and a_entero(texto) is None:
+            sin_stock.add(fila - inicio)
+    return {
+        "cantidad": cantidad, "ids": _columna("ids", "q", inicio, cantidad), "nombres": nombres,
+        "precios": _columna("precios", "d", inicio, cantidad), "stocks": _columna("stocks", "q", inicio, cantidad),
+        "sin_stock": sin_stock, "originales": originales, "version": 0,
+    }
+
+#Escribe la instantánea con todas las hojas sin diario pendiente. Las que siguen vigentes
+#se copian de la anterior; el resto se lee de su CSV.
+#Retorna la cantidad de hojas guardadas, o None si no hacía falta escribirla
+def guardar(base: str = RUTA_BASE):
+    if usa_sqlite() or not config.USAR_INSTANTANEA:
+        return None
+    firmas = {}
+    for ruta in listar_hojas(base):
+        firma = firma_categoria(ruta)
+        if firma is not None and firma[2] is None:
+            firmas[ruta] = firma
+    if (set(_estado["hojas"]) == set(firmas)
+            and all(vigente(ruta, firma) for ruta, firma in firmas.items())):
+        return None
+
+    textos = {}
+    def numero_texto(texto: str) -> int:
+        numero = textos.get(texto)
+        if numero is None:
+            numero = textos[texto] = len(textos)
+        return numero
+
+    hojas = []
+    ids, precios, stocks = array("q"), array("d"), array("q")
+    nombres = []
+    bytes_nombres = 0
+    excepciones = []
+    for ruta, firma in firmas.items():
+        columnas = tabla(ruta, firma)
+        if columnas is None:
+            productos = leer_categoria(ruta)
+            if not representable(productos):
+                continue
+            columnas = desde_filas(productos)
+            # La categoría pudo cambiar mientras se leía
+            if firma_categoria(ruta) != firma:
+                continue
+        nombres_hoja = "\0".join(columnas["nombres"]).encode("utf-8")
+        if nombres_hoja.count(b"\0") != max(columnas["cantidad"] - 1, 0):
+            continue
+        inicio = len(ids)
+        primera = len(excepciones)
+        ids.extend(columnas["ids"])
+        precios.extend(columnas["precios"])
+        stocks.extend(columnas["stocks"])
+        for (fila, campo), texto in sorted(columnas["originales"].items()):
+            excepciones.append((inicio + fila, _CAMPOS_EXCEPCION.index(campo), numero_texto(texto)))
+        hojas.append((numero_texto(ruta), firma[0], firma[1], inicio, columnas["cantidad"],
+                      primera, len(excepciones) - primera, bytes_nombres, len(nombres_hoja)))
+        nombres.append(nombres_hoja)
+        bytes_nombres += len(nombres_hoja)
+
+    codificados = [texto.encode("utf-8") for texto in textos]
+    posiciones = array("Q", [0])
+    for codificado in codificados:
+        posiciones.append(posiciones[-1] + len(codificado))
+    secciones = _secciones(len(hojas), len(ids), len(excepciones), len(textos), posiciones[-1])
+    contenido = {
+        "hojas": b"".join(_HOJA.pack(*hoja) for hoja in hojas),
+        "ids": ids.tobytes(), "precios": precios.tobytes(), "stocks": stocks.tobytes(),
+        "excepciones": b"".join(_EXCEPCION.pack(*excepcion) for excepcion in excepciones),
+        "posiciones": posiciones.tobytes(), "textos": b"".join(codificados), "nombres": b"".join(nombres),
+    }
+
+    destino = ruta_instantanea(base)
+    descriptor, temporal = tempfile.mkstemp(prefix=f"{NOMBRE_INSTANTANEA}.", suffix=".tmp", dir=base)
+    try:
+        with os.fdopen(descriptor, "wb") as archivo:
+            archivo.write(_CABECERA.pack(MAGICO, VERSION, len(hojas), len(ids), len(excepciones),
+                                         len(textos), posiciones[-1], bytes_nombres))
+            for nombre, posicion in secciones.items():
+                archivo.write(b"\0" * (posicion - archivo.tell()))
+                archivo.write(contenido[nombre])
+        os.chmod(temporal, 0o644)
+        os.replace(temporal, destino)
+    except BaseException:
+        try:
+            os.remove(temporal)
+        except OSError:
+            pass
+        raise
+    cargar(base)
+    return len(hojas)
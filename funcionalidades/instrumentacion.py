@@ -0,0 +1,130 @@
+import os
+import time
+import json
+import pstats
+import cProfile
+import threading
+import functools
+from types import SimpleNamespace
+from . import config
+
+#Instrumentación de los caminos calientes: las funciones marcadas con @instrumentar
+#acumulan cantidad de llamadas, tiempo (total y máximo), errores y los contadores que
+#informe cada una (filas, bytes leídos o escritos, carpetas...).
+#Con config.INSTRUMENTAR en False la marca solo agrega una comparación por llamada.
+#Aparte, iniciar_perfil() activa cProfile en el hilo que la llama; volcar() escribe
+#todo en JSON (y el perfil en formato pstats). Los tiempos incluyen los de las funciones
+#instrumentadas que se llamen adentro, y lo que corre en los procesos de la validación
+#en paralelo no se registra.
+
+_metricas = {}
+_guardia = threading.Lock()
+_perfiles = []
+
+def _registrar(nombre: str, duracion: float, error: bool, contadores: dict) -> None:
+    with _guardia:
+        metrica = _metricas.get(nombre)
+        if metrica is None:
+            metrica = _metricas[nombre] = {"llamadas": 0, "errores": 0, "segundos": 0.0, "maximo": 0.0}
+        metrica["llamadas"] += 1
+        metrica["segundos"] += duracion
+        metrica["maximo"] = max(metrica["maximo"], duracion)
+        if error:
+            metrica["errores"] += 1
+        for clave, valor in (contadores or {}).items():
+            metrica[clave] = metrica.get(clave, 0) + valor
+
+#Marca una función para instrumentarla con el nombre indicado.
+#contar(argumentos, resultado) retorna los contadores de la llamada; solo se evalúa
+#con la instrumentación activa y si la función no lanzó una excepción
+def instrumentar(nombre: str, contar=None):
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*argumentos, **opciones):
+            if not config.INSTRUMENTAR:
+                return funcion(*argumentos, **opciones)
+            inicio = time.perf_counter()
+            try:
+                resultado = funcion(*argumentos, **opciones)
+            except BaseException:
+                _registrar(nombre, time.perf_counter() - inicio, True, None)
+                raise
+            duracion = time.perf_counter() - inicio
+            try:
+                contadores = contar(argumentos, resultado) if contar else None
+            except (OSError, TypeError):
+                contadores = None
+            _registrar(nombre, duracion, False, contadores)
+            return resultado
+        return envoltura
+    return decorador
+
+#Tamaño de un archivo (0 si no existe), para los contadores de bytes
+def tamano(ruta: str) -> int:
+    try:
+        return os.path.getsize(ruta)
+    except OSError:
+        return 0
+
+#Activa la instrumentación y, si se pide, cProfile en el hilo actual
+def activar(perfil: bool = False) -> None:
+    config.INSTRUMENTAR = True
+    if perfil:
+        iniciar_perfil()
+
+#Activa cProfile en el hilo que la llama (cada hilo necesita su propio perfil;
+#por ejemplo, el hilo del catálogo en servidor.py la usa como inicializador)
+def iniciar_perfil() -> None:
+    perfil = cProfile.Profile()
+    perfil.enable()
+    with _guardia:
+        _perfiles.append(perfil)
+
+def perfilando() -> bool:
+    return bool(_perfiles)
+
+def reiniciar() -> None:
+    with _guardia:
+        _metricas.clear()
+
+#Métricas acumuladas por función, con el promedio por llamada
+def metricas() -> dict:
+    with _guardia:
+        copia = {nombre: dict(valores) for nombre, valores in _metricas.items()}
+    for valores in copia.values():
+        valores["promedio"] = valores["segundos"] / valores["llamadas"] if valores["llamadas"] else 0.0
+    return copia
+
+#Estadísticas de todos los perfiles sin detenerlos
+def _estadisticas_perfil() -> pstats.Stats:
+    instantaneas = []
+    for perfil in list(_perfiles):
+        perfil.snapshot_stats()
+        # pstats toma las estadísticas de cualquier objeto con create_stats y stats
+        instantaneas.append(SimpleNamespace(stats=dict(perfil.stats), create_stats=lambda: None))
+    return pstats.Stats(*instantaneas)
+
+#Funciones con más tiempo acumulado según cProfile
+def perfil_principal(cantidad: int = 30) -> list:
+    if not _perfiles:
+        return []
+    estadisticas = _estadisticas_perfil().stats
+    filas = sorted(estadisticas.items(), key=lambda item: item[1][3], reverse=True)[:cantidad]
+    return [{"funcion": f"{os.path.basename(archivo)}:{linea}({nombre})", "llamadas": llamadas,
+             "propio": round(propio, 6), "acumulado": round(acumulado, 6)}
+            for (archivo, linea, nombre), (_, llamadas, propio, acumulado, _) in filas]
+
+#Escribe las métricas en destino (JSON) y, si hay perfiles activos, el perfil
+#en destino + ".prof" para abrirlo con pstats o snakeviz. Retorna las rutas escritas
+def volcar(destino: str = None) -> list:
+    destino = destino or config.RUTA_METRICAS
+    datos = {"funciones": metricas(), "perfil": perfil_principal()}
+    temporal = destino + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as archivo:
+        json.dump(datos, archivo, ensure_ascii=False, indent=2)
+    os.replace(temporal, destino)
+    escritos = [destino]
+    if _perfiles:
+        _estadisticas_perfil().dump_stats(destino + ".prof")
+        escritos.append(destino + ".prof")
+    return escritos
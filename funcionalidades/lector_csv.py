@@ -0,0 +1,148 @@
+import io
+import csv
+from .config import ENCABEZADOS
+from .validar_inputs import parse_precio, parse_entero, id_correcto, texto_correcto, numero_correcto
+
+#Lector de CSV compartido por todos los módulos.
+#Los archivos se leen de una vez (o por bloques grandes) y se dividen con str.split
+#cuando no hay comillas; solo los textos con comillas pasan por el módulo csv.
+#Los productos quedan como diccionarios de textos, igual que con csv.DictReader,
+#y las conversiones a número usan siempre a_precio y a_entero.
+
+_BLOQUE = 1024 * 1024
+
+#Los valores validados son enteros sin signo; solo los demás pasan por parse_precio/parse_entero
+def a_precio(texto):
+    if texto and texto.isdigit():
+        return int(texto)
+    return parse_precio(texto)
+
+def a_entero(texto):
+    if texto and texto.isdigit():
+        return int(texto)
+    return parse_entero(texto)
+
+#Divide una sola línea en sus valores
+def dividir_linea(linea: str) -> list:
+    if '"' in linea:
+        return next(csv.reader([linea]), [])
+    return linea.split(",")
+
+#Posición del "\n" que termina el registro que empieza en inicio (o el largo, si es el último),
+#dentro de bytes o de un mmap. Un campo entre comillas puede tener saltos de línea: el registro
+#sigue hasta que la cantidad de comillas queda par
+def fin_de_registro(contenido, inicio: int) -> int:
+    total = len(contenido)
+    fin = contenido.find(b"\n", inicio)
+    if fin == -1:
+        fin = total
+    if contenido.find(b'"', inicio, fin) == -1:
+        return fin
+    comillas = contenido[inicio:fin].count(b'"')
+    while comillas % 2 and fin < total:
+        siguiente = contenido.find(b"\n", fin + 1)
+        if siguiente == -1:
+            siguiente = total
+        comillas += contenido[fin:siguiente].count(b'"')
+        fin = siguiente
+    return fin
+
+#Divide un texto CSV en filas (listas de textos). Las líneas en blanco se saltean, como en csv.reader
+def dividir(texto: str) -> list:
+    if '"' in texto:
+        return [fila for fila in csv.reader(io.StringIO(texto, newline="")) if fila]
+    return [linea.rstrip("\r").split(",") for linea in texto.split("\n") if linea and linea != "\r"]
+
+#Fila como diccionario, con la misma forma que csv.DictReader:
+#los valores de más quedan en una lista bajo la clave None y los que faltan valen None
+def _desparejo(campos: list, fila: list) -> dict:
+    producto = dict(zip(campos, fila))
+    if len(fila) > len(campos):
+        producto[None] = fila[len(campos):]
+    else:
+        for campo in campos[len(fila):]:
+            producto[campo] = None
+    return producto
+
+#Convierte filas en productos con los encabezados indicados
+def a_productos(campos: list, filas) -> list:
+    ancho = len(campos)
+    return [dict(zip(campos, fila)) if len(fila) == ancho else _desparejo(campos, fila) for fila in filas]
+
+#Encabezados y filas de un texto CSV completo (encabezados None si está vacío)
+def leer_texto(texto: str) -> tuple:
+    if texto.startswith("\ufeff"):
+        texto = texto[1:]
+    filas = dividir(texto)
+    if not filas:
+        return None, []
+    return filas[0], filas[1:]
+
+#Encabezados y filas de un archivo, leído de una vez
+def leer_filas(ruta: str) -> tuple:
+    with open(ruta, "rb") as archivo:
+        return leer_texto(archivo.read().decode("utf-8"))
+
+#Productos de un archivo, leído de una vez
+def leer_productos(ruta: str) -> list:
+    campos, filas = leer_filas(ruta)
+    return a_productos(campos, filas) if campos else []
+
+#Filas de un archivo leídas por bloques, sin cargarlo completo (la primera son los encabezados).
+#Un campo entre comillas puede tener saltos de línea: si un bloque termina dentro de uno
+#(cantidad impar de comillas) se sigue leyendo antes de dividir
+def iterar_filas(ruta: str):
+    with open(ruta, encoding="utf-8", newline="") as archivo:
+        resto = ""
+        primero = True
+        while True:
+            bloque = archivo.read(_BLOQUE)
+            if not bloque:
+                break
+            if primero and bloque.startswith("\ufeff"):
+                bloque = bloque[1:]
+            primero = False
+            texto = resto + bloque
+            corte = texto.rfind("\n") + 1
+            if corte == 0 or texto.count('"', 0, corte) % 2:
+                resto = texto
+                continue
+            resto = texto[corte:]
+            yield from dividir(texto[:corte])
+        if resto:
+            yield from dividir(resto)
+
+#Productos de un archivo leídos por bloques
+def iterar_productos(ruta: str):
+    filas = iterar_filas(ruta)
+    campos = next(filas, None)
+    if campos is None:
+        return
+    ancho = len(campos)
+    for fila in filas:
+        yield dict(zip(campos, fila)) if len(fila) == ancho else _desparejo(campos, fila)
+
+#Precio y stock ya convertidos de cada fila (None si son inválidos), leídos por bloques
+#y sin armar diccionarios: para resúmenes que solo necesitan los números
+def iterar_valores(ruta: str):
+    filas = iterar_filas(ruta)
+    campos = next(filas, None)
+    if campos is None or "Precio" not in campos or "Stock" not in campos:
+        return
+    posicion_precio, posicion_stock = campos.index("Precio"), campos.index("Stock")
+    for fila in filas:
+        precio = a_precio(fila[posicion_precio]) if posicion_precio < len(fila) else None
+        stock = a_entero(fila[posicion_stock]) if posicion_stock < len(fila) else None
+        yield precio, stock
+
+#Valida una fila (en el orden de ENCABEZADOS) con las reglas de validar_inputs.
+#Retorna la fila con los valores sin espacios de más, o None si es inválida
+def validar_fila(fila: list) -> list:
+    if len(fila) != len(ENCABEZADOS):
+        return None
+    limpia = [valor.strip() for valor in fila]
+    id_producto, nombre, precio, stock = limpia
+    if (not id_correcto(id_producto) or not texto_correcto(nombre)
+            or not numero_correcto(precio) or not numero_correcto(stock)):
+        return None
+    return limpia
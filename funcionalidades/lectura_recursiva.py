@@ -1,53 +1,88 @@
 import os
-import csv
 from .config import RUTA_BASE, NOMBRE_CSV
+from .cache_catalogo import obtener_productos
+from .motor import usa_sqlite, listar_hojas
+from .instrumentacion import instrumentar
 
 
-#Lee un archivo CSV y devuelve una lista de diccionarios
+#Lee un archivo CSV y devuelve una lista de diccionarios.
+#Usa la caché del catálogo, así que solo se parsean los archivos que cambiaron.
+#Las filas se arman en cada llamada, así que quien llama puede modificarlas antes de escribirlas
+@instrumentar("leer_csv", lambda a, r: {"filas": len(r)})
 def leer_csv(ruta_csv: str) -> list[dict]:
-    datos = []
-    if os.path.exists(ruta_csv):
-        with open(ruta_csv, newline="", encoding="utf-8") as archivo:
-            lector = csv.DictReader(archivo)
-            for producto in lector:
-                datos.append(producto)
-    return datos
-
-#Recorre recursivamente las carpetas y construye la estructura jerárquica
-def recorrer_carpeta(ruta: str) -> dict:
-    estructura = {}
-
-    for elemento in os.listdir(ruta):
-        ruta_completa = os.path.join(ruta, elemento)
-
-        if os.path.isdir(ruta_completa):
-            # Recorre la subcarpeta y obtiene su estructura
-            subestructura = recorrer_carpeta(ruta_completa)
-
-            # Si la subcarpeta contiene directamente un CSV (nivel final)
-            # entonces subestructura será una lista (contenido del CSV)
-            estructura[elemento] = subestructura
-
-        elif elemento.lower() == NOMBRE_CSV.lower():
-            # Si encuentra un CSV, lo lee y retorna directamente la lista de productos
-            return leer_csv(ruta_completa)
-
-    return estructura
-
-#Construye la jerarquía completa desde la carpeta base
-def construir_jerarquia(base: str) -> list[dict]:
-    jerarquia = []
-    for categoria in os.listdir(base):
-        ruta_categoria = os.path.join(base, categoria)
-        if os.path.isdir(ruta_categoria):
-            jerarquia.append({categoria: recorrer_carpeta(ruta_categoria)})
-    return jerarquia
-
-def iniciar_lectura():
-    return construir_jerarquia(RUTA_BASE)
-    
+    try:
+        return obtener_productos(ruta_csv)
+    except Exception as e:
+        print(f"Error al leer el archivo '{ruta_csv}': {e}")
+        return []
+
+#Árbol de categorías perezoso. Cada nodo es un diccionario con el nombre y la carpeta;
+#sus subcategorías se listan recién cuando se piden (con os.scandir, o con las rutas
+#de la base en SQLite) y los productos de una hoja solo se leen con productos_nodo.
+#Como en la lectura anterior, una carpeta que tiene Productos.csv es una hoja
+#y no se siguen sus subcarpetas.
+def nuevo_nodo(nombre: str, carpeta: str) -> dict:
+    return {"nombre": nombre, "carpeta": carpeta, "hijos": None, "es_hoja": None}
+
+@instrumentar("recorrer_carpeta", lambda a, r: {"carpetas": len(a[0]["hijos"])})
+def _cargar_hijos(nodo: dict) -> None:
+    carpeta = nodo["carpeta"]
+    nombres = []
+    es_hoja = False
+    if usa_sqlite():
+        prefijo = os.path.normpath(carpeta) + os.sep
+        for ruta in listar_hojas(carpeta):
+            partes = ruta[len(prefijo):].split(os.sep)
+            if len(partes) == 1:
+                es_hoja = True
+            elif partes[0] not in nombres:
+                nombres.append(partes[0])
+    else:
+        try:
+            with os.scandir(carpeta) as entradas:
+                for entrada in entradas:
+                    if entrada.is_dir():
+                        nombres.append(entrada.name)
+                    elif entrada.name.lower() == NOMBRE_CSV.lower():
+                        es_hoja = True
+        except OSError:
+            pass
+    # La carpeta base nunca es hoja: sus categorías son las subcarpetas
+    nodo["es_hoja"] = es_hoja and nodo["carpeta"] != RUTA_BASE
+    nodo["hijos"] = [] if nodo["es_hoja"] else [nuevo_nodo(n, os.path.join(carpeta, n)) for n in sorted(nombres)]
+
+#Subcategorías del nodo (se listan la primera vez que se piden)
+def hijos(nodo: dict) -> list:
+    if nodo["hijos"] is None:
+        _cargar_hijos(nodo)
+    return nodo["hijos"]
+
+def es_hoja(nodo: dict) -> bool:
+    if nodo["es_hoja"] is None:
+        _cargar_hijos(nodo)
+    return nodo["es_hoja"]
+
+#Ruta del CSV de una hoja
+def ruta_hoja(nodo: dict) -> str:
+    return os.path.join(nodo["carpeta"], NOMBRE_CSV)
+
+#Productos de una hoja (se leen recién acá)
+def productos_nodo(nodo: dict) -> list[dict]:
+    return leer_csv(ruta_hoja(nodo)) if es_hoja(nodo) else []
+
+#Estructura completa como diccionarios anidados (las hojas con sus productos).
+#Lee todas las categorías: solo para mostrar o depurar
+def a_estructura(nodo: dict):
+    if es_hoja(nodo):
+        return productos_nodo(nodo)
+    return {hijo["nombre"]: a_estructura(hijo) for hijo in hijos(nodo)}
+
+#Nodo raíz del árbol de categorías. No recorre carpetas ni lee archivos
+def iniciar_lectura() -> dict:
+    return nuevo_nodo(RUTA_BASE, RUTA_BASE)
+
 def main():
-    jerarquia = iniciar_lectura()
+    jerarquia = a_estructura(iniciar_lectura())
     print(jerarquia)
 
 
@@ -0,0 +1,27 @@
+import os
+from .config import RUTA_BASE, ENCABEZADOS
+from . import config, almacenamiento, almacenamiento_sqlite
+from .agregados import iterar_filas
+from .motor import listar_hojas_csv
+
+#Copia el catálogo de un motor al otro. Cada categoría conserva su ruta y sus filas
+#tal cual (con las operaciones pendientes del diario ya aplicadas). Las categorías que
+#solo existen en el destino no se tocan.
+
+#Pasa las categorías CSV a la base SQLite, una transacción por categoría. Las filas se
+#leen de a una y se insertan de a config.LOTE_IMPORTACION, así que la memoria depende
+#del lote y no del catálogo. Retorna la cantidad de categorías copiadas
+def csv_a_sqlite(base: str = RUTA_BASE) -> int:
+    rutas = listar_hojas_csv(base)
+    for ruta in rutas:
+        almacenamiento_sqlite.guardar_categoria_por_lotes(ruta, iterar_filas(ruta), config.LOTE_IMPORTACION)
+    return len(rutas)
+
+#Escribe cada categoría de la base SQLite como Productos.csv (creando las carpetas).
+#Retorna la cantidad de categorías copiadas
+def sqlite_a_csv() -> int:
+    rutas = almacenamiento_sqlite.listar_hojas()
+    for ruta in rutas:
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        almacenamiento.guardar_categoria(ruta, almacenamiento_sqlite.leer_categoria(ruta), ENCABEZADOS)
+    return len(rutas)
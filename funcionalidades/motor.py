@@ -0,0 +1,107 @@
+import os
+from . import config
+from .config import RUTA_BASE, NOMBRE_CSV, ENCABEZADOS
+from . import almacenamiento, almacenamiento_sqlite
+from .indice_ids import leer_fila as leer_fila_csv
+
+#Motor de almacenamiento: el resto del sistema lee y escribe categorías solo con estas funciones.
+#config.MOTOR elige la implementación:
+#  "csv":    un Productos.csv por carpeta hoja, con diario de operaciones (almacenamiento.py)
+#  "sqlite": todo el catálogo en un archivo SQLite con índices (almacenamiento_sqlite.py)
+#En los dos casos una categoría se identifica por la ruta de su Productos.csv.
+
+def usa_sqlite() -> bool:
+    return config.MOTOR == "sqlite"
+
+#Devuelve (mtime_ns, tamaño) del archivo, o None si no existe
+def firma_archivo(ruta: str) -> tuple:
+    try:
+        estado = os.stat(ruta)
+    except OSError:
+        return None
+    return (estado.st_mtime_ns, estado.st_size)
+
+#Firma de la categoría, que cambia con cada escritura (None si la categoría no existe).
+#En CSV es la del archivo más la de su diario; en SQLite, la versión de la categoría
+def firma_categoria(ruta: str) -> tuple:
+    if usa_sqlite():
+        return almacenamiento_sqlite.firma_categoria(ruta)
+    firma = firma_archivo(ruta)
+    if firma is None:
+        return None
+    return firma + (firma_archivo(almacenamiento.ruta_diario(ruta)),)
+
+#Rutas normalizadas de todas las categorías hoja debajo de la carpeta base
+def listar_hojas(base: str = RUTA_BASE) -> list:
+    if usa_sqlite():
+        prefijo = os.path.normpath(base) + os.sep
+        return [r for r in almacenamiento_sqlite.listar_hojas() if r.startswith(prefijo)]
+    return listar_hojas_csv(base)
+
+#Todos los Productos.csv de la carpeta, sin importar el motor configurado
+def listar_hojas_csv(base: str = RUTA_BASE) -> list:
+    rutas = []
+    for raiz, _, archivos in os.walk(base):
+        for archivo in archivos:
+            if archivo.lower() == NOMBRE_CSV.lower():
+                rutas.append(os.path.normpath(os.path.join(raiz, archivo)))
+    return sorted(rutas)
+
+def existe_categoria(ruta: str) -> bool:
+    if usa_sqlite():
+        return almacenamiento_sqlite.existe_categoria(ruta)
+    return os.path.exists(ruta)
+
+#Indica si la carpeta existe (en SQLite, si tiene alguna categoría debajo)
+def existe_carpeta(carpeta: str) -> bool:
+    if usa_sqlite():
+        return almacenamiento_sqlite.existe_carpeta(carpeta)
+    return os.path.isdir(carpeta)
+
+#Crea la categoría vacía (con sus carpetas, en CSV) si no existe
+def crear_categoria(ruta: str) -> None:
+    if usa_sqlite():
+        almacenamiento_sqlite.crear_categoria(ruta)
+    elif not os.path.exists(ruta):
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        almacenamiento.escribir_atomico(ruta, [], ENCABEZADOS)
+
+#Productos de la categoría con las operaciones pendientes ya aplicadas
+def leer_categoria(ruta: str) -> list[dict]:
+    if usa_sqlite():
+        return almacenamiento_sqlite.leer_categoria(ruta)
+    return almacenamiento.leer_categoria(ruta)
+
+#Reemplaza todos los productos de la categoría
+def guardar_categoria(ruta: str, datos: list, campos: list) -> None:
+    if usa_sqlite():
+        almacenamiento_sqlite.guardar_categoria(ruta, datos, campos)
+    else:
+        almacenamiento.guardar_categoria(ruta, datos, campos)
+
+#Registra altas, modificaciones y bajas (formato de almacenamiento.aplicar_operaciones).
+#En CSV van al diario; en SQLite se aplican en una transacción
+def registrar_operaciones(ruta: str, operaciones: list) -> None:
+    if usa_sqlite():
+        almacenamiento_sqlite.registrar_operaciones(ruta, operaciones)
+    else:
+        almacenamiento.registrar_operaciones(ruta, operaciones)
+
+#Mayor ID asignado que se guardó para las bajas con marca (0 si no hay ninguno)
+def leer_maximo_id(ruta: str) -> int:
+    if usa_sqlite():
+        return almacenamiento_sqlite.leer_maximo_id(ruta)
+    return almacenamiento.leer_maximo_id(ruta)
+
+def guardar_maximo_id(ruta: str, maximo: int) -> None:
+    if usa_sqlite():
+        almacenamiento_sqlite.guardar_maximo_id(ruta, maximo)
+    else:
+        almacenamiento.guardar_maximo_id(ruta, maximo)
+
+#Un producto por ID sin cargar la categoría completa (None si no existe).
+#En CSV usa el índice persistente de desplazamientos; en SQLite, el índice de la tabla
+def leer_fila(ruta: str, id_producto: str) -> dict:
+    if usa_sqlite():
+        return almacenamiento_sqlite.leer_fila(ruta, id_producto)
+    return leer_fila_csv(ruta, id_producto)
@@ -0,0 +1,140 @@
+import os
+import csv
+import heapq
+import tempfile
+from . import config
+from .config import RUTA_BASE, ENCABEZADOS, MEMORIA_ORDENAMIENTO, MAX_TRAMOS
+from .lector_csv import a_precio, a_entero, iterar_filas as filas_csv
+from .almacenamiento import escribir_atomico, compactar, existe_diario
+from .agregados import iterar_filas
+from .motor import usa_sqlite, listar_hojas, leer_categoria
+
+#Ordenamiento externo: las filas se juntan en tramos de hasta config.MEMORIA_ORDENAMIENTO
+#bytes (aproximado), cada tramo se ordena en memoria y se vuelca a un archivo temporal,
+#y al final los tramos se mezclan de a k con heapq.merge leyendo una fila por tramo.
+#Así una categoría (o toda la jerarquía) se ordena sin tenerla completa en memoria.
+#El orden es estable: a igual clave se conserva el orden original.
+
+#Campos por los que se puede ordenar y cómo se convierten (los inválidos ordenan como 0)
+CAMPOS_ORDEN = {"Precio": a_precio, "Stock": a_entero, "ID": a_entero}
+
+#Memoria aproximada que ocupa una fila además de sus textos (lista, strings y clave)
+_COSTO_FILA = 200
+
+#Acepta "Precio", ["Precio", "Stock"] o [("Precio", True), ("Stock", False)]
+#y retorna una lista de (campo, descendente)
+def normalizar_claves(claves, descendente: bool = False) -> list:
+    if isinstance(claves, str):
+        claves = [c for c in claves.replace(";", ",").split(",") if c.strip()]
+    resultado = []
+    for clave in claves:
+        campo, desc = (clave, descendente) if isinstance(clave, str) else clave
+        campo = campo.strip().capitalize() if campo.strip().lower() != "id" else "ID"
+        if campo not in CAMPOS_ORDEN:
+            raise ValueError(f"Campo de orden inválido: '{campo}'")
+        resultado.append((campo, bool(desc)))
+    if not resultado:
+        raise ValueError("No se indicó ningún campo de orden")
+    return resultado
+
+#Función clave para filas en forma de lista con los encabezados indicados
+def funcion_clave(campos: list, claves: list):
+    posiciones = [(campos.index(campo), CAMPOS_ORDEN[campo], desc) for campo, desc in claves]
+    def clave(fila):
+        valores = []
+        for posicion, convertir, desc in posiciones:
+            valor = convertir(fila[posicion]) if posicion < len(fila) else None
+            if valor is None:
+                valor = 0
+            valores.append(-valor if desc else valor)
+        return tuple(valores)
+    return clave
+
+def _escribir_tramo(filas, carpeta: str) -> str:
+    descriptor, ruta = tempfile.mkstemp(suffix=".tramo", dir=carpeta)
+    with os.fdopen(descriptor, "w", newline="", encoding="utf-8") as archivo:
+        csv.writer(archivo).writerows(filas)
+    return ruta
+
+def _leer_tramo(ruta: str):
+    yield from filas_csv(ruta)
+    os.remove(ruta)
+
+#Mezcla tramos por pasadas hasta que queden como máximo config.MAX_TRAMOS abiertos a la vez.
+#Cada grupo se mezcla en orden y ocupa el lugar de sus tramos, para no perder la estabilidad
+def _reducir_tramos(tramos: list, clave, carpeta: str) -> list:
+    while len(tramos) > MAX_TRAMOS:
+        tramos = [_escribir_tramo(heapq.merge(*map(_leer_tramo, tramos[i:i + MAX_TRAMOS]), key=clave), carpeta)
+                  for i in range(0, len(tramos), MAX_TRAMOS)]
+    return tramos
+
+#Ordena filas (listas de textos) con los encabezados indicados y las devuelve de a una.
+#Si entran en la memoria indicada se ordenan sin tocar el disco; si no, los tramos van a
+#carpeta_temporal (por defecto config.CARPETA_ORDENAMIENTO)
+def ordenar_filas(filas, campos: list, claves: list, memoria: int = MEMORIA_ORDENAMIENTO,
+                  carpeta_temporal: str = None):
+    clave = funcion_clave(campos, claves)
+    carpeta_temporal = carpeta_temporal or config.CARPETA_ORDENAMIENTO
+    with tempfile.TemporaryDirectory(prefix="orden-", dir=carpeta_temporal) as carpeta:
+        tramos = []
+        actual = []
+        usado = 0
+        for fila in filas:
+            actual.append(fila)
+            usado += sum(map(len, fila)) + _COSTO_FILA
+            if usado >= memoria:
+                actual.sort(key=clave)
+                tramos.append(_escribir_tramo(actual, carpeta))
+                actual, usado = [], 0
+        actual.sort(key=clave)
+        if not tramos:
+            yield from actual
+            return
+        # El último tramo se mezcla directo desde memoria; va último para mantener la estabilidad
+        tramos = _reducir_tramos(tramos, clave, carpeta)
+        yield from heapq.merge(*map(_leer_tramo, tramos), iter(actual), key=clave)
+
+#Filas de una categoría como listas en el orden de ENCABEZADOS, leídas de a una si es posible
+def _filas_categoria(ruta: str):
+    productos = leer_categoria(ruta) if usa_sqlite() else iterar_filas(ruta)
+    for producto in productos:
+        yield [producto.get(campo) or "" for campo in ENCABEZADOS]
+
+#Escribe en destino la categoría ordenada, con los IDs renumerados si se pide.
+#El destino se escribe de forma atómica; puede ser un temporal para revisar antes de guardar.
+#Los tramos del ordenamiento van fuera de la jerarquía: junto a destino solo queda el reemplazo final.
+#Si se indica renumerados, se completa con ID anterior -> ID nuevo de los productos que cambiaron de ID.
+#Retorna la cantidad de filas escritas
+def ordenar_csv(ruta: str, claves: list, destino: str, renumerar: bool = True, renumerados: dict = None) -> int:
+    if existe_diario(ruta):
+        compactar(ruta)
+    cantidad = 0
+    def filas_destino():
+        nonlocal cantidad
+        ordenadas = ordenar_filas(_filas_categoria(ruta), ENCABEZADOS, claves)
+        for cantidad, fila in enumerate(ordenadas, 1):
+            producto = dict(zip(ENCABEZADOS, fila))
+            if renumerar:
+                if renumerados is not None and producto["ID"] != str(cantidad):
+                    renumerados[producto["ID"]] = cantidad
+                producto["ID"] = str(cantidad)
+            yield producto
+    escribir_atomico(destino, filas_destino(), ENCABEZADOS)
+    return cantidad
+
+#Ordena todas las categorías juntas en un solo CSV con la columna "Categoría".
+#Retorna la cantidad de filas escritas
+def ordenar_jerarquia(claves: list, destino: str, base: str = RUTA_BASE) -> int:
+    campos = ["Categoría"] + ENCABEZADOS
+    def filas():
+        for ruta in listar_hojas(base):
+            categoria = os.path.relpath(os.path.dirname(ruta), base).replace(os.sep, "/")
+            for fila in _filas_categoria(ruta):
+                yield [categoria] + fila
+    cantidad = 0
+    def filas_destino():
+        nonlocal cantidad
+        for cantidad, fila in enumerate(ordenar_filas(filas(), campos, claves), 1):
+            yield dict(zip(campos, fila))
+    escribir_atomico(destino, filas_destino(), campos)
+    return cantidad
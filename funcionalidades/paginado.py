@@ -0,0 +1,142 @@
+import os
+import mmap
+from array import array
+from . import config
+from .almacenamiento import existe_diario
+from .cache_catalogo import obtener_columnas, filas_en, cantidad_productos, firma_categoria
+from .columnas import filtrar
+from .motor import usa_sqlite
+from .almacenamiento_sqlite import contar_productos, leer_pagina
+from .lector_csv import dividir_linea, fin_de_registro
+
+#Listado por páginas para categorías muy grandes.
+#El CSV se abre con mmap y se anota dónde empieza cada línea a medida que se necesitan:
+#la página 1 solo recorre sus primeras líneas y una página ya vista se lee
+#yendo directo a su desplazamiento, así que no hace falta cargar la categoría entera.
+#Una fila ocupa una línea salvo que un campo entre comillas tenga saltos de línea
+#(las filas se delimitan como en indice_ids). El índice de líneas se guarda
+#mientras la firma del archivo no cambie; el archivo no queda abierto entre páginas.
+_lectores = {}   # ruta -> {"firma", "campos", "lineas", "siguiente", "completo", "filtros"}
+
+def _abrir(ruta: str):
+    with open(ruta, "rb") as archivo:
+        try:
+            return mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Archivo vacío: no se puede mapear
+            return None
+
+def _fin_de_linea(mapa, inicio: int) -> int:
+    return fin_de_registro(mapa, inicio)
+
+#La firma se toma antes de abrir el archivo: si cambia en el medio, el índice queda
+#con la firma vieja y se vuelve a armar en el próximo acceso
+def _lector(ruta: str, firma: tuple, mapa) -> dict:
+    lector = _lectores.get(ruta)
+    if lector is not None and lector["firma"] == firma:
+        return lector
+    campos, siguiente = [], 0
+    if mapa is not None:
+        fin = _fin_de_linea(mapa, 0)
+        campos = dividir_linea(mapa[:fin].decode("utf-8-sig").rstrip("\r"))
+        siguiente = fin + 1
+    lector = {"firma": firma, "campos": campos, "lineas": array("q"), "siguiente": siguiente,
+              "completo": mapa is None, "filtros": {}}
+    _lectores[ruta] = lector
+    return lector
+
+#Anota el comienzo de las líneas siguientes hasta conocer "hasta" líneas (o llegar al final)
+def _extender(lector: dict, mapa, hasta: int) -> None:
+    if lector["completo"]:
+        return
+    lineas = lector["lineas"]
+    siguiente = lector["siguiente"]
+    total = len(mapa) if mapa is not None else 0
+    while len(lineas) < hasta:
+        if siguiente >= total:
+            lector["completo"] = True
+            break
+        fin = _fin_de_linea(mapa, siguiente)
+        # Las líneas en blanco se saltean, como en csv.DictReader
+        if mapa[siguiente:fin].strip():
+            lineas.append(siguiente)
+        siguiente = fin + 1
+    lector["siguiente"] = siguiente
+
+def _texto_linea(mapa, inicio: int) -> str:
+    return mapa[inicio:_fin_de_linea(mapa, inicio)].decode("utf-8").rstrip("\r")
+
+def _fila(lector: dict, texto: str) -> dict:
+    return dict(zip(lector["campos"], dividir_linea(texto)))
+
+#Números de línea de las filas cuyo nombre contiene el filtro, hasta conocer "hasta" de ellas
+def _coincidencias(lector: dict, mapa, filtro: str, hasta: int) -> list:
+    estado = lector["filtros"].setdefault(filtro, {"posiciones": [], "revisadas": 0})
+    posiciones = estado["posiciones"]
+    lineas = lector["lineas"]
+    while len(posiciones) < hasta:
+        if estado["revisadas"] >= len(lineas):
+            _extender(lector, mapa, len(lineas) + 4096)
+            if estado["revisadas"] >= len(lineas):
+                break
+        numero = estado["revisadas"]
+        estado["revisadas"] += 1
+        texto = _texto_linea(mapa, lineas[numero])
+        # Primero un descarte barato sobre la línea completa; después se compara solo el nombre
+        if filtro in texto.lower() and filtro in (_fila(lector, texto).get("Nombre") or "").lower():
+            posiciones.append(numero)
+    return posiciones
+
+def _pagina_csv(ruta: str, desde: int, cantidad: int, filtro: str) -> list:
+    ruta = os.path.normpath(ruta)
+    firma = firma_categoria(ruta)
+    mapa = _abrir(ruta)
+    try:
+        lector = _lector(ruta, firma, mapa)
+        if filtro:
+            numeros = _coincidencias(lector, mapa, filtro, desde + cantidad)[desde:desde + cantidad]
+        else:
+            _extender(lector, mapa, desde + cantidad)
+            numeros = range(desde, min(desde + cantidad, len(lector["lineas"])))
+        return [_fila(lector, _texto_linea(mapa, lector["lineas"][n])) for n in numeros]
+    finally:
+        if mapa is not None:
+            mapa.close()
+
+#Página "numero" (desde 1) de la categoría, opcionalmente filtrada por nombre.
+#Las páginas son de config.TAMANO_PAGINA filas salvo que se indique otro tamaño.
+#Retorna (productos de la página, hay más páginas)
+def pagina(ruta: str, numero: int, tamano: int = None, filtro: str = None) -> tuple:
+    tamano = tamano or config.TAMANO_PAGINA
+    filtro = filtro.lower() if filtro else None
+    desde = (max(numero, 1) - 1) * tamano
+    # Se pide una fila de más para saber si hay otra página
+    if usa_sqlite():
+        productos = leer_pagina(ruta, desde, tamano + 1, filtro)
+    elif existe_diario(ruta):
+        # El CSV no refleja las operaciones pendientes: se pagina sobre la tabla de la caché
+        tabla = obtener_columnas(ruta)
+        posiciones = filtrar(tabla, filtro) if filtro else range(tabla["cantidad"])
+        productos = filas_en(ruta, posiciones[desde:desde + tamano + 1])
+    else:
+        productos = _pagina_csv(ruta, desde, tamano + 1, filtro)
+    return productos[:tamano], len(productos) > tamano
+
+#Indica si la categoría tiene al menos config.PAGINAR_DESDE productos
+#(en CSV solo se recorren las primeras líneas, sin contar el archivo entero)
+def es_grande(ruta: str) -> bool:
+    if usa_sqlite():
+        return contar_productos(ruta) >= config.PAGINAR_DESDE
+    if existe_diario(ruta):
+        return cantidad_productos(ruta) >= config.PAGINAR_DESDE
+    ruta = os.path.normpath(ruta)
+    firma = firma_categoria(ruta)
+    mapa = _abrir(ruta)
+    if mapa is None:
+        return False
+    try:
+        lector = _lector(ruta, firma, mapa)
+        _extender(lector, mapa, config.PAGINAR_DESDE)
+        return len(lector["lineas"]) >= config.PAGINAR_DESDE
+    finally:
+        mapa.close()
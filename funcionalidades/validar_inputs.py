@@ -40,4 +40,26 @@ def ingresar_id(texto_mostrar:str) -> str:
             else:
                 raise ValueError
         except ValueError:
-            print("Valores incorrectos")
\ No newline at end of file
+            print("Valores incorrectos")
+
+#Intenta convertir una cadena de precio a float
+def parse_precio(valor) -> float:
+    if valor is None:
+        return None
+    try:
+        s = str(valor).strip()
+        # Si hay una coma y no hay punto, la usamos como separador decimal
+        if s.count(',') >= 1 and s.count('.') == 0:
+            s = s.replace(',', '.')
+        return float(s)
+    except Exception:
+        return None
+
+#Convierte a int cuando sea posible. Devuelve None si no se puede
+def parse_entero(valor) -> int:
+    if valor is None:
+        return None
+    try:
+        return int(float(str(valor).strip()))
+    except Exception:
+        return None
@@ -1,7 +1,13 @@
 import os
-import csv
-from .config import RUTA_BASE, NOMBRE_CSV, ENCABEZADOS
-from .validar_inputs import texto_correcto, numero_correcto, id_correcto
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from .config import RUTA_BASE, NOMBRE_CSV, ENCABEZADOS, NOMBRE_MANIFIESTO, MIN_ARCHIVOS_PARALELO
+from .lector_csv import leer_filas, validar_fila
+from .almacenamiento import escribir_atomico, compactar
+from .motor import usa_sqlite, crear_categoria
+from .instrumentacion import instrumentar, tamano
+from . import instantanea
 
 #Estructura inicial mínima, en caso de que no existan subcarpetas
 ESTRUCTURA_INICIAL = {
@@ -18,51 +24,126 @@ ESTRUCTURA_INICIAL = {
 }
 #Crea un archivo CSV con los encabezados básicos
 def crear_csv(ruta: str) -> None:
-    with open(ruta, "w", newline="", encoding="utf-8") as archivo:
-        escritor = csv.DictWriter(archivo, fieldnames=ENCABEZADOS)
-        escritor.writeheader()
+    escribir_atomico(ruta, [], ENCABEZADOS)
     print(f"Creado archivo: {ruta}")
 
-#Verifica si existe un csv en la ruta especificada
+#Verifica si existe un csv en la ruta especificada.
+#Los existentes se validan después, todos juntos, en validar_archivos
 def verificar_existencia_csv(ruta: str) -> None:
     if os.path.exists(ruta):
         print(f"Existe {ruta}")
-        validar_csv(ruta)
     else:
         crear_csv(ruta)
 
-#Verifica encabezados y datos numéricos válidos
-def validar_csv(ruta: str) -> None:
+#Verifica encabezados y datos numéricos válidos.
+#Solo reescribe el archivo si había líneas inválidas o valores con espacios de más.
+#Retorna True si el archivo fue reescrito
+@instrumentar("validar_csv", lambda a, r: {"bytes_leidos": tamano(a[0]), "reescritos": int(r)})
+def validar_csv(ruta: str) -> bool:
     try:
-        with open(ruta, newline="", encoding="utf-8") as archivo:
-            lector = csv.DictReader(archivo)
-            #Si los encabezados no eran los esperados, se limpia todo el archivo con los encabezados correctos
-            if lector.fieldnames != ENCABEZADOS:
-                print(f"Encabezados inválidos en {ruta}, recreando archivo.")
-                crear_csv(ruta)
-                return
-
-            lineas_validas = []
-            #Valida cada linea, si el formato de valores es correcto
-            for i, fila in enumerate(lector, start=2):
-                if (not id_correcto(fila["ID"].strip()) or
-                    not texto_correcto(fila["Nombre"].strip()) or
-                    not numero_correcto(fila["Precio"].strip()) or
-                    not numero_correcto(fila["Stock"].strip())):
-                    print(f"Línea {i} inválida en {ruta}")
-                else:
-                    for k, v in fila.items():
-                        fila[k] = v.strip()
-                    lineas_validas.append(fila)
-
-        with open(ruta, "w", newline="", encoding="utf-8") as archivo:
-            escritor = csv.DictWriter(archivo, fieldnames=ENCABEZADOS)
-            escritor.writeheader()
-            escritor.writerows(lineas_validas)
-        print(f"Archivo corregido: {ruta}")
-
+        campos, filas = leer_filas(ruta)
     except FileNotFoundError:
         crear_csv(ruta)
+        return True
+
+    #Si los encabezados no eran los esperados, se limpia todo el archivo con los encabezados correctos
+    if campos != ENCABEZADOS:
+        print(f"Encabezados inválidos en {ruta}, recreando archivo.")
+        crear_csv(ruta)
+        return True
+
+    lineas_validas = []
+    hubo_cambios = False
+    #Valida cada linea, si el formato de valores es correcto (y sin columnas de más o de menos)
+    for i, fila in enumerate(filas, start=2):
+        limpia = validar_fila(fila)
+        if limpia is None:
+            print(f"Línea {i} inválida en {ruta}")
+            hubo_cambios = True
+            continue
+        if limpia != fila:
+            hubo_cambios = True
+        lineas_validas.append(dict(zip(ENCABEZADOS, limpia)))
+
+    if not hubo_cambios:
+        return False
+    escribir_atomico(ruta, lineas_validas, ENCABEZADOS)
+    print(f"Archivo corregido: {ruta}")
+    return True
+
+#Suma de verificación del contenido de un archivo
+def suma_archivo(ruta: str) -> str:
+    with open(ruta, "rb") as archivo:
+        return hashlib.sha256(archivo.read()).hexdigest()
+
+#Valida un CSV salvo que siga igual que en el manifiesto de la última validación.
+#Primero se comparan fecha y tamaño; la suma se calcula solo si alguno cambió (por ejemplo,
+#si el archivo se copió o se tocó sin modificarlo), y el archivo se valida solo si la suma
+#tampoco coincide. Se ejecuta en los procesos del pool, por eso recibe y retorna solo datos simples
+def validar_con_manifiesto(ruta: str, conocida: dict) -> tuple:
+    # Las operaciones pendientes del diario se vuelcan antes de validar
+    compactar(ruta)
+    # Los manifiestos anteriores guardaban solo la suma
+    if not isinstance(conocida, dict):
+        conocida = {"suma": conocida}
+    estado = os.stat(ruta)
+    if conocida.get("mtime_ns") == estado.st_mtime_ns and conocida.get("tamano") == estado.st_size:
+        return ruta, conocida
+    # La fecha y el tamaño se toman antes de la suma: si el archivo cambia mientras tanto,
+    # el próximo arranque lo vuelve a revisar
+    suma = suma_archivo(ruta)
+    if suma != conocida.get("suma") and validar_csv(ruta):
+        estado = os.stat(ruta)
+        suma = suma_archivo(ruta)
+    return ruta, {"suma": suma, "mtime_ns": estado.st_mtime_ns, "tamano": estado.st_size}
+
+#Todos los Productos.csv de la jerarquía, incluidas las categorías agregadas a mano
+def buscar_csvs(base: str) -> list:
+    rutas = []
+    for raiz, _, archivos in os.walk(base):
+        for archivo in archivos:
+            if archivo.lower() == NOMBRE_CSV.lower():
+                rutas.append(os.path.join(raiz, archivo))
+    return sorted(rutas)
+
+def cargar_manifiesto(base: str) -> dict:
+    try:
+        with open(os.path.join(base, NOMBRE_MANIFIESTO), encoding="utf-8") as archivo:
+            return json.load(archivo)
+    except (OSError, ValueError):
+        return {}
+
+def guardar_manifiesto(base: str, manifiesto: dict) -> None:
+    ruta = os.path.join(base, NOMBRE_MANIFIESTO)
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as archivo:
+        json.dump(manifiesto, archivo, ensure_ascii=False, indent=0)
+    os.replace(temporal, ruta)
+
+#Valida todos los CSV de la jerarquía. Los que siguen igual que en la instantánea se
+#aceptan sin leerlos (solo se compara su fecha y tamaño) y los que no cambiaron desde la
+#última validación se saltean; con muchos archivos el trabajo se reparte en procesos
+def validar_archivos(base: str) -> None:
+    manifiesto = cargar_manifiesto(base)
+    vigentes = []
+    rutas = []
+    for ruta in buscar_csvs(base):
+        if instantanea.vigente(ruta):
+            vigentes.append((ruta, manifiesto.get(ruta)))
+        else:
+            rutas.append(ruta)
+    conocidas = [manifiesto.get(ruta) for ruta in rutas]
+
+    if len(rutas) >= MIN_ARCHIVOS_PARALELO:
+        with ProcessPoolExecutor() as pool:
+            lote = max(1, len(rutas) // (4 * (os.cpu_count() or 1)))
+            resultados = list(pool.map(validar_con_manifiesto, rutas, conocidas, chunksize=lote))
+    else:
+        resultados = [validar_con_manifiesto(ruta, conocida) for ruta, conocida in zip(rutas, conocidas)]
+
+    nuevo = dict(vigentes + resultados)
+    if nuevo != manifiesto:
+        guardar_manifiesto(base, nuevo)
 
 #Recorre recursivamente la carpeta, creando carpetas o archivos faltantes
 def verificar_estructura(ruta: str, estructura: dict) -> None:
@@ -86,8 +167,25 @@ def verificar_estructura(ruta: str, estructura: dict) -> None:
         elif isinstance(contenido, dict):
             verificar_estructura(ruta_carpeta, contenido)
 
+#Rutas de los Productos.csv de las categorías de la estructura inicial
+def rutas_iniciales(ruta: str, estructura: dict) -> list:
+    rutas = []
+    for carpeta, contenido in estructura.items():
+        ruta_carpeta = os.path.join(ruta, carpeta)
+        if isinstance(contenido, tuple):
+            rutas.extend(os.path.join(ruta_carpeta, subnivel, NOMBRE_CSV) for subnivel in contenido)
+        elif isinstance(contenido, dict):
+            rutas.extend(rutas_iniciales(ruta_carpeta, contenido))
+    return rutas
+
 #Ejecuta la verificación, en caso de que exista el directorio inicial, o que no se creara todavía
 def iniciar_verificacion():
+    # Con SQLite no hay carpetas ni archivos que validar: solo se crean las categorías faltantes
+    if usa_sqlite():
+        print("Verificando categorías en la base")
+        for ruta in rutas_iniciales(RUTA_BASE, ESTRUCTURA_INICIAL["Supermercado"]):
+            crear_categoria(ruta)
+        return
     # Si la carpeta base no existe o está vacía, se crea estructura inicial
     if not os.path.exists(RUTA_BASE) or not os.listdir(RUTA_BASE):
         print("Generando estructura base inicial")
@@ -95,6 +193,10 @@ def iniciar_verificacion():
     else:
         print("Verificando estructura existente")
         verificar_estructura(RUTA_BASE, ESTRUCTURA_INICIAL["Supermercado"])
+    instantanea.cargar(RUTA_BASE)
+    validar_archivos(RUTA_BASE)
+    # Lo recién validado queda en la instantánea para el próximo arranque
+    instantanea.guardar(RUTA_BASE)
 
 def main():
     iniciar_verificacion()
@@ -0,0 +1,261 @@
+import os
+import struct
+import ctypes
+import ctypes.util
+from .config import RUTA_BASE, NOMBRE_CSV, EXTENSION_DIARIO
+from .motor import usa_sqlite, firma_categoria
+
+#Detección incremental de cambios en la carpeta base hechos por otros procesos (o por este).
+#En Linux usa inotify (por ctypes, sin dependencias); si no está disponible, recorre las
+#carpetas con os.scandir comparando la firma de cada Productos.csv, sin leer productos.
+#
+#Cada consumidor (el índice de nombres, las estadísticas) pide con cambios(nombre) las
+#categorías que cambiaron desde su última consulta y revisa solo esas; None significa
+#que no hay información suficiente y tiene que revisar todo (la primera vez, si la
+#vigilancia no está activa o si se perdieron eventos).
+_estado = {
+    "modo": None,          # None (inactiva), "inotify" o "sondeo"
+    "base": None,
+    "descriptor": None,
+    "carpetas": {},        # inotify: descriptor de vigilancia -> carpeta
+    "hojas": set(),        # rutas normalizadas de todos los Productos.csv
+    "firmas": {},          # sondeo: ruta -> firma de la categoría
+    "subcarpetas": set(),  # sondeo: carpetas conocidas
+    "pendientes": {},      # consumidor -> rutas cambiadas (None: revisar todo)
+    "agregadas": set(),    # carpetas nuevas todavía no informadas
+    "eliminadas": set(),   # carpetas borradas todavía no informadas
+}
+
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_MASCARA = (_IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE
+            | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF)
+_EVENTO = struct.Struct("iIII")
+_libc = {}
+
+def _inotify():
+    if "libc" not in _libc:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            libc.inotify_init1.argtypes = [ctypes.c_int]
+            libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+            libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        except (OSError, AttributeError):
+            libc = None
+        _libc["libc"] = libc
+    return _libc["libc"]
+
+def _es_archivo_categoria(nombre: str) -> bool:
+    nombre = nombre.lower()
+    return nombre == NOMBRE_CSV.lower() or nombre == (NOMBRE_CSV + EXTENSION_DIARIO).lower()
+
+def _ruta_csv(carpeta: str) -> str:
+    return os.path.normpath(os.path.join(carpeta, NOMBRE_CSV))
+
+def _dentro_de(ruta: str, carpeta: str) -> bool:
+    return ruta.startswith(os.path.normpath(carpeta) + os.sep)
+
+#Anota una categoría cambiada para todos los consumidores
+def _marcar(ruta: str) -> None:
+    for pendientes in _estado["pendientes"].values():
+        if pendientes is not None:
+            pendientes.add(ruta)
+
+#Perdimos eventos: todos los consumidores tienen que revisar todo
+def _marcar_todo() -> None:
+    for consumidor in _estado["pendientes"]:
+        _estado["pendientes"][consumidor] = None
+
+#Recorre una carpeta (y sus subcarpetas) registrando las hojas que contiene
+def _recorrer(carpeta: str, agregar_vigilancia: bool) -> None:
+    pendientes = [carpeta]
+    while pendientes:
+        actual = pendientes.pop()
+        if agregar_vigilancia:
+            _vigilar(actual)
+        else:
+            _estado["subcarpetas"].add(os.path.normpath(actual))
+        try:
+            with os.scandir(actual) as entradas:
+                for entrada in entradas:
+                    if entrada.is_dir(follow_symlinks=False):
+                        pendientes.append(entrada.path)
+                    elif entrada.name.lower() == NOMBRE_CSV.lower():
+                        ruta = _ruta_csv(actual)
+                        _estado["hojas"].add(ruta)
+                        _marcar(ruta)
+                        if not agregar_vigilancia:
+                            _estado["firmas"][ruta] = firma_categoria(ruta)
+        except OSError:
+            pass
+
+def _vigilar(carpeta: str) -> None:
+    libc = _inotify()
+    descriptor = libc.inotify_add_watch(_estado["descriptor"], os.fsencode(carpeta), _MASCARA)
+    if descriptor < 0:
+        raise OSError(ctypes.get_errno(), f"inotify_add_watch: {carpeta}")
+    _estado["carpetas"][descriptor] = os.path.normpath(carpeta)
+
+def _quitar_carpeta(carpeta: str) -> None:
+    for ruta in [r for r in _estado["hojas"] if _dentro_de(r, carpeta)]:
+        _estado["hojas"].discard(ruta)
+        _marcar(ruta)
+
+def _procesar_evento(carpeta: str, mascara: int, nombre: str) -> None:
+    ruta_nombre = os.path.normpath(os.path.join(carpeta, nombre))
+    if mascara & _IN_ISDIR:
+        if mascara & (_IN_CREATE | _IN_MOVED_TO):
+            _estado["agregadas"].add(ruta_nombre)
+            _recorrer(ruta_nombre, agregar_vigilancia=True)
+        elif mascara & (_IN_DELETE | _IN_MOVED_FROM):
+            _estado["eliminadas"].add(ruta_nombre)
+            _quitar_carpeta(ruta_nombre)
+        return
+    if not _es_archivo_categoria(nombre):
+        return
+    ruta = _ruta_csv(carpeta)
+    if nombre.lower() == NOMBRE_CSV.lower():
+        if mascara & (_IN_CREATE | _IN_MOVED_TO):
+            _estado["hojas"].add(ruta)
+        elif mascara & (_IN_DELETE | _IN_MOVED_FROM) and not os.path.exists(ruta):
+            _estado["hojas"].discard(ruta)
+    _marcar(ruta)
+
+#Si no se puede vigilar una carpeta nueva (por ejemplo, por el límite de vigilancias
+#del sistema) se sigue por sondeo y todos los consumidores revisan todo
+def _pasar_a_sondeo() -> None:
+    os.close(_estado["descriptor"])
+    _estado.update(modo="sondeo", descriptor=None, carpetas={}, hojas=set(), firmas={}, subcarpetas=set())
+    _recorrer(_estado["base"], agregar_vigilancia=False)
+    _marcar_todo()
+
+#Lee los eventos acumulados en inotify sin bloquear
+def _leer_eventos() -> None:
+    while True:
+        try:
+            datos = os.read(_estado["descriptor"], 64 * 1024)
+        except BlockingIOError:
+            return
+        if not datos:
+            return
+        posicion = 0
+        while posicion + _EVENTO.size <= len(datos):
+            descriptor, mascara, _, largo = _EVENTO.unpack_from(datos, posicion)
+            posicion += _EVENTO.size
+            nombre = os.fsdecode(datos[posicion:posicion + largo].rstrip(b"\0"))
+            posicion += largo
+            if mascara & _IN_Q_OVERFLOW:
+                _marcar_todo()
+                continue
+            carpeta = _estado["carpetas"].get(descriptor)
+            if carpeta is None:
+                continue
+            if mascara & _IN_IGNORED:
+                del _estado["carpetas"][descriptor]
+            elif nombre:
+                try:
+                    _procesar_evento(carpeta, mascara, nombre)
+                except OSError:
+                    _pasar_a_sondeo()
+                    return
+
+#Compara el estado actual de las carpetas con el último recorrido
+def _sondear() -> None:
+    anteriores_hojas = set(_estado["hojas"])
+    anteriores_carpetas = set(_estado["subcarpetas"])
+    anteriores_firmas = dict(_estado["firmas"])
+    _estado["hojas"] = set()
+    _estado["subcarpetas"] = set()
+    _estado["firmas"] = {}
+    pendientes = _estado["pendientes"]
+    # El recorrido marca todas las hojas; se descartan esas marcas y se dejan solo las diferencias
+    _estado["pendientes"] = {}
+    _recorrer(_estado["base"], agregar_vigilancia=False)
+    _estado["pendientes"] = pendientes
+
+    for ruta in _estado["hojas"] ^ anteriores_hojas:
+        _marcar(ruta)
+    for ruta in _estado["hojas"] & anteriores_hojas:
+        if _estado["firmas"].get(ruta) != anteriores_firmas.get(ruta):
+            _marcar(ruta)
+    _estado["agregadas"] |= _estado["subcarpetas"] - anteriores_carpetas
+    _estado["eliminadas"] |= anteriores_carpetas - _estado["subcarpetas"]
+
+#Pone al día el estado con los cambios ocurridos desde la última vez
+def _actualizar() -> None:
+    if _estado["modo"] == "inotify":
+        _leer_eventos()
+    elif _estado["modo"] == "sondeo":
+        _sondear()
+
+#Empieza a vigilar la carpeta base. Con inotify=False se usa siempre el sondeo.
+#Retorna el modo usado (None si no corresponde vigilar, por ejemplo con el motor SQLite)
+def iniciar_vigilancia(base: str = RUTA_BASE, inotify: bool = True) -> str:
+    detener_vigilancia()
+    if usa_sqlite() or not os.path.isdir(base):
+        return None
+    _estado.update(base=os.path.normpath(base), hojas=set(), firmas={}, subcarpetas=set(), carpetas={},
+                   agregadas=set(), eliminadas=set())
+    libc = _inotify() if inotify else None
+    if libc is not None and hasattr(libc, "inotify_init1"):
+        descriptor = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if descriptor >= 0:
+            _estado["descriptor"] = descriptor
+            _estado["modo"] = "inotify"
+            try:
+                _recorrer(base, agregar_vigilancia=True)
+                return "inotify"
+            except OSError:
+                # Por ejemplo, se alcanzó el límite de vigilancias del sistema
+                detener_vigilancia()
+                _estado.update(base=os.path.normpath(base), hojas=set())
+    _estado["modo"] = "sondeo"
+    _recorrer(base, agregar_vigilancia=False)
+    return "sondeo"
+
+def detener_vigilancia() -> None:
+    if _estado["descriptor"] is not None:
+        os.close(_estado["descriptor"])
+    _estado.update(modo=None, descriptor=None, carpetas={}, pendientes={})
+
+def activa() -> bool:
+    return _estado["modo"] is not None
+
+#Indica si la vigilancia cubre la carpeta indicada
+def cubre(base: str) -> bool:
+    return activa() and os.path.normpath(base) == _estado["base"]
+
+#Categorías que cambiaron (contenido, alta o baja) desde la última consulta del consumidor.
+#None si tiene que revisar todas
+def cambios(consumidor: str) -> set:
+    if not activa():
+        return None
+    _actualizar()
+    pendientes = _estado["pendientes"].get(consumidor)
+    _estado["pendientes"][consumidor] = set()
+    return pendientes
+
+#Rutas de todas las categorías conocidas (ordenadas, como motor.listar_hojas),
+#según la última consulta de cambios()
+def hojas() -> list:
+    return sorted(_estado["hojas"])
+
+#Carpetas agregadas y eliminadas desde la última consulta
+def carpetas_cambiadas() -> tuple:
+    if not activa():
+        return set(), set()
+    _actualizar()
+    agregadas, eliminadas = _estado["agregadas"], _estado["eliminadas"]
+    _estado["agregadas"], _estado["eliminadas"] = set(), set()
+    return agregadas, eliminadas
@@ -0,0 +1,203 @@
+import sys
+import json
+import shlex
+import argparse
+from funcionalidades import config, api
+from funcionalidades.almacenamiento import existe_diario, compactar, esperar_compactaciones, sincronizar_diarios
+from funcionalidades.verificar_jerarquia import iniciar_verificacion
+from funcionalidades.vigilancia import iniciar_vigilancia, detener_vigilancia
+from funcionalidades import instrumentacion
+from funcionalidades.importacion import importar, exportar
+
+#Procesa un archivo de comandos sin menú, en un solo proceso y con una sola carga del catálogo.
+#Cada línea es un comando (las líneas vacías y las que empiezan con # se ignoran):
+#
+#   agregar Bebidas/Gaseosas/Zero "Coca Zero" 1200 30
+#   listar Bebidas/Gaseosas/Zero
+#   buscar coca [Bebidas/Gaseosas/Zero]
+#   actualizar Bebidas/Gaseosas/Zero 3 precio=1500 stock=10
+#   eliminar Bebidas/Gaseosas/Zero 3
+#   ordenar Bebidas/Gaseosas/Zero precio,stock [desc]
+#   ordenar-todo precio catalogo_ordenado.csv [desc]
+#   importar lista_proveedor.csv [crear]   (CSV o JSONL con Categoría, Nombre, Precio, Stock)
+#   exportar catalogo.jsonl
+#   rango precio 100 500 [Bebidas/Gaseosas]   ("-" deja un extremo abierto: rango stock - 10)
+#   top precio 50 [Bebidas] [asc]
+#   reposicion 10 [Bebidas]                    (productos con stock menor que 10)
+#   historial Bebidas/Gaseosas/Zero 3 2026-10-01   (precio y stock del ID 3 a esa fecha)
+#   trayectoria Bebidas/Gaseosas/Zero 3 [30]       (cambios de los últimos 30 días)
+#   estadisticas [Bebidas]
+#   metricas [metricas.json]     (con --instrumentar: vuelca las métricas hasta ese momento)
+#
+#Por cada comando se escribe una línea JSON con el resultado o el error.
+
+#Alias en inglés para los nombres de los comandos
+ALIAS = {
+    "add": "agregar", "list": "listar", "search": "buscar", "update": "actualizar",
+    "delete": "eliminar", "sort": "ordenar", "sort-all": "ordenar-todo", "stats": "estadisticas",
+    "metrics": "metricas", "import": "importar", "export": "exportar",
+    "range": "rango", "restock": "reposicion", "history": "historial", "trajectory": "trayectoria",
+}
+
+def _agregar(categoria, nombre, precio, stock):
+    return {"ID": api.agregar(categoria, nombre, precio, stock)}
+
+def _buscar(texto, categoria=None):
+    return api.buscar(texto, categoria)
+
+def _actualizar(categoria, id_producto, *asignaciones):
+    cambios = {}
+    for asignacion in asignaciones:
+        campo, separador, valor = asignacion.partition("=")
+        campo = campo.lower()
+        if not separador or campo not in ("nombre", "precio", "stock"):
+            raise ValueError(f"Cambio inválido: '{asignacion}' (use nombre=, precio= o stock=)")
+        cambios[campo] = valor
+    return api.actualizar(categoria, id_producto, **cambios)
+
+def _descendente(sentido: str) -> bool:
+    return sentido.lower() in ("desc", "descendente")
+
+def _ordenar(categoria, campo, sentido="asc"):
+    return api.ordenar(categoria, campo, _descendente(sentido))
+
+def _ordenar_todo(campo, destino, sentido="asc"):
+    return {"productos": api.ordenar_todo(destino, campo, _descendente(sentido)), "destino": destino}
+
+def _importar(origen, opcion=None):
+    if opcion is not None and opcion.lower() not in ("crear", "create"):
+        raise ValueError(f"Opción inválida: '{opcion}' (use crear)")
+    try:
+        return importar(origen, crear=opcion is not None)
+    except OSError as e:
+        raise ValueError(f"No se pudo importar '{origen}': {e}")
+
+def _exportar(destino):
+    try:
+        return {"productos": exportar(destino), "destino": destino}
+    except OSError as e:
+        raise ValueError(f"No se pudo exportar a '{destino}': {e}")
+
+def _extremo(valor):
+    return None if valor == "-" else valor
+
+def _rango(campo, minimo, maximo, categoria=None):
+    return api.rango(campo, _extremo(minimo), _extremo(maximo), categoria)
+
+def _top(campo, cantidad, categoria=None, sentido=None):
+    # La categoría se puede omitir: "top precio 10 asc"
+    if sentido is None and categoria is not None and categoria.lower() in ("asc", "desc", "ascendente", "descendente"):
+        categoria, sentido = None, categoria
+    return api.top(campo, cantidad, categoria, menores=sentido is not None and not _descendente(sentido))
+
+def _metricas(destino=None):
+    if not config.INSTRUMENTAR:
+        raise ValueError("La instrumentación no está activa (use --instrumentar)")
+    return {"archivos": instrumentacion.volcar(destino), "funciones": instrumentacion.metricas()}
+
+#Comando -> (función, mínimo y máximo de argumentos, uso)
+COMANDOS = {
+    "agregar": (_agregar, 4, 4, "agregar CATEGORIA NOMBRE PRECIO STOCK"),
+    "listar": (api.listar, 1, 1, "listar CATEGORIA"),
+    "buscar": (_buscar, 1, 2, "buscar TEXTO [CATEGORIA]"),
+    "actualizar": (_actualizar, 3, 5, "actualizar CATEGORIA ID campo=valor..."),
+    "eliminar": (api.eliminar, 2, 2, "eliminar CATEGORIA ID"),
+    "ordenar": (_ordenar, 2, 3, "ordenar CATEGORIA precio|stock[,stock|precio] [asc|desc]"),
+    "ordenar-todo": (_ordenar_todo, 2, 3, "ordenar-todo precio|stock[,...] DESTINO [asc|desc]"),
+    "importar": (_importar, 1, 2, "importar ORIGEN.csv|ORIGEN.jsonl [crear]"),
+    "exportar": (_exportar, 1, 1, "exportar DESTINO.csv|DESTINO.jsonl"),
+    "rango": (_rango, 3, 4, "rango precio|stock MINIMO|- MAXIMO|- [CATEGORIA]"),
+    "top": (_top, 2, 4, "top precio|stock CANTIDAD [CATEGORIA] [asc|desc]"),
+    "reposicion": (api.reposicion, 1, 2, "reposicion STOCK_MINIMO [CATEGORIA]"),
+    "historial": (api.historial_en, 3, 3, "historial CATEGORIA ID AAAA-MM-DD[THH:MM]"),
+    "trayectoria": (api.trayectoria, 2, 3, "trayectoria CATEGORIA ID [DIAS]"),
+    "estadisticas": (api.estadisticas, 0, 1, "estadisticas [CATEGORIA]"),
+    "metricas": (_metricas, 0, 1, "metricas [DESTINO]"),
+}
+
+#Ejecuta una línea y retorna (nombre del comando, resultado)
+def ejecutar_linea(linea: str) -> tuple:
+    partes = shlex.split(linea) if ('"' in linea or "'" in linea or "\\" in linea) else linea.split()
+    nombre = ALIAS.get(partes[0].lower(), partes[0].lower())
+    if nombre not in COMANDOS:
+        raise ValueError(f"Comando desconocido: '{partes[0]}'")
+    funcion, minimo, maximo, uso = COMANDOS[nombre]
+    argumentos = partes[1:]
+    if not minimo <= len(argumentos) <= maximo:
+        raise ValueError(f"Uso: {uso}")
+    return nombre, funcion(*argumentos)
+
+#Resultados que se acumulan antes de escribirlos (ver procesar)
+LOTE_SALIDA = 1000
+
+#Ejecuta los comandos y escribe una línea JSON por resultado.
+#Los resultados se escriben de a "lote": antes de cada escritura se sincronizan una vez los
+#diarios que cambiaron, así ningún "ok" informa un cambio que un corte podría perder
+def procesar(lineas, salida, lote: int = LOTE_SALIDA) -> int:
+    errores = 0
+    pendientes = []
+    for numero, linea in enumerate(lineas, 1):
+        linea = linea.strip()
+        if not linea or linea.startswith("#"):
+            continue
+        try:
+            comando, resultado = ejecutar_linea(linea)
+            registro = {"linea": numero, "comando": comando, "ok": True, "resultado": resultado}
+        except ValueError as e:
+            errores += 1
+            registro = {"linea": numero, "ok": False, "error": str(e)}
+        pendientes.append(json.dumps(registro, ensure_ascii=False) + "\n")
+        if len(pendientes) >= lote:
+            _escribir(salida, pendientes)
+    _escribir(salida, pendientes)
+    return errores
+
+def _escribir(salida, pendientes: list) -> None:
+    sincronizar_diarios()
+    salida.write("".join(pendientes))
+    salida.flush()
+    pendientes.clear()
+
+def main():
+    parser = argparse.ArgumentParser(description="Procesa comandos del supermercado sin menú interactivo.")
+    parser.add_argument("archivo", help="archivo de comandos ('-' para leer de la entrada estándar)")
+    parser.add_argument("--sin-diario", action="store_true",
+                        help="reescribir el CSV en cada cambio en lugar de usar el diario de operaciones")
+    parser.add_argument("--verificar", action="store_true",
+                        help="validar la estructura de carpetas antes de procesar")
+    parser.add_argument("--instrumentar", action="store_true",
+                        help=f"registrar tiempos, filas y bytes de las operaciones y volcarlos en {config.RUTA_METRICAS}")
+    parser.add_argument("--perfilar", action="store_true", help="además, perfilar con cProfile")
+    argumentos = parser.parse_args()
+
+    # Durante el lote los cambios van al diario y cada categoría se compacta una sola vez al final.
+    # Los diarios no se sincronizan por comando sino una vez por cada lote de resultados (ver procesar)
+    if not argumentos.sin_diario:
+        config.USAR_DIARIO = True
+        config.SINCRONIZAR_DIARIO = False
+    if argumentos.instrumentar or argumentos.perfilar:
+        instrumentacion.activar(perfil=argumentos.perfilar)
+    if argumentos.verificar:
+        iniciar_verificacion()
+    # Como en el menú: las búsquedas solo revisan las categorías que cambiaron
+    iniciar_vigilancia()
+
+    if argumentos.archivo == "-":
+        # Desde una terminal cada resultado se muestra apenas se ejecuta el comando
+        errores = procesar(sys.stdin, sys.stdout, 1 if sys.stdin.isatty() else LOTE_SALIDA)
+    else:
+        with open(argumentos.archivo, encoding="utf-8") as archivo:
+            errores = procesar(archivo, sys.stdout)
+
+    detener_vigilancia()
+    esperar_compactaciones()
+    for categoria in api.listar_categorias():
+        ruta = api.ruta_categoria(categoria)
+        if existe_diario(ruta):
+            compactar(ruta)
+    if config.INSTRUMENTAR:
+        print(f"Métricas guardadas en: {', '.join(instrumentacion.volcar())}", file=sys.stderr)
+    sys.exit(1 if errores else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,47 @@
+import sys
+import argparse
 from funcionalidades.funciones import alta_item, mostrar_items, modificar_item, eliminar_item, ordenar_items, promedio_productos
 from funcionalidades.verificar_jerarquia import iniciar_verificacion
 from funcionalidades.lectura_recursiva import iniciar_lectura
+from funcionalidades.almacenamiento import esperar_compactaciones
+from funcionalidades.vigilancia import iniciar_vigilancia, carpetas_cambiadas, detener_vigilancia
+from funcionalidades import config
+from funcionalidades import instrumentacion
+from funcionalidades.instrumentacion import volcar
+from funcionalidades.instantanea import guardar as guardar_instantanea
+from funcionalidades.impresion import FORMATOS, dirigir_listados
 
 #Menú de navegación del programa
 def main():
+    #Los listados se pueden pedir en CSV o JSON Lines para redirigirlos a un archivo
+    parser = argparse.ArgumentParser(description="Sistema de gestión de supermercado.")
+    parser.add_argument("--formato", choices=FORMATOS, default=config.FORMATO_LISTADO,
+                        help=f"formato de los listados (por defecto {config.FORMATO_LISTADO})")
+    parser.add_argument("--instrumentar", action="store_true",
+                        help=f"registrar tiempos, filas y bytes de las operaciones (opción 9, y en {config.RUTA_METRICAS} al salir)")
+    parser.add_argument("--perfilar", action="store_true", help="además, perfilar con cProfile")
+    argumentos = parser.parse_args()
+    config.FORMATO_LISTADO = argumentos.formato
+    if config.FORMATO_LISTADO != "tabla":
+        # Solo los listados quedan en la salida estándar; el menú, las preguntas y los avisos
+        # van a la de errores, así "python main.py --formato csv > listado.csv" deja un CSV limpio
+        dirigir_listados(sys.stdout)
+        sys.stdout = sys.stderr
+    if argumentos.instrumentar or argumentos.perfilar:
+        instrumentacion.activar(perfil=argumentos.perfilar)
+
     #Se hace una verificación iniciar de la estructura de carpetas
     iniciar_verificacion()
+    #Los cambios que hagan otros procesos en las carpetas se detectan de forma incremental
+    iniciar_vigilancia()
 
     while True:
+        agregadas, eliminadas = carpetas_cambiadas()
+        for carpeta in sorted(agregadas):
+            print(f"\nNueva carpeta detectada: {carpeta}")
+        for carpeta in sorted(eliminadas):
+            print(f"\nCarpeta eliminada: {carpeta}")
+
         print("\n=== SISTEMA DE GESTIÓN DE SUPERMERCADO ===")
         print("1. Alta de item")
         print("2. Mostrar todos los items")
@@ -17,6 +51,8 @@ def main():
         print("6. Ordenar productos")
         print("7. Promedio de productos")
         print("8. Salir")
+        if config.INSTRUMENTAR:
+            print("9. Volcar métricas de rendimiento")
         
         #Se carga la estructura de archivos csv que hay en ese momento
         archivos_csv = iniciar_lectura()
@@ -38,8 +74,15 @@ def main():
             case "7":
                 promedio_productos(archivos_csv)
             case "8":
+                esperar_compactaciones()
+                detener_vigilancia()
+                guardar_instantanea()
+                if config.INSTRUMENTAR:
+                    print(f"Métricas guardadas en: {', '.join(volcar())}")
                 print("¡Hasta luego!")
                 break
+            case "9" if config.INSTRUMENTAR:
+                print(f"Métricas guardadas en: {', '.join(volcar())}")
             case _:
                 print("Opción inválida")
 
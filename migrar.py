@@ -0,0 +1,29 @@
+import sys
+import argparse
+from funcionalidades import config
+from funcionalidades.migracion import csv_a_sqlite, sqlite_a_csv
+
+#Copia el catálogo entre el árbol de CSV (config.RUTA_BASE) y la base SQLite (config.RUTA_SQLITE):
+#
+#   python migrar.py a-sqlite      CSV -> SQLite
+#   python migrar.py a-csv         SQLite -> CSV
+#
+#Después de migrar, cambiar config.MOTOR para usar el otro motor.
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra el catálogo entre los motores CSV y SQLite.")
+    parser.add_argument("destino", choices=("a-sqlite", "a-csv"), help="motor de destino")
+    parser.add_argument("--db", default=config.RUTA_SQLITE, help=f"archivo SQLite (por defecto {config.RUTA_SQLITE})")
+    argumentos = parser.parse_args()
+
+    config.RUTA_SQLITE = argumentos.db
+    if argumentos.destino == "a-sqlite":
+        cantidad = csv_a_sqlite()
+        print(f"{cantidad} categorías copiadas de '{config.RUTA_BASE}' a '{argumentos.db}'")
+    else:
+        cantidad = sqlite_a_csv()
+        print(f"{cantidad} categorías copiadas de '{argumentos.db}' a '{config.RUTA_BASE}'")
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+import sys
+import json
+import asyncio
+import argparse
+import functools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+from funcionalidades import config, api
+from funcionalidades.cache_catalogo import firma_categoria
+from funcionalidades.bloqueos import ConflictoVersion
+from funcionalidades.almacenamiento import esperar_compactaciones
+from funcionalidades.verificar_jerarquia import iniciar_verificacion
+from funcionalidades.vigilancia import iniciar_vigilancia, detener_vigilancia
+from funcionalidades import instrumentacion
+
+#Servidor HTTP/JSON local sobre las mismas operaciones de api, para que varias terminales
+#consulten precios a la vez sin abrir cada una el menú interactivo:
+#
+#   GET    /categorias
+#   GET    /productos?categoria=Bebidas/Gaseosas/Zero
+#   GET    /productos/3?categoria=Bebidas/Gaseosas/Zero
+#   GET    /buscar?texto=coca[&categoria=...][&prefijo=1]
+#   GET    /rango?campo=precio[&minimo=100][&maximo=500][&categoria=Bebidas][&limite=50]
+#   GET    /top?campo=precio[&cantidad=10][&categoria=Bebidas][&orden=asc]
+#   GET    /reposicion?stock=10[&categoria=Bebidas]
+#   GET    /historial/3?categoria=...&fecha=2026-10-01
+#   GET    /trayectoria/3?categoria=...[&dias=30]
+#   GET    /estadisticas[?categoria=Bebidas]
+#   GET    /bloqueos
+#   GET    /metricas                      (con --instrumentar)
+#   POST   /productos?categoria=...      {"Nombre": ..., "Precio": ..., "Stock": ...} (o una lista)
+#   PATCH  /productos/3?categoria=...    {"Precio": ...} (Nombre, Precio y/o Stock)
+#   DELETE /productos/3?categoria=...
+#
+#Cada respuesta es {"ok": true, "resultado": ...} o {"ok": false, "error": "..."}, como en lote.py.
+#
+#Las conexiones se atienden con asyncio en un solo hilo. Los listados y las consultas por ID
+#se responden desde una copia en memoria ya serializada, válida mientras no cambie la firma
+#de la categoría; se guardan las de las LECTURAS_SERVIDOR categorías usadas más recientemente.
+#Todo lo que toca disco (la firma, lecturas que no están en memoria, búsquedas, estadísticas y
+#escrituras) corre en un hilo aparte, para no frenar las demás conexiones: los índices en memoria del
+#catálogo son compartidos, así que las llamadas a api se hacen de a una, y dentro de cada
+#categoría las escrituras se ordenan además con el bloqueo por categoría (ver bloqueos).
+
+_trabajador = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalogo")
+_lecturas = OrderedDict()   # categoría -> {"ruta", "firma", "ids": ID -> producto serializado, "listado": ...}
+
+def _serializar(datos: dict) -> bytes:
+    return json.dumps(datos, ensure_ascii=False).encode("utf-8")
+
+def _exito(resultado) -> bytes:
+    return _serializar({"ok": True, "resultado": resultado})
+
+async def _ejecutar(funcion, *argumentos, **opciones):
+    return await asyncio.get_running_loop().run_in_executor(
+        _trabajador, functools.partial(funcion, *argumentos, **opciones))
+
+def _categoria(consulta: dict) -> str:
+    categoria = consulta.get("categoria")
+    if not categoria:
+        raise ValueError("Falta el parámetro 'categoria'")
+    return categoria
+
+#Ruta y firma actual de la categoría (firma_categoria consulta el disco)
+def _ruta_y_firma(categoria: str, ruta: str = None) -> tuple:
+    ruta = ruta or api.ruta_categoria(categoria)
+    return ruta, firma_categoria(ruta)
+
+#Copia serializada de la categoría, armada en el hilo del catálogo si cambió o no estaba.
+#La firma se toma antes de leer: si la categoría cambia en el medio, la copia queda
+#con la firma vieja y se vuelve a armar en la próxima consulta
+async def _lectura(categoria: str) -> dict:
+    entrada = _lecturas.get(categoria)
+    ruta, firma = await _ejecutar(_ruta_y_firma, categoria, entrada["ruta"] if entrada else None)
+    if entrada is None or entrada["firma"] != firma:
+        productos = await _ejecutar(api.listar, categoria)
+        entrada = {
+            "ruta": ruta,
+            "firma": firma,
+            "ids": {p.get("ID"): _exito(p) for p in reversed(productos)},
+            "listado": _exito(productos),
+        }
+    # La usada más recientemente queda al final (otra consulta pudo haberla descartado
+    # mientras se esperaba la firma); se descartan las más viejas
+    _lecturas[categoria] = entrada
+    _lecturas.move_to_end(categoria)
+    while len(_lecturas) > config.LECTURAS_SERVIDOR:
+        _lecturas.popitem(last=False)
+    return entrada
+
+async def _listar_categorias(consulta, id_producto, cuerpo):
+    return 200, await _ejecutar(api.listar_categorias)
+
+async def _listar(consulta, id_producto, cuerpo):
+    if id_producto is None:
+        return 200, (await _lectura(_categoria(consulta)))["listado"]
+    respuesta = (await _lectura(_categoria(consulta)))["ids"].get(id_producto)
+    if respuesta is None:
+        # api informa el error (ID inválido o inexistente)
+        return 200, await _ejecutar(api.obtener, _categoria(consulta), id_producto)
+    return 200, respuesta
+
+async def _buscar(consulta, id_producto, cuerpo):
+    prefijo = consulta.get("prefijo", "").lower() in ("1", "s", "si", "true")
+    return 200, await _ejecutar(api.buscar, consulta.get("texto", ""), consulta.get("categoria"), prefijo)
+
+def _limite(consulta: dict):
+    limite = consulta.get("limite")
+    if limite is None:
+        return None
+    if not limite.isdigit():
+        raise ValueError(f"Límite inválido: '{limite}'")
+    return int(limite)
+
+async def _rango(consulta, id_producto, cuerpo):
+    return 200, await _ejecutar(api.rango, consulta.get("campo", ""), consulta.get("minimo"), consulta.get("maximo"),
+                                consulta.get("categoria"), _limite(consulta))
+
+async def _top(consulta, id_producto, cuerpo):
+    menores = consulta.get("orden", "desc").lower() in ("asc", "ascendente")
+    return 200, await _ejecutar(api.top, consulta.get("campo", ""), consulta.get("cantidad", "10"),
+                                consulta.get("categoria"), menores)
+
+async def _reposicion(consulta, id_producto, cuerpo):
+    if "stock" not in consulta:
+        raise ValueError("Falta el parámetro 'stock'")
+    return 200, await _ejecutar(api.reposicion, consulta["stock"], consulta.get("categoria"), _limite(consulta))
+
+async def _historial(consulta, id_producto, cuerpo):
+    if id_producto is None:
+        raise ValueError("Indique el ID: GET /historial/ID?categoria=...&fecha=...")
+    if "fecha" not in consulta:
+        raise ValueError("Falta el parámetro 'fecha'")
+    return 200, await _ejecutar(api.historial_en, _categoria(consulta), id_producto, consulta["fecha"])
+
+async def _trayectoria(consulta, id_producto, cuerpo):
+    if id_producto is None:
+        raise ValueError("Indique el ID: GET /trayectoria/ID?categoria=...")
+    return 200, await _ejecutar(api.trayectoria, _categoria(consulta), id_producto, consulta.get("dias", "30"))
+
+async def _estadisticas(consulta, id_producto, cuerpo):
+    return 200, await _ejecutar(api.estadisticas, consulta.get("categoria"))
+
+async def _bloqueos(consulta, id_producto, cuerpo):
+    return 200, await _ejecutar(api.esperas_bloqueos)
+
+#Campos de un producto recibido como JSON (sin distinguir mayúsculas)
+def _campos(datos, obligatorios: bool) -> dict:
+    if not isinstance(datos, dict):
+        raise ValueError("Se esperaba un objeto JSON con Nombre, Precio y/o Stock")
+    campos = {clave.lower(): valor for clave, valor in datos.items()}
+    desconocidos = set(campos) - {"nombre", "precio", "stock", "id"}
+    if desconocidos:
+        raise ValueError(f"Campo inválido: '{sorted(desconocidos)[0]}'")
+    campos.pop("id", None)
+    if obligatorios:
+        for campo in ("nombre", "precio", "stock"):
+            if campo not in campos:
+                raise ValueError(f"Falta el campo '{campo.capitalize()}'")
+    return campos
+
+async def _agregar(consulta, id_producto, cuerpo):
+    if id_producto is not None:
+        return 405, "Use POST /productos?categoria=... para dar de alta"
+    categoria = _categoria(consulta)
+    lista = cuerpo if isinstance(cuerpo, list) else [cuerpo]
+    productos = []
+    for datos in lista:
+        campos = _campos(datos, obligatorios=True)
+        productos.append({"Nombre": campos["nombre"], "Precio": campos["precio"], "Stock": campos["stock"]})
+    ids = await _ejecutar(api.agregar_lote, categoria, productos)
+    return 201, {"IDs": ids} if isinstance(cuerpo, list) else {"ID": ids[0]}
+
+async def _actualizar(consulta, id_producto, cuerpo):
+    if id_producto is None:
+        return 405, "Indique el ID: PATCH /productos/ID?categoria=..."
+    return 200, await _ejecutar(api.actualizar, _categoria(consulta), id_producto, **_campos(cuerpo, obligatorios=False))
+
+async def _eliminar(consulta, id_producto, cuerpo):
+    if id_producto is None:
+        return 405, "Indique el ID: DELETE /productos/ID?categoria=..."
+    return 200, await _ejecutar(api.eliminar, _categoria(consulta), id_producto)
+
+async def _metricas(consulta, id_producto, cuerpo):
+    if not config.INSTRUMENTAR:
+        raise ValueError("La instrumentación no está activa (use --instrumentar)")
+    return 200, await _ejecutar(lambda: {"funciones": instrumentacion.metricas(),
+                                         "perfil": instrumentacion.perfil_principal()})
+
+#(método, recurso) -> función. Cada función retorna (estado, resultado); el resultado
+#puede venir ya serializado
+RUTAS = {
+    ("GET", "categorias"): _listar_categorias,
+    ("GET", "productos"): _listar,
+    ("GET", "buscar"): _buscar,
+    ("GET", "rango"): _rango,
+    ("GET", "top"): _top,
+    ("GET", "reposicion"): _reposicion,
+    ("GET", "historial"): _historial,
+    ("GET", "trayectoria"): _trayectoria,
+    ("GET", "estadisticas"): _estadisticas,
+    ("GET", "bloqueos"): _bloqueos,
+    ("GET", "metricas"): _metricas,
+    ("POST", "productos"): _agregar,
+    ("PATCH", "productos"): _actualizar,
+    ("DELETE", "productos"): _eliminar,
+}
+
+_MOTIVOS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+#Resuelve un pedido y retorna (estado, cuerpo serializado)
+async def despachar(metodo: str, objetivo: str, cuerpo: bytes) -> tuple:
+    url = urlsplit(objetivo)
+    partes = [p for p in url.path.split("/") if p]
+    consulta = {clave: valores[-1] for clave, valores in parse_qs(url.query).items()}
+    if not partes or len(partes) > 2:
+        return 404, _serializar({"ok": False, "error": f"Ruta inexistente: '{url.path}'"})
+    funcion = RUTAS.get((metodo, partes[0]))
+    if funcion is None:
+        if any(recurso == partes[0] for _, recurso in RUTAS):
+            return 405, _serializar({"ok": False, "error": f"Método no permitido: {metodo}"})
+        return 404, _serializar({"ok": False, "error": f"Ruta inexistente: '{url.path}'"})
+    try:
+        datos = json.loads(cuerpo.decode("utf-8")) if cuerpo.strip() else {}
+        estado, resultado = await funcion(consulta, partes[1] if len(partes) == 2 else None, datos)
+    except ConflictoVersion as e:
+        return 409, _serializar({"ok": False, "error": str(e)})
+    except ValueError as e:
+        # Incluye JSON inválido y los errores de validación de api
+        return 400, _serializar({"ok": False, "error": str(e)})
+    except Exception as e:
+        return 500, _serializar({"ok": False, "error": f"Error interno: {e}"})
+    if estado >= 400:
+        return estado, _serializar({"ok": False, "error": resultado})
+    return estado, resultado if isinstance(resultado, bytes) else _exito(resultado)
+
+def _respuesta(estado: int, cuerpo: bytes, mantener: bool) -> bytes:
+    encabezados = (f"HTTP/1.1 {estado} {_MOTIVOS.get(estado, '')}\r\n"
+                   "Content-Type: application/json; charset=utf-8\r\n"
+                   f"Content-Length: {len(cuerpo)}\r\n"
+                   f"Connection: {'keep-alive' if mantener else 'close'}\r\n\r\n")
+    return encabezados.encode("latin-1") + cuerpo
+
+#Atiende una conexión; con HTTP/1.1 se mantiene abierta para varios pedidos
+async def atender(lector: asyncio.StreamReader, escritor: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            linea = await lector.readline()
+            if not linea.strip():
+                break
+            try:
+                metodo, objetivo, version = linea.decode("latin-1").split()
+            except ValueError:
+                escritor.write(_respuesta(400, _serializar({"ok": False, "error": "Pedido inválido"}), False))
+                break
+            encabezados = {}
+            while True:
+                linea = await lector.readline()
+                if not linea.strip():
+                    break
+                nombre, _, valor = linea.decode("latin-1").partition(":")
+                encabezados[nombre.strip().lower()] = valor.strip()
+
+            conexion = encabezados.get("connection", "").lower()
+            mantener = conexion == "keep-alive" or (version == "HTTP/1.1" and conexion != "close")
+            try:
+                largo = int(encabezados.get("content-length") or 0)
+            except ValueError:
+                largo = -1
+            if largo < 0 or largo > config.MAXIMO_CUERPO_SERVIDOR:
+                estado = 400 if largo < 0 else 413
+                escritor.write(_respuesta(estado, _serializar({"ok": False, "error": _MOTIVOS[estado]}), False))
+                break
+            cuerpo = await lector.readexactly(largo) if largo else b""
+
+            estado, respuesta = await despachar(metodo.upper(), objetivo, cuerpo)
+            escritor.write(_respuesta(estado, respuesta, mantener))
+            await escritor.drain()
+            if not mantener:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        escritor.close()
+
+async def servir(host: str, puerto: int) -> None:
+    servidor = await asyncio.start_server(atender, host, puerto)
+    print(f"Sirviendo el catálogo en http://{host}:{puerto}/ (Ctrl+C para terminar)", file=sys.stderr)
+    async with servidor:
+        await servidor.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Sirve el catálogo del supermercado por HTTP/JSON.")
+    parser.add_argument("--host", default=config.HOST_SERVIDOR, help=f"por defecto {config.HOST_SERVIDOR}")
+    parser.add_argument("--puerto", type=int, default=config.PUERTO_SERVIDOR,
+                        help=f"por defecto {config.PUERTO_SERVIDOR}")
+    parser.add_argument("--diario", action="store_true",
+                        help="registrar los cambios en el diario de operaciones en lugar de reescribir el CSV")
+    parser.add_argument("--verificar", action="store_true",
+                        help="validar la estructura de carpetas antes de empezar")
+    parser.add_argument("--instrumentar", action="store_true",
+                        help=f"registrar tiempos, filas y bytes de las operaciones (GET /metricas, y en {config.RUTA_METRICAS} al salir)")
+    parser.add_argument("--perfilar", action="store_true", help="además, perfilar con cProfile el hilo del catálogo")
+    argumentos = parser.parse_args()
+
+    if argumentos.diario:
+        config.USAR_DIARIO = True
+    if argumentos.instrumentar or argumentos.perfilar:
+        instrumentacion.activar()
+    if argumentos.perfilar:
+        # El trabajo del catálogo corre en su hilo: el perfil se activa ahí
+        _trabajador.submit(instrumentacion.iniciar_perfil).result()
+    if argumentos.verificar:
+        iniciar_verificacion()
+    # La vigilancia la consultan los índices del catálogo, que viven en el hilo de trabajo
+    _trabajador.submit(iniciar_vigilancia).result()
+    try:
+        asyncio.run(servir(argumentos.host, argumentos.puerto))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        _trabajador.submit(detener_vigilancia)
+        _trabajador.shutdown(wait=True)
+        esperar_compactaciones()
+        if config.INSTRUMENTAR:
+            print(f"Métricas guardadas en: {', '.join(instrumentacion.volcar())}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()